@@ -0,0 +1,160 @@
+"""
+Predict 200 image urls served by a local http.server (with a simulated network delay per request), one at a time
+with predict_from_url vs all at once with asyncio.gather over predict_from_url_async, checking that both give the
+same results. Then start another 200 and cancel them mid-flight, checking that they all stop promptly and that the
+model still predicts afterwards (the concurrency limit was released).
+
+Uses a tiny synthetic ONNX model (needs onnx, onnxruntime and aiohttp), unless the path of an exported Lobe model
+is given.
+
+    python benchmarks/async_urls.py [--model path/to/model] [--urls 200 --delay 0.02 --max-concurrency 64]
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+from PIL import Image
+
+from lobe import ImageModel
+
+
+def make_model(path: str, size: int):
+    import onnx
+    from onnx import helper, numpy_helper, TensorProto
+
+    weights = np.random.RandomState(0).randn(3, 5).astype(np.float32) * 5
+    nodes = [
+        helper.make_node("ReduceMean", ["Image:0"], ["pooled"], axes=[1, 2], keepdims=0),
+        helper.make_node("MatMul", ["pooled", "W"], ["logits"]),
+        helper.make_node("Softmax", ["logits"], ["Confidences:0"], axis=1),
+    ]
+    graph = helper.make_graph(
+        nodes, "bench",
+        [helper.make_tensor_value_info("Image:0", TensorProto.FLOAT, ["N", size, size, 3])],
+        [helper.make_tensor_value_info("Confidences:0", TensorProto.FLOAT, ["N", 5])],
+        [numpy_helper.from_array(weights, "W")],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+    onnx.save(model, os.path.join(path, "model.onnx"))
+    signature = {
+        "doc_id": "bench", "doc_name": "bench", "doc_version": "1", "format": "onnx", "filename": "model.onnx",
+        "tags": [], "export_model_version": 1,
+        "classes": {"Label": [f"c{i}" for i in range(5)]},
+        "inputs": {"Image": {"dtype": "float32", "shape": [None, size, size, 3], "name": "Image:0"}},
+        "outputs": {"Confidences": {"dtype": "float32", "shape": [None, 5], "name": "Confidences:0"}},
+    }
+    with open(os.path.join(path, "signature.json"), "w") as f:
+        json.dump(signature, f)
+
+
+def write_images(path: str, count: int):
+    rng = np.random.RandomState(1)
+    for i in range(count):
+        color = tuple(int(c) for c in rng.randint(0, 256, 3))
+        Image.new("RGB", (640, 480), color).save(os.path.join(path, f"{i}.jpg"), quality=90)
+
+
+class DelayedHandler(SimpleHTTPRequestHandler):
+    delay = 0.0
+
+    def do_GET(self):
+        # stand-in for the network and server latency of fetching from a real image host
+        time.sleep(self.delay)
+        super().do_GET()
+
+    def log_message(self, format, *args):
+        pass
+
+
+async def predict_all(model: ImageModel, urls):
+    return await asyncio.gather(*(model.predict_from_url_async(url) for url in urls))
+
+
+async def cancel_midway(model: ImageModel, urls, after: float):
+    tasks = [asyncio.ensure_future(model.predict_from_url_async(url)) for url in urls]
+    await asyncio.sleep(after)
+    start = time.perf_counter()
+    for task in tasks:
+        task.cancel()
+    outcomes = await asyncio.gather(*tasks, return_exceptions=True)
+    cancel_time = time.perf_counter() - start
+    cancelled = sum(isinstance(outcome, asyncio.CancelledError) for outcome in outcomes)
+    # every cancelled task must have released its slot, or these would wait forever
+    after_cancel = await asyncio.wait_for(predict_all(model, urls[:model.async_runner.max_concurrency]), timeout=30)
+    return cancelled, len(outcomes) - cancelled, cancel_time, after_cancel
+
+
+async def run_async(model: ImageModel, urls, cancel_after: float):
+    try:
+        start = time.perf_counter()
+        results = await predict_all(model, urls)
+        elapsed = time.perf_counter() - start
+        cancelled = await cancel_midway(model, urls, cancel_after)
+        return results, elapsed, cancelled
+    finally:
+        await model.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", help="Exported Lobe model folder (default: a synthetic ONNX model).")
+    parser.add_argument("--urls", type=int, default=200, help="Number of distinct image urls.")
+    parser.add_argument("--delay", type=float, default=0.02, help="Simulated seconds of latency per request.")
+    parser.add_argument("--max-concurrency", type=int, default=64, help="Async predictions in progress at once.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = args.model
+        if not model_path:
+            model_path = os.path.join(tmp, "model")
+            os.mkdir(model_path)
+            make_model(model_path, 224)
+        image_dir = os.path.join(tmp, "images")
+        os.mkdir(image_dir)
+        write_images(image_dir, args.urls)
+
+        DelayedHandler.delay = args.delay
+        server = ThreadingHTTPServer(("127.0.0.1", 0), partial(DelayedHandler, directory=image_dir))
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        urls = [f"http://127.0.0.1:{server.server_port}/{i}.jpg" for i in range(args.urls)]
+        try:
+            model = ImageModel.load(model_path)
+            start = time.perf_counter()
+            expected = [model.predict_from_url(url) for url in urls]
+            sync_elapsed = time.perf_counter() - start
+
+            model.configure_async(max_concurrency=args.max_concurrency)
+            results, async_elapsed, (cancelled, finished, cancel_time, after_cancel) = asyncio.run(
+                run_async(model, urls, cancel_after=args.delay * 2)
+            )
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    mismatches = sum(
+        result.prediction != reference.prediction
+        or not np.allclose([c for _, c in result.labels], [c for _, c in reference.labels], atol=1e-6)
+        for result, reference in zip(results, expected)
+    )
+    after_cancel_ok = all(
+        result.prediction == reference.prediction for result, reference in zip(after_cancel, expected)
+    )
+    print(f"{args.urls} urls, {args.delay * 1000:.0f} ms simulated latency each")
+    print(f"predict_from_url, one at a time:   {sync_elapsed:7.2f} s")
+    print(f"predict_from_url_async, gathered:  {async_elapsed:7.2f} s ({sync_elapsed / async_elapsed:.1f}x)")
+    print(f"results differing from sync:       {mismatches}")
+    print(f"cancelled mid-flight:              {cancelled} cancelled, {finished} already done, in {cancel_time * 1000:.1f} ms")
+    print(f"predicting after the cancellation: {'ok' if after_cancel_ok else 'WRONG RESULTS'}")
+
+
+if __name__ == "__main__":
+    main()
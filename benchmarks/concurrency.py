@@ -0,0 +1,91 @@
+"""
+Measure how TF Lite prediction throughput scales with the number of threads calling predict, comparing the default
+backend (one interpreter behind a lock) with BackendOptions(concurrent=True), which checks out an interpreter per call
+from a pool. Each interpreter runs single-threaded, so the speedup comes from running the calls side by side.
+
+Uses a synthetic conv model converted with TensorFlow, unless the path of an exported Lobe TF Lite model is given.
+
+    python benchmarks/concurrency.py [--model path/to/model] [--threads 1 2 4 8] [--calls 400 --repeat 3]
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from lobe import BackendOptions, ImageModel
+
+
+def make_model(path: str, size: int):
+    import tensorflow as tf
+
+    rng = np.random.RandomState(0)
+    kernel = tf.constant(rng.randn(3, 3, 3, 16).astype(np.float32))
+    weights = tf.constant(rng.randn(16, 5).astype(np.float32))
+
+    @tf.function(input_signature=[tf.TensorSpec([None, size, size, 3], tf.float32, name="Image")])
+    def model(image):
+        features = tf.nn.relu(tf.nn.conv2d(image, kernel, 1, "SAME"))
+        return tf.nn.softmax(tf.matmul(tf.reduce_mean(features, axis=[1, 2]), weights))
+
+    converter = tf.lite.TFLiteConverter.from_concrete_functions([model.get_concrete_function()], model)
+    with open(os.path.join(path, "model.tflite"), "wb") as f:
+        f.write(converter.convert())
+    output_name = tf.lite.Interpreter(model_path=os.path.join(path, "model.tflite")).get_output_details()[0]["name"]
+    signature = {
+        "doc_id": "bench", "doc_name": "bench", "doc_version": "1", "format": "tf_lite", "filename": "model.tflite",
+        "tags": [], "export_model_version": 1,
+        "classes": {"Label": [f"c{i}" for i in range(5)]},
+        "inputs": {"Image": {"dtype": "float32", "shape": [None, size, size, 3], "name": "Image"}},
+        "outputs": {"Confidences": {"dtype": "float32", "shape": [None, 5], "name": output_name}},
+    }
+    with open(os.path.join(path, "signature.json"), "w") as f:
+        json.dump(signature, f)
+
+
+def throughput(model: ImageModel, data: np.ndarray, threads: int, calls: int, repeat: int) -> float:
+    # warm up every interpreter the threads will use, so none of them allocate during the timed runs
+    model.backend.warmup(data)
+    best = float("inf")
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            list(pool.map(lambda _: model.backend.predict(data, as_numpy=True), range(calls)))
+            best = min(best, time.perf_counter() - start)
+    return calls / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", help="Exported Lobe TF Lite model folder (default: a synthetic model).")
+    parser.add_argument("--size", type=int, default=224, help="Input size of the synthetic model.")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--calls", type=int, default=400, help="Predictions per measurement.")
+    parser.add_argument("--repeat", type=int, default=3, help="Measurements of each variant, the fastest is reported.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = args.model
+        if not model_path:
+            make_model(tmp, args.size)
+            model_path = tmp
+        serial = ImageModel.load(model_path, backend_options=BackendOptions(num_threads=1))
+        height, width = serial.signature.input_image_size
+        data = np.random.RandomState(0).rand(1, height, width, 3).astype(np.float32)
+
+        print(f"{os.cpu_count()} CPUs")
+        print(f"{'threads':>7} {'serial img/s':>13} {'pooled img/s':>13} {'speedup':>8}")
+        for threads in args.threads:
+            pooled = ImageModel.load(model_path, backend_options=BackendOptions(
+                num_threads=1, concurrent=True, interpreter_pool_size=threads
+            ))
+            serial_rate = throughput(serial, data, threads, args.calls, args.repeat)
+            pooled_rate = throughput(pooled, data, threads, args.calls, args.repeat)
+            print(f"{threads:>7} {serial_rate:>13.1f} {pooled_rate:>13.1f} {pooled_rate / serial_rate:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
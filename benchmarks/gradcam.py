@@ -0,0 +1,114 @@
+"""
+Compare the latency of Grad-CAM++ on a TensorFlow export before and after caching: the old way prunes the model into
+the image -> conv and conv -> logits sub-graphs on every call and runs the nested GradientTapes eagerly, while
+TFImageModel.gradcam_plusplus(_fast) prunes once and reuses one compiled tf.function for every batch size.
+
+Uses a synthetic saved model (a few conv layers on 224x224 inputs), unless the path of a Lobe TF export is given.
+
+    python benchmarks/gradcam.py [--model path/to/model] [--batch-sizes 1 8] [--repeat 10]
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from lobe import ImageModel
+from lobe.signature_constants import IMAGE_INPUT, TENSOR_NAME
+
+
+def make_model(path: str, size: int = 224, classes: int = 5):
+    import tensorflow as tf
+
+    rng = np.random.RandomState(0)
+    graph = tf.Graph()
+    with graph.as_default():
+        image = tf.compat.v1.placeholder(tf.float32, [None, size, size, 3], name="Image")
+        features, channels = image, 3
+        for out_channels in [16, 32, 64]:
+            kernel = tf.constant((rng.randn(3, 3, channels, out_channels) / np.sqrt(9 * channels)).astype(np.float32))
+            features = tf.nn.relu(tf.nn.conv2d(features, kernel, strides=2, padding="SAME"))
+            channels = out_channels
+        pooled = tf.reduce_mean(features, axis=[1, 2])
+        logits = tf.matmul(pooled, tf.constant(rng.randn(channels, classes).astype(np.float32)))
+        confidences = tf.nn.softmax(logits, name="Confidences")
+        with tf.compat.v1.Session(graph=graph) as session:
+            builder = tf.compat.v1.saved_model.Builder(path)
+            signature_def = tf.compat.v1.saved_model.predict_signature_def({"Image": image}, {"Confidences": confidences})
+            builder.add_meta_graph_and_variables(session, ["serve"], signature_def_map={"serving_default": signature_def})
+            builder.save()
+    signature = {
+        "doc_id": "bench", "doc_name": "bench", "doc_version": "1", "format": "tf", "filename": "saved_model.pb",
+        "tags": ["serve"], "export_model_version": 1,
+        "classes": {"Label": [f"c{i}" for i in range(classes)]},
+        "inputs": {"Image": {"dtype": "float32", "shape": [None, size, size, 3], "name": "Image:0"}},
+        "outputs": {"Confidences": {"dtype": "float32", "shape": [None, classes], "name": "Confidences:0"}},
+    }
+    with open(os.path.join(path, "signature.json"), "w") as f:
+        json.dump(signature, f)
+
+
+def uncached_gradcam(backend, images: np.ndarray, label_mask, fast: bool) -> np.ndarray:
+    """
+    The per-call work before caching: find the tensors, prune both sub-graphs, then run the tapes eagerly.
+    """
+    import tensorflow as tf
+    from lobe.backends.tf.image_backend import _gradcam_plusplus_from_conv
+
+    last_fc_tensor, last_conv_tensor = backend._get_last_fc_and_conv_tensors()
+    input_image_name = backend.signature.inputs[IMAGE_INPUT][TENSOR_NAME]
+    last_conv_fn = backend.model.prune(input_image_name, last_conv_tensor.name)
+    last_fc_fn = backend.model.prune(last_conv_tensor.name, last_fc_tensor.name)
+    image_tensor = tf.constant(images, dtype=tf.float32)
+    _, cam = _gradcam_plusplus_from_conv(last_fc_fn, last_conv_fn(image_tensor), label_mask, fast=fast)
+    return cam.numpy()
+
+
+def timed(fn, repeat: int):
+    # the first call includes pruning/tracing for the cached path, so report it separately from the steady state
+    start = time.perf_counter()
+    output = fn()
+    first = time.perf_counter() - start
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return first * 1000, best * 1000, output
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", help="Exported Lobe TensorFlow model folder (default: a synthetic model).")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--repeat", type=int, default=10, help="Calls after the first, the fastest is reported.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = args.model
+        if not model_path:
+            model_path = os.path.join(tmp, "model")
+            make_model(model_path)
+        backend = ImageModel.load(model_path).backend
+        height, width = backend.signature.input_image_size
+
+        print(f"{'mode':>5} {'batch':>5} {'uncached first/steady ms':>25} {'cached first/steady ms':>23} {'speedup':>8} {'max diff':>9}")
+        for fast in [False, True]:
+            cached = backend.gradcam_plusplus_fast if fast else backend.gradcam_plusplus
+            for batch_size in args.batch_sizes:
+                images = np.random.RandomState(batch_size).rand(batch_size, height, width, 3).astype(np.float32)
+                label_mask = backend._get_label_mask(images)
+                before_first, before, expected = timed(
+                    lambda: uncached_gradcam(backend, images, label_mask, fast), args.repeat
+                )
+                after_first, after, output = timed(lambda: cached(images), args.repeat)
+                print(
+                    f"{'fast' if fast else 'full':>5} {batch_size:>5} {before_first:>12.1f} / {before:>10.1f} "
+                    f"{after_first:>11.1f} / {after:>9.1f} {before / after:>7.1f}x {np.abs(output - expected).max():>9.1e}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Time overlaying a batch of Grad-CAM heatmaps on their images three ways:
+  - per image: evaluate the matplotlib colormap on the float heatmap, resize the colored image and blend it
+    (the approach before the cached palette)
+  - NumPy batch: colorize through the palette, then upsample and blend the whole batch with vectorized NumPy
+  - _overlay_heatmaps: quantize the batch to palette indices once, then upsample, colorize and blend each image
+    in uint8 with PIL (what ImageModel.visualize uses)
+and report the largest pixel difference of each from the per-image approach.
+
+    python benchmarks/heatmap_overlay.py [--batch 64 --size 224 --heatmap-size 7 --repeat 5]
+"""
+import argparse
+import time
+
+import numpy as np
+from PIL import Image
+
+from lobe import image_utils
+from lobe.model.image_model import _colormap_palette, _overlay_heatmaps
+
+OPACITY = 0.5
+
+
+def per_image(heatmaps, images, colormap="inferno"):
+    from matplotlib import colormaps
+    cmap = colormaps[colormap]
+    blended = []
+    for heatmap, image in zip(heatmaps, images):
+        color_heatmap = cmap(heatmap)[:, :, :3]
+        heatmap_img = image_utils.array_to_image(color_heatmap).resize(image.size)
+        blended.append(np.asarray(Image.blend(image, heatmap_img, OPACITY)))
+    return blended
+
+
+def _bilinear_weights(in_size: int, out_size: int):
+    # the same pixel-center alignment as PIL's bilinear resize
+    centers = np.clip((np.arange(out_size) + 0.5) * in_size / out_size - 0.5, 0, in_size - 1)
+    low = np.floor(centers).astype(np.int64)
+    high = np.minimum(low + 1, in_size - 1)
+    return low, high, (centers - low).astype(np.float32)
+
+
+def numpy_batch(heatmaps, images, colormap="inferno"):
+    palette = np.frombuffer(_colormap_palette(colormap), dtype=np.uint8).reshape(256, 3).astype(np.float32)
+    indices = np.clip(np.nan_to_num(heatmaps.astype(np.float32)) * 256, 0, 255).astype(np.uint8)
+    colors = palette[indices]
+    width, height = images[0].size
+    rows_low, rows_high, row_frac = _bilinear_weights(colors.shape[1], height)
+    cols_low, cols_high, col_frac = _bilinear_weights(colors.shape[2], width)
+    rows = colors[:, rows_low] * (1 - row_frac)[None, :, None, None] + colors[:, rows_high] * row_frac[None, :, None, None]
+    upsampled = rows[:, :, cols_low] * (1 - col_frac)[None, None, :, None] + rows[:, :, cols_high] * col_frac[None, None, :, None]
+    pixels = np.stack([np.asarray(image, dtype=np.float32) for image in images])
+    return list(np.clip(pixels * (1 - OPACITY) + upsampled * OPACITY + 0.5, 0, 255).astype(np.uint8))
+
+
+def overlay(heatmaps, images, colormap="inferno"):
+    return _overlay_heatmaps(heatmaps, images, opacity=OPACITY, colormap=colormap, as_array=True)
+
+
+def timed(fn, heatmaps, images, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        outputs = fn(heatmaps, images)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, outputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch", type=int, default=64)
+    parser.add_argument("--size", type=int, default=224, help="Square image size.")
+    parser.add_argument("--heatmap-size", type=int, default=7, help="Square heatmap size (the last conv layer's).")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs of each approach, the fastest one is reported.")
+    args = parser.parse_args()
+
+    rng = np.random.RandomState(0)
+    heatmaps = rng.rand(args.batch, args.heatmap_size, args.heatmap_size).astype(np.float32)
+    images = [
+        Image.fromarray(rng.randint(0, 256, size=(args.size, args.size, 3)).astype(np.uint8))
+        for _ in range(args.batch)
+    ]
+    # load matplotlib and build the cached palette before timing
+    per_image(heatmaps[:1], images[:1])
+    overlay(heatmaps[:1], images[:1])
+
+    baseline_ms, expected = timed(per_image, heatmaps, images, args.repeat)
+    print(f"{args.batch} overlays of {args.heatmap_size}x{args.heatmap_size} heatmaps on {args.size}x{args.size} images")
+    print(f"per image, float colormap:  {baseline_ms:7.1f} ms")
+    for name, fn in [("NumPy batch:               ", numpy_batch), ("_overlay_heatmaps:         ", overlay)]:
+        ms, outputs = timed(fn, heatmaps, images, args.repeat)
+        diff = np.abs(np.stack(outputs).astype(np.int16) - np.stack(expected).astype(np.int16))
+        print(f"{name} {ms:7.1f} ms ({baseline_ms / ms:.2f}x), max diff {diff.max()}/255, mean diff {diff.mean():.2f}/255")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Measure how long `import lobe` takes in a fresh interpreter with `python -X importtime`, reporting the median over
+several runs for lobe and the biggest modules it imports, and checking that none of the optional heavy dependencies
+(the model runtimes, matplotlib, requests, aiohttp) are imported until they're needed. For comparison, it also times
+importing each installed heavy dependency on its own, which is roughly what an eager import would add.
+
+    python benchmarks/import_time.py [--runs 7 --top 8]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+HEAVY_MODULES = ["tensorflow", "tflite_runtime", "onnxruntime", "matplotlib", "requests", "aiohttp"]
+
+
+def import_times(statement: str) -> List[Tuple[str, int, int]]:
+    """
+    Run the statement in a fresh interpreter, returning (module, depth, cumulative microseconds) for every import.
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, ["src", os.environ.get("PYTHONPATH")])))
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement], capture_output=True, text=True, check=True, env=env
+    )
+    times = []
+    for line in output.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        times.append((name.strip(), depth, int(cumulative)))
+    return times
+
+
+def subtree(times: List[Tuple[str, int, int]], root: str) -> List[Tuple[str, int, int]]:
+    """
+    The imports made while importing root, which -X importtime prints just before it (children come first).
+    """
+    end = next(i for i, (name, depth, _) in enumerate(times) if name == root and depth == 0)
+    start = max((i + 1 for i, (_, depth, _) in enumerate(times[:end]) if depth == 0), default=0)
+    return times[start:end + 1]
+
+
+def median_times(statement: str, root: str, runs: int) -> Dict[str, float]:
+    """
+    Median cumulative microseconds of root and of each top-level package (no dot in its name) imported under it.
+    """
+    samples = defaultdict(list)
+    for _ in range(runs):
+        for name, depth, cumulative in subtree(import_times(statement), root):
+            if depth == 0 or ("." not in name and not name.startswith("_")):
+                samples[name].append(cumulative)
+    return {name: statistics.median(values) for name, values in samples.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=7, help="Fresh interpreters per measurement (median reported).")
+    parser.add_argument("--top", type=int, default=8, help="Number of the biggest packages lobe imports to list.")
+    args = parser.parse_args()
+
+    imported = {name for name, _, _ in import_times("import lobe")}
+    heavy = sorted(name for name in imported if name.split(".")[0] in HEAVY_MODULES)
+
+    times = median_times("import lobe", "lobe", args.runs)
+    print(f"import lobe: {times.pop('lobe') / 1000:7.1f} ms (median of {args.runs}), of which importing:")
+    for name, cumulative in sorted(times.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {name:40} {cumulative / 1000:7.1f} ms")
+    print(f"heavy modules imported: {', '.join(heavy) if heavy else 'none'}")
+
+    print("importing each heavy dependency on its own (what an eager import would add):")
+    for name in HEAVY_MODULES:
+        try:
+            times = median_times(f"import {name}", name, args.runs)
+        except subprocess.CalledProcessError:
+            print(f"  {name:40} not installed")
+            continue
+        print(f"  {name:40} {times[name] / 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
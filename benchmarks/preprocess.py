@@ -0,0 +1,80 @@
+"""
+Compare the PIL preprocessing chain with the crop-first fast path (image_utils.preprocess_image_to_array) on a
+camera-sized JPEG in each of the 8 EXIF orientations, reporting the time per image and the largest pixel differences.
+The images are decoded up front, so only the preprocessing is timed, unless --decode is given.
+
+    python benchmarks/preprocess.py [--width 4000 --height 3000 --size 224 --repeat 3 --decode]
+"""
+import argparse
+import time
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+from lobe import image_utils
+
+EXIF_ORIENTATION = 0x0112
+
+
+def make_jpeg(width: int, height: int, orientation: int) -> bytes:
+    rng = np.random.RandomState(orientation)
+    x, y = np.meshgrid(np.linspace(0, 1, width, dtype=np.float32), np.linspace(0, 1, height, dtype=np.float32))
+    pixels = np.stack([x * 255, y * 255, (1 - x) * 128 + 64], axis=-1)
+    pixels += rng.randint(-20, 20, size=(height, width, 1))
+    exif = Image.Exif()
+    exif[EXIF_ORIENTATION] = orientation
+    buffer = BytesIO()
+    Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(buffer, format="JPEG", quality=90, exif=exif)
+    return buffer.getvalue()
+
+
+def decode(data: bytes) -> Image.Image:
+    image = Image.open(BytesIO(data))
+    image.load()
+    return image
+
+
+def pil_chain(image: Image.Image, size) -> np.ndarray:
+    return image_utils.image_to_array(image_utils.preprocess_image(image, size))
+
+
+def fast_path(image: Image.Image, size, reducing_gap) -> np.ndarray:
+    return image_utils.preprocess_image_to_array(image, size, reducing_gap=reducing_gap)
+
+
+def timed(fn, inputs, repeat, include_decode):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        outputs = [fn(decode(data) if include_decode else data) for data in inputs]
+        best = min(best, time.perf_counter() - start)
+    return best / len(inputs) * 1000, outputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--width", type=int, default=4000)
+    parser.add_argument("--height", type=int, default=3000)
+    parser.add_argument("--size", type=int, default=224, help="Square model input size.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs of each variant, the fastest one is reported.")
+    parser.add_argument("--decode", action="store_true", help="Include decoding the JPEGs in the timings.")
+    args = parser.parse_args()
+
+    size = (args.size, args.size)
+    jpegs = [make_jpeg(args.width, args.height, orientation) for orientation in range(1, 9)]
+    inputs = jpegs if args.decode else [decode(data) for data in jpegs]
+
+    baseline_ms, expected = timed(lambda image: pil_chain(image, size), inputs, args.repeat, args.decode)
+    print(f"PIL chain:                {baseline_ms:7.1f} ms/image")
+    for reducing_gap in [None, 3.0]:
+        ms, outputs = timed(lambda image: fast_path(image, size, reducing_gap), inputs, args.repeat, args.decode)
+        diffs = np.abs(np.concatenate(outputs) - np.concatenate(expected)) * 255
+        print(
+            f"fast, reducing_gap={str(reducing_gap):4}: {ms:7.1f} ms/image, "
+            f"max diff {diffs.max():.2f}/255, mean diff {diffs.mean():.3f}/255"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+# Import Pi Camera library
+from picamera import PiCamera
+from picamera.array import PiRGBArray
+
+#Import Lobe python library
+from lobe import ImageModel
+
+# Create a camera object
+camera = PiCamera(resolution=(640, 480), framerate=30)
+# Optional image rotation for camera
+# --> Change or comment out as needed
+camera.rotation = 180
+
+# Load Lobe TF Lite model
+# --> Change model path
+model = ImageModel.load('/home/pi/model')
+
+
+def frames():
+    # Capture frames straight into memory as RGB arrays, instead of writing and reading a JPEG file for each one
+    output = PiRGBArray(camera, size=camera.resolution)
+    for _ in camera.capture_continuous(output, format='rgb', use_video_port=True):
+        yield output.array.copy()
+        output.truncate(0)
+
+
+if __name__ == '__main__':
+    # Always predict the latest frame, and reuse the last result when the picture barely changed
+    for prediction in model.predict_stream(frames(), change_threshold=0.01):
+        print(
+            f"{prediction.result.prediction} "
+            f"({prediction.fps:.1f} fps, {prediction.latency * 1000:.0f} ms latency, {prediction.dropped} dropped)"
+        )
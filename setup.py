@@ -13,6 +13,7 @@ requirements = [
 tf_req = "tensorflow~=2.8.0 ; platform_machine != 'armv7l'"
 onnx_req = "onnxruntime~=1.10.0 ; platform_machine != 'armv7l' and python_version <= '3.9'"  # onnxruntime not to 3.10 yet
 tflite_req = "tflite-runtime~=2.7.0 ; platform_system == 'Linux' and python_version <= '3.9'"  # tflite not to 3.10 yet
+async_req = "aiohttp~=3.8"
 
 setup(
     name="lobe",
@@ -31,6 +32,10 @@ setup(
         'tf': [tf_req],
         'onnx': [onnx_req],
         'tflite': [tflite_req],
+        'async': [async_req],
+    },
+    entry_points={
+        'console_scripts': ['lobe=lobe.cli:main'],
     },
     python_requires='>=3.7',
     classifiers=sorted([
@@ -1,2 +1,3 @@
 from .signature import Signature
 from .model.image_model import ImageModel, VizEnum
+from .backends.options import BackendOptions
@@ -1,18 +1,82 @@
 #!/usr/bin/env python
+import base64
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Union, List, Tuple, Dict
 
-import requests
 from PIL import Image
 
 from .api_constants import IMAGE_INPUT
-from .image_utils import image_to_base64
+from .http_client import HTTPClient, get_default_client
+from .image_utils import image_to_jpeg_bytes, encoded_image_bytes
 from .results import ClassificationResult
 
+# timing keys reported by send_image_predict_request
+ENCODE_TIME = 'encode'
+TRANSFER_TIME = 'transfer'
+PARSE_TIME = 'parse'
 
-def send_image_predict_request(image: Image.Image, predict_url: str) -> ClassificationResult:
+
+def send_image_predict_request(
+        image: Union[Image.Image, str, bytes],
+        predict_url: str,
+        client: Optional[HTTPClient] = None,
+        size: Optional[Tuple[int, int]] = None,
+        timings: Optional[Dict[str, float]] = None,
+) -> ClassificationResult:
+    """
+    Send the image to the Lobe Connect local API and return its ClassificationResult.
+
+    image: a PIL image, or an image file path or encoded image bytes. JPEG files and bytes are sent as-is
+        instead of being decoded and re-encoded.
+    size: if given (e.g. the model's input size), larger images are downscaled before sending them
+    timings: if given, this dictionary is filled with the seconds spent to encode the request, transfer it
+        (including the server's prediction), and parse the response
+    """
+    start = time.perf_counter()
+    if isinstance(image, Image.Image):
+        image_bytes = image_to_jpeg_bytes(image, size)
+    else:
+        image_bytes = encoded_image_bytes(image, size)
     payload = {
-        IMAGE_INPUT: image_to_base64(image)
+        IMAGE_INPUT: base64.b64encode(image_bytes).decode("utf-8")
     }
-    response = requests.post(predict_url, json=payload)
+    encoded = time.perf_counter()
+    response = (client or get_default_client()).post(predict_url, json=payload)
     response.raise_for_status()
-    return ClassificationResult(json.loads(response.text))
+    transferred = time.perf_counter()
+    # parse the raw bytes, skipping the decode to text
+    result = ClassificationResult(json.loads(response.content))
+    if timings is not None:
+        timings[ENCODE_TIME] = encoded - start
+        timings[TRANSFER_TIME] = transferred - encoded
+        timings[PARSE_TIME] = time.perf_counter() - transferred
+    return result
+
+
+def send_images_predict_request(
+        images: List[Union[Image.Image, str, bytes]],
+        predict_url: str,
+        client: Optional[HTTPClient] = None,
+        size: Optional[Tuple[int, int]] = None,
+        concurrency: int = 4,
+        timings: Optional[List[Dict[str, float]]] = None,
+) -> List[ClassificationResult]:
+    """
+    Send many images to the Lobe Connect local API, with up to `concurrency` requests in flight over pooled
+    connections. Returns the ClassificationResults in the same order as the images.
+    If timings is given, a dictionary of timings (see send_image_predict_request) is appended for each image.
+    """
+    if concurrency < 1:
+        raise ValueError(f"concurrency must be a positive integer, got: {concurrency}")
+    client = client or get_default_client()
+    image_timings = [{} for _ in images]
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="lobe-api") as executor:
+        results = list(executor.map(
+            lambda args: send_image_predict_request(args[0], predict_url, client=client, size=size, timings=args[1]),
+            zip(images, image_timings),
+        ))
+    if timings is not None:
+        timings.extend(image_timings)
+    return results
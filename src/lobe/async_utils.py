@@ -0,0 +1,100 @@
+"""
+asyncio support for running ImageModel predictions without blocking the event loop.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Optional, Tuple
+
+from PIL import Image
+
+from . import image_utils
+
+AIOHTTP_IMPORT_ERROR = """
+ERROR: Predicting from a url with asyncio requires aiohttp to be installed on this device.
+Please install lobe-python with lobe[async] or pip install aiohttp.
+"""
+
+# default maximum number of predictions in progress at once
+DEFAULT_MAX_CONCURRENCY = 64
+# default number of threads for decoding and preprocessing images
+DEFAULT_PREPROCESS_WORKERS = 4
+# default number of threads for running the backend (predict is serialized by the backend unless it is concurrent)
+DEFAULT_INFERENCE_WORKERS = 1
+
+
+class AsyncRunner(object):
+    """
+    Holds the resources shared by an ImageModel's async methods: a bounded executor for decoding/preprocessing,
+    a dedicated executor for inference, a limit on the number of predictions in progress, and a pooled HTTP session.
+    Everything is created lazily on first use, and the session belongs to the event loop that first used it.
+    """
+    def __init__(
+            self,
+            max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+            preprocess_workers: int = DEFAULT_PREPROCESS_WORKERS,
+            inference_workers: int = DEFAULT_INFERENCE_WORKERS,
+            session=None,
+            timeout: Optional[float] = None,
+    ):
+        for name, value in [
+            ("max_concurrency", max_concurrency),
+            ("preprocess_workers", preprocess_workers),
+            ("inference_workers", inference_workers),
+        ]:
+            if value < 1:
+                raise ValueError(f"{name} must be a positive integer, got: {value}")
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.preprocess_executor = ThreadPoolExecutor(
+            max_workers=preprocess_workers, thread_name_prefix="lobe-preprocess"
+        )
+        self.inference_executor = ThreadPoolExecutor(
+            max_workers=inference_workers, thread_name_prefix="lobe-inference"
+        )
+        self._session = session
+        self._owns_session = session is None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    @property
+    def session(self):
+        if self._session is None:
+            try:
+                import aiohttp
+            except ImportError:
+                raise ImportError(AIOHTTP_IMPORT_ERROR)
+            timeout = aiohttp.ClientTimeout(total=self.timeout)
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        return self._session
+
+    async def run_preprocess(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.preprocess_executor, func, *args)
+
+    async def run_inference(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.inference_executor, func, *args)
+
+    async def get_image_from_url(self, url: str, size: Optional[Tuple[int, int]] = None) -> Image.Image:
+        """
+        Fetch the image bytes without blocking the event loop, and open it (lazily, in draft mode if size is given).
+        """
+        async with self.session.get(url) as response:
+            response.raise_for_status()
+            content = await response.read()
+        return image_utils.draft_image(Image.open(BytesIO(content)), size)
+
+    async def close(self):
+        """
+        Close the HTTP session (if we created it) and shut down the executors.
+        """
+        if self._session is not None and self._owns_session:
+            await self._session.close()
+        self._session = None
+        self.preprocess_executor.shutdown(wait=False)
+        self.inference_executor.shutdown(wait=False)
@@ -2,27 +2,39 @@
 Abstract for our backend implementations.
 """
 from abc import ABC, abstractmethod
+from typing import Optional, Tuple
 
+from .options import BackendOptions
 from ..signature import Signature
 from ..results import BackendResult
 
 
 class Backend(ABC):
-	def __init__(self, signature: Signature):
+	def __init__(self, signature: Signature, options: Optional[BackendOptions] = None):
 		self.signature = signature
+		self.options = options or BackendOptions()
 
 	@abstractmethod
-	def predict(self, data: any) -> BackendResult:
+	def predict(self, data: any, as_numpy: bool = False) -> BackendResult:
 		"""
 		Predict the outputs by running the data through the model.
 
 		data: can be either a single input value (such as an image array), or a dictionary mapping the input
 		keys from the signature to the data they should be assigned
 
+		as_numpy: if True, keep the output values as NumPy arrays instead of converting them to nested Python lists
+
 		Returns a dictionary in the form of the signature outputs {Name: value, ...}
 		"""
 		pass
 
+	def warmup(self, data: any):
+		"""
+		Run the data through the model once to trigger any lazy allocation or compilation before real predictions.
+		Backends that keep several copies of the model (like a pool of TF Lite interpreters) warm each of them.
+		"""
+		self.predict(data)
+
 
 class ImageBackend(Backend):
 	def gradcam_plusplus(self, image, label: str = None):
@@ -35,3 +47,21 @@ class ImageBackend(Backend):
 		raise NotImplementedError(
 			f"Image backend {self.__class__.__name__} doesn't have a Grad-CAM++ implementation yet."
 		)
+
+	def gradcam_plusplus_fast(self, image, label: str = None):
+		"""
+		Return the heatmap from Grad-CAM++, using the paper's closed form for the higher-order derivatives
+		of an exponential class score so only a single backward pass is needed
+		"""
+		raise NotImplementedError(
+			f"Image backend {self.__class__.__name__} doesn't have a Grad-CAM++ implementation yet."
+		)
+
+	def predict_with_gradcam_plusplus(self, image, fast: bool = False) -> Tuple[BackendResult, any]:
+		"""
+		Predict the images and return the outputs along with the Grad-CAM++ heatmaps for the predicted labels,
+		sharing a single forward pass. With fast, use the closed form as in gradcam_plusplus_fast.
+		"""
+		raise NotImplementedError(
+			f"Image backend {self.__class__.__name__} doesn't have a Grad-CAM++ implementation yet."
+		)
@@ -1,7 +1,16 @@
+import json
+import os
+from contextlib import nullcontext
 from threading import Lock
+from typing import Optional
+
+from ..options import (
+    BackendOptions, GRAPH_OPTIMIZATION_DISABLE, GRAPH_OPTIMIZATION_BASIC, GRAPH_OPTIMIZATION_EXTENDED,
+    GRAPH_OPTIMIZATION_ALL
+)
 from ...signature import Signature
 from ...signature_constants import TENSOR_NAME
-from ...utils import decode_dict_bytes_as_str
+from ...utils import decode_dict_bytes_as_str, decode_dict_arrays_bytes_as_str
 
 ONNX_IMPORT_ERROR = """
 ERROR: This is an ONNX model and requires onnx runtime to be installed on this device. 
@@ -21,24 +30,81 @@ class ONNXModel(object):
     """
     Generic wrapper for running an ONNX model exported from Lobe
     """
-    def __init__(self, signature: Signature):
+    def __init__(self, signature: Signature, options: Optional[BackendOptions] = None):
         model_path = "{}/{}".format(
             signature.model_path, signature.filename
         )
         self.signature = signature
+        self.options = options or BackendOptions()
 
         # load our onnx inference session
-        self.session = rt.InferenceSession(path_or_bytes=model_path)
+        load_path, session_options = self._session_options(model_path)
+        self.session = rt.InferenceSession(
+            path_or_bytes=load_path, sess_options=session_options, providers=self.options.execution_providers
+        )
+        if session_options.optimized_model_filepath:
+            # record what the graph was optimized for, now that onnx runtime has saved it
+            with open(_cache_key_path(session_options.optimized_model_filepath), "w") as f:
+                json.dump(self._cache_key(model_path), f)
+
+        # InferenceSession.run is thread-safe, so in concurrent mode we don't need to serialize predictions
+        self.lock = nullcontext() if self.options.concurrent else Lock()
 
-        self.lock = Lock()
+    def _session_options(self, model_path: str):
+        """
+        Build the ONNX Runtime session options from our backend options.
+        Returns the model path to load (which is the cached optimized graph if we have one) and the session options.
+        The cached graph is only reused if it was optimized from the same model file with the same optimization level,
+        execution providers and onnx runtime version (see _cache_key), otherwise it's optimized and saved again.
+        """
+        options = self.options
+        session_options = rt.SessionOptions()
+        if options.num_threads is not None:
+            session_options.intra_op_num_threads = options.num_threads
+        if options.inter_op_num_threads is not None:
+            session_options.inter_op_num_threads = options.inter_op_num_threads
+        if options.graph_optimization_level is not None:
+            session_options.graph_optimization_level = {
+                GRAPH_OPTIMIZATION_DISABLE: rt.GraphOptimizationLevel.ORT_DISABLE_ALL,
+                GRAPH_OPTIMIZATION_BASIC: rt.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+                GRAPH_OPTIMIZATION_EXTENDED: rt.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+                GRAPH_OPTIMIZATION_ALL: rt.GraphOptimizationLevel.ORT_ENABLE_ALL,
+            }[options.graph_optimization_level]
+
+        optimized_path = options.optimized_model_path
+        if optimized_path:
+            if os.path.isfile(optimized_path) and _read_cache_key(optimized_path) == self._cache_key(model_path):
+                # the graph was already optimized by a previous load, so use it as-is
+                session_options.graph_optimization_level = rt.GraphOptimizationLevel.ORT_DISABLE_ALL
+                model_path = optimized_path
+            else:
+                session_options.optimized_model_filepath = optimized_path
+        return model_path, session_options
+
+    def _cache_key(self, model_path: str) -> dict:
+        """
+        Everything the saved optimized graph depends on. Optimizations can be specific to the execution providers
+        (e.g. fused GPU kernels), so a graph optimized for one set of providers or level can't be reused for another.
+        """
+        stat = os.stat(model_path)
+        return {
+            "model_path": os.path.abspath(model_path),
+            "model_size": stat.st_size,
+            "model_mtime_ns": stat.st_mtime_ns,
+            "graph_optimization_level": self.options.graph_optimization_level,
+            "execution_providers": self.options.execution_providers,
+            "onnxruntime_version": rt.__version__,
+        }
 
-    def predict(self, data):
+    def predict(self, data, as_numpy: bool = False):
         """
         Predict the outputs by running the data through the model.
 
         data: can be either a single input value (such as an image array), or a dictionary mapping the input
         keys from the signature to the data they should be assigned
 
+        as_numpy: if True, keep the output values as NumPy arrays instead of converting them to nested Python lists
+
         Returns a dictionary in the form of the signature outputs {Name: value, ...}
         """
         # make the predict function thread-safe
@@ -69,7 +135,25 @@ class ONNXModel(object):
             # make our return a dict from the list of outputs that correspond to the fetches
             results = {}
             for i, (key, _) in enumerate(fetches):
-                results[key] = outputs[i].tolist()
+                results[key] = outputs[i] if as_numpy else outputs[i].tolist()
             # postprocessing! convert any byte strings to normal strings with .decode()
-            decode_dict_bytes_as_str(results)
+            if as_numpy:
+                decode_dict_arrays_bytes_as_str(results)
+            else:
+                decode_dict_bytes_as_str(results)
             return results
+
+
+def _cache_key_path(optimized_path: str) -> str:
+    return optimized_path + ".json"
+
+
+def _read_cache_key(optimized_path: str) -> Optional[dict]:
+    """
+    Read the sidecar describing how the optimized graph was made, or None if it's missing or unreadable.
+    """
+    try:
+        with open(_cache_key_path(optimized_path)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
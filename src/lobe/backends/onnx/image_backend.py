@@ -1,11 +1,14 @@
+from typing import Optional
+
 from .backend import ONNXModel
 from ..backend import ImageBackend
+from ..options import BackendOptions
 from ...signature import ImageClassificationSignature
 
 
 class ONNXImageModel(ONNXModel, ImageBackend):
-    def __init__(self, signature: ImageClassificationSignature):
-        super(ONNXImageModel, self).__init__(signature=signature)
+    def __init__(self, signature: ImageClassificationSignature, options: Optional[BackendOptions] = None):
+        super(ONNXImageModel, self).__init__(signature=signature, options=options)
 
     def gradcam_plusplus(self, image, label=None):
         super(ONNXImageModel, self).gradcam_plusplus(image=image, label=label)
@@ -0,0 +1,80 @@
+"""
+Runtime options for configuring how the backends load and run a model.
+"""
+from typing import List, Optional
+
+# graph optimization levels for ONNX Runtime (GraphOptimizationLevel.ORT_DISABLE_ALL ... ORT_ENABLE_ALL)
+GRAPH_OPTIMIZATION_DISABLE = 'disable'
+GRAPH_OPTIMIZATION_BASIC = 'basic'
+GRAPH_OPTIMIZATION_EXTENDED = 'extended'
+GRAPH_OPTIMIZATION_ALL = 'all'
+GRAPH_OPTIMIZATION_LEVELS = [
+    GRAPH_OPTIMIZATION_DISABLE, GRAPH_OPTIMIZATION_BASIC, GRAPH_OPTIMIZATION_EXTENDED, GRAPH_OPTIMIZATION_ALL
+]
+
+
+class BackendOptions(object):
+    """
+    Options passed through ImageModel.load(path, backend_options=...) to the backend. Unset (None) options keep the
+    runtime's defaults, and options that don't apply to the model's backend are ignored.
+
+    num_threads: intra-op threads for a single inference (ONNX, TF Lite, TensorFlow). Pin this per worker process
+        to avoid oversubscribing the cores when running several models or processes.
+    inter_op_num_threads: threads for running independent ops in parallel (ONNX, TensorFlow).
+    graph_optimization_level: one of 'disable', 'basic', 'extended', 'all' (ONNX).
+    execution_providers: ordered ONNX Runtime execution providers, e.g. ['CUDAExecutionProvider', 'CPUExecutionProvider'].
+    optimized_model_path: file to save the optimized ONNX graph to, so the graph isn't optimized again on every cold
+        start. The optimized graph is only valid for the options it was made with, so a sidecar `<path>.json` records
+        the source model, graph_optimization_level, execution_providers and onnx runtime version; when any of them
+        change, the graph is optimized and saved again. Use a separate path for each set of options to keep both.
+    use_xnnpack: enable (True) or disable (False) the XNNPACK delegate that TF Lite applies by default.
+    tflite_delegates: paths of extra TF Lite delegate libraries to load, e.g. 'libedgetpu.so.1'.
+    concurrent: let predict run from multiple threads at once instead of serializing calls behind a lock. ONNX Runtime
+        sessions and TensorFlow functions are already thread-safe, while TF Lite checks out an interpreter per call
+        from a pool sharing the same model buffer.
+    interpreter_pool_size: maximum number of TF Lite interpreters in concurrent mode (defaults to the CPU count).
+    """
+    def __init__(
+            self,
+            num_threads: Optional[int] = None,
+            inter_op_num_threads: Optional[int] = None,
+            graph_optimization_level: Optional[str] = None,
+            execution_providers: Optional[List[str]] = None,
+            optimized_model_path: Optional[str] = None,
+            use_xnnpack: Optional[bool] = None,
+            tflite_delegates: Optional[List[str]] = None,
+            concurrent: bool = False,
+            interpreter_pool_size: Optional[int] = None,
+    ):
+        for name, value in [
+            ("num_threads", num_threads),
+            ("inter_op_num_threads", inter_op_num_threads),
+            ("interpreter_pool_size", interpreter_pool_size),
+        ]:
+            if value is not None and (not isinstance(value, int) or value < 1):
+                raise ValueError(f"{name} must be a positive integer, got: {value}")
+        if graph_optimization_level is not None and graph_optimization_level not in GRAPH_OPTIMIZATION_LEVELS:
+            raise ValueError(
+                f"graph_optimization_level `{graph_optimization_level}` not recognized, try one of: {GRAPH_OPTIMIZATION_LEVELS}."
+            )
+        if execution_providers is not None and not isinstance(execution_providers, (list, tuple)):
+            raise ValueError(f"execution_providers must be a list of provider names, got: {execution_providers}")
+        if tflite_delegates is not None and not isinstance(tflite_delegates, (list, tuple)):
+            raise ValueError(f"tflite_delegates must be a list of delegate library paths, got: {tflite_delegates}")
+
+        self.num_threads = num_threads
+        self.inter_op_num_threads = inter_op_num_threads
+        self.graph_optimization_level = graph_optimization_level
+        self.execution_providers = list(execution_providers) if execution_providers is not None else None
+        self.optimized_model_path = optimized_model_path
+        self.use_xnnpack = use_xnnpack
+        self.tflite_delegates = list(tflite_delegates) if tflite_delegates is not None else None
+        self.concurrent = concurrent
+        self.interpreter_pool_size = interpreter_pool_size
+
+    def as_dict(self):
+        return dict(vars(self))
+
+    def __repr__(self):
+        options = ", ".join(f"{key}={value!r}" for key, value in self.as_dict().items() if value is not None)
+        return f"{self.__class__.__name__}({options})"
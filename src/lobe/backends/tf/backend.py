@@ -1,8 +1,11 @@
+from contextlib import nullcontext
 from threading import Lock
+from typing import Optional
 
 from ..backend import Backend
+from ..options import BackendOptions
 from ...signature import Signature
-from ...utils import decode_dict_bytes_as_str
+from ...utils import decode_dict_bytes_as_str, decode_dict_arrays_bytes_as_str
 
 TF_IMPORT_ERROR = """
 ERROR: This is a TensorFlow model and requires tensorflow to be installed on this device. 
@@ -12,29 +15,50 @@ If that doesn't work, please go to https://www.tensorflow.org/install for instru
 
 try:
     import tensorflow as tf
-    from tensorflow.python.training.tracking.tracking import AutoTrackable
 except ImportError:
     raise ImportError(TF_IMPORT_ERROR)
+try:
+    from tensorflow.python.trackable.autotrackable import AutoTrackable
+except ImportError:
+    # before TensorFlow 2.11
+    from tensorflow.python.training.tracking.tracking import AutoTrackable
 
 
 class TFModel(Backend):
     """
     Generic wrapper for running a TensorFlow model from Lobe.
     """
-    def __init__(self, signature: Signature):
-        super(TFModel, self).__init__(signature=signature)
-        self.lock = Lock()
+    def __init__(self, signature: Signature, options: Optional[BackendOptions] = None):
+        super(TFModel, self).__init__(signature=signature, options=options)
+        # concrete functions can be called from multiple threads, so in concurrent mode we don't serialize predictions
+        self.lock = nullcontext() if self.options.concurrent else Lock()
+        self._set_threading()
 
         self.model: AutoTrackable = tf.saved_model.load(export_dir=self.signature.model_path, tags=self.signature.tags)
         self.predict_fn = self.model.signatures['serving_default']
 
-    def predict(self, data):
+    def _set_threading(self):
+        """
+        Apply the thread count options. These are process-wide in TensorFlow and can only be changed before
+        the runtime is initialized, so they are skipped (keeping the current values) after that.
+        """
+        try:
+            if self.options.num_threads is not None:
+                tf.config.threading.set_intra_op_parallelism_threads(self.options.num_threads)
+            if self.options.inter_op_num_threads is not None:
+                tf.config.threading.set_inter_op_parallelism_threads(self.options.inter_op_num_threads)
+        except RuntimeError:
+            pass
+
+    def predict(self, data, as_numpy: bool = False):
         """
         Predict the outputs by running the data through the model.
 
         data: can be either a single input value (such as an image array), or a dictionary mapping the input
         keys from the signature to the data they should be assigned
 
+        as_numpy: if True, keep the output values as NumPy arrays instead of converting them to nested Python lists
+
         Returns a dictionary in the form of the signature outputs {Name: value, ...}
         """
         with self.lock:
@@ -63,6 +87,9 @@ class TFModel(Backend):
             # postprocessing! make our output dictionary and convert any byte strings to normal strings with .decode()
             results = {}
             for i, (key, tf_val) in enumerate(outputs.items()):
-                results[key] = tf_val.numpy().tolist()
-            decode_dict_bytes_as_str(results)
+                results[key] = tf_val.numpy() if as_numpy else tf_val.numpy().tolist()
+            if as_numpy:
+                decode_dict_arrays_bytes_as_str(results)
+            else:
+                decode_dict_bytes_as_str(results)
             return results
@@ -1,10 +1,15 @@
+from threading import Lock
+from typing import Callable, Dict, Optional, Tuple
+
 from .backend import TFModel, TF_IMPORT_ERROR
 from ..backend import ImageBackend
+from ..options import BackendOptions
 from ...signature import ImageClassificationSignature
+from ...results import BackendResult
 
 import numpy as np
 
-from ...signature_constants import SUPPORTED_EXPORT_VERSIONS, LABEL_CONFIDENCES, LABEL_CONFIDENCES_COMPAT, IMAGE_INPUT, TENSOR_NAME
+from ...signature_constants import SUPPORTED_EXPORT_VERSIONS, LABEL_CONFIDENCES, LABEL_CONFIDENCES_COMPAT, IMAGE_INPUT, TENSOR_NAME, TENSOR_SHAPE
 from ...utils import dict_get_compat
 
 try:
@@ -16,9 +21,14 @@ except ImportError:
 class TFImageModel(TFModel, ImageBackend):
     signature: ImageClassificationSignature
 
-    def __init__(self, signature: ImageClassificationSignature):
-        super(TFImageModel, self).__init__(signature=signature)
-        
+    def __init__(self, signature: ImageClassificationSignature, options: Optional[BackendOptions] = None):
+        super(TFImageModel, self).__init__(signature=signature, options=options)
+        # the pruned sub-graphs and the compiled Grad-CAM++ functions built from them, all created on first use
+        self._gradcam_subgraphs = None
+        # (fast, takes a label mask) -> compiled function
+        self._gradcam_fns: Dict[Tuple[bool, bool], Callable] = {}
+        self._gradcam_lock = Lock()
+
     def gradcam_plusplus(self, image: np.ndarray, label=None) -> np.ndarray:
         """
         Implementation of Grad-CAM++,
@@ -31,6 +41,46 @@ class TFImageModel(TFModel, ImageBackend):
           year={2017}
         }
         """
+        label_mask = self._get_label_mask(image=image, label=label)
+        gradcam_plusplus_fn = self._get_gradcam_fn(fast=False, with_label_mask=True)
+        with self.lock:
+            _, cam = gradcam_plusplus_fn(tf.constant(image, dtype=tf.float32), label_mask)
+            return cam.numpy()
+
+    def gradcam_plusplus_fast(self, image: np.ndarray, label=None) -> np.ndarray:
+        """
+        Grad-CAM++ with the closed form higher-order derivatives from the paper (section 3.3), which only takes
+        a single backward pass instead of three nested ones.
+
+        When the class score is passed through an exponential (like the softmax 'Confidences' output),
+        the second and third derivatives of exp(S) are exp(S) times the square and cube of the first derivative
+        of the logit S, for networks that are piecewise linear after the last conv layer (ReLUs). The exp(S) factor
+        cancels out of the normalized heatmap, so the gradient of the logit is all we need. For those heads the
+        heatmaps match gradcam_plusplus (which differentiates exp(S) with nested tapes) to within float32 precision,
+        for other heads they can differ.
+        """
+        label_mask = self._get_label_mask(image=image, label=label)
+        gradcam_plusplus_fast_fn = self._get_gradcam_fn(fast=True, with_label_mask=True)
+        with self.lock:
+            _, cam = gradcam_plusplus_fast_fn(tf.constant(image, dtype=tf.float32), label_mask)
+            return cam.numpy()
+
+    def predict_with_gradcam_plusplus(self, image: np.ndarray, fast: bool = False) -> Tuple[BackendResult, np.ndarray]:
+        """
+        Predict the images and explain the predicted labels with one forward pass: the logits that the gradients are
+        taken from also give the confidences (the 'Confidences' output is their softmax).
+        Returns the outputs dictionary with the confidences (as a NumPy array) and the Grad-CAM++ heatmaps.
+        """
+        gradcam_fn = self._get_gradcam_fn(fast=fast, with_label_mask=False)
+        confidences_key = self._get_confidences_key()
+        with self.lock:
+            last_fc_out, cam = gradcam_fn(tf.constant(image, dtype=tf.float32))
+            return {confidences_key: tf.nn.softmax(last_fc_out).numpy()}, cam.numpy()
+
+    def _get_label_mask(self, image: np.ndarray, label=None):
+        """
+        Return a one-hot vector of the label indices for each image, to use as a mask for the output cost.
+        """
         labels = self.signature.classes
         # Get the output index of the desired label for visualizing
         # If no desired label is given, find the predicted label by running the model on the image
@@ -42,14 +92,19 @@ class TFImageModel(TFModel, ImageBackend):
                 label_idx = [labels.index(_label) for _label in label]
             else:
                 label_idx = [labels.index(label)]
-        # create a one-hot vector of our label indices to use as a mask for the output cost
-        label_idx = tf.one_hot(label_idx, depth=len(labels))
-        if len(label_idx) != len(image):
+        label_mask = tf.one_hot(label_idx, depth=len(labels), dtype=tf.float32)
+        if len(label_mask) != len(image):
             raise ValueError(
-                f"Supplied label (or list of labels) does not match the the number of input images. Images : {len(image)}, labels: {len(label_idx)}"
+                f"Supplied label (or list of labels) does not match the the number of input images. Images : {len(image)}, labels: {len(label_mask)}"
             )
+        return label_mask
 
-        with self.lock:
+    def _get_gradcam_subgraphs(self):
+        """
+        Find the last conv and fc layers, and prune the model into the image -> conv and conv -> fc functions.
+        This graph surgery is slow, so it is done once and cached. Expects the _gradcam_lock to be held.
+        """
+        if self._gradcam_subgraphs is None:
             # now we want to get the derivatives of the output with respect to the last conv layer
             # get the layer name of the confidences logits output and the last convolutional layer
             last_fc_tensor, last_conv_tensor = self._get_last_fc_and_conv_tensors()
@@ -58,57 +113,33 @@ class TFImageModel(TFModel, ImageBackend):
             input_image_name = self.signature.inputs[IMAGE_INPUT][TENSOR_NAME]
             last_conv_fn = self.model.prune(input_image_name, last_conv_tensor.name)
             last_fc_fn = self.model.prune(last_conv_tensor.name, last_fc_tensor.name)
+            self._gradcam_subgraphs = last_conv_fn, last_fc_fn
+        return self._gradcam_subgraphs
 
-            # get the last conv out
-            last_conv_out = last_conv_fn(tf.constant(image))
-
-            # take the 3 derivatives of the cost wrt the conv layer
-            with tf.GradientTape() as t3:
-                t3.watch(last_conv_out)
-                with tf.GradientTape() as t2:
-                    t2.watch(last_conv_out)
-                    with tf.GradientTape() as t1:
-                        t1.watch(last_conv_out)
-                        last_fc_out = last_fc_fn(last_conv_out)
-                        # get the output neuron corresponding to the class of interest
-                        cost = last_fc_out * label_idx
-                        # first derivative
-                        conv_first_grad = t1.gradient(cost, last_conv_out)
-                    # second derivative
-                    conv_second_grad = t2.gradient(conv_first_grad, last_conv_out)
-                # triple derivative
-                conv_third_grad = t3.gradient(conv_second_grad, last_conv_out)
-
-            batch, _, _, filters = last_conv_out.shape
-
-            global_sum = tf.math.reduce_sum(last_conv_out, axis=[1, 2])
-
-            alpha_num = conv_second_grad
-            broadcasted_global_sum = tf.reshape(global_sum, (batch, 1, 1, filters))
-            alpha_denom = conv_second_grad * 2.0 + conv_third_grad * broadcasted_global_sum
-            alpha_denom = tf.where(alpha_denom != 0.0, alpha_denom, tf.ones(alpha_denom.shape))
-            alphas = alpha_num / alpha_denom
-
-            weights = tf.maximum(conv_first_grad, 0.0)
-
-            alphas_thresholding = tf.where(weights != 0.0, alphas, 0.0)
-
-            alpha_normalization_constant = tf.math.reduce_sum(alphas_thresholding, axis=[1, 2])
-            alpha_normalization_constant_processed = tf.where(alpha_normalization_constant != 0.0,
-                                                              alpha_normalization_constant,
-                                                              tf.ones(alpha_normalization_constant.shape))
-
-            alphas /= tf.reshape(alpha_normalization_constant_processed, (batch, 1, 1, filters))
-
-            deep_linearization_weights = tf.math.reduce_sum((weights * alphas), axis=[1, 2])
-            broadcasted_deep_lin_weights = tf.reshape(deep_linearization_weights, (batch, 1, 1, filters))
-            grad_CAM_map = tf.math.reduce_sum(broadcasted_deep_lin_weights * last_conv_out, axis=3)
-
-            # Passing through ReLU
-            cam = tf.maximum(grad_CAM_map, 0)
-            cam_max = tf.math.reduce_max(cam, axis=[1, 2])
-            cam /= tf.reshape(cam_max, (batch, 1, 1))  # scale 0 to 1.0
-            return cam.numpy()
+    def _get_gradcam_fn(self, fast: bool, with_label_mask: bool):
+        """
+        Compile (once) the function from images, and a one-hot label mask if with_label_mask (otherwise the predicted
+        labels are used), to the logits and Grad-CAM++ heatmaps. The batch size can vary between calls.
+        """
+        with self._gradcam_lock:
+            key = (fast, with_label_mask)
+            if key not in self._gradcam_fns:
+                last_conv_fn, last_fc_fn = self._get_gradcam_subgraphs()
+                _, height, width, channels = self.signature.inputs[IMAGE_INPUT][TENSOR_SHAPE]
+                image_spec = tf.TensorSpec(shape=[None, height, width, channels], dtype=tf.float32)
+                if with_label_mask:
+                    label_mask_spec = tf.TensorSpec(shape=[None, len(self.signature.classes)], dtype=tf.float32)
+
+                    @tf.function(input_signature=[image_spec, label_mask_spec])
+                    def gradcam_fn(image, label_mask):
+                        return _gradcam_plusplus_from_conv(last_fc_fn, last_conv_fn(image), label_mask, fast=fast)
+                else:
+                    @tf.function(input_signature=[image_spec])
+                    def gradcam_fn(image):
+                        return _gradcam_plusplus_from_conv(last_fc_fn, last_conv_fn(image), fast=fast)
+
+                self._gradcam_fns[key] = gradcam_fn
+            return self._gradcam_fns[key]
 
     def _get_predicted_label_argmax(self, image: np.ndarray):
         """
@@ -125,6 +156,12 @@ class TFImageModel(TFModel, ImageBackend):
         )
         return tf.argmax(confidences, axis=1)
 
+    def _get_confidences_key(self) -> str:
+        _, confidences_key = dict_get_compat(
+            in_dict=self.signature.outputs, current_key=LABEL_CONFIDENCES, compat_keys=LABEL_CONFIDENCES_COMPAT
+        )
+        return confidences_key
+
     def _get_last_fc_and_conv_tensors(self):
         """
         Gets the tensor that represents the last fully-connected layer outputs (logits).
@@ -143,11 +180,11 @@ class TFImageModel(TFModel, ImageBackend):
         # now from the last fc layer, bfs search for the closest max pooling op and find its input -- that is the
         # last conv layer output (the RELU tensor)
         last_conv_tensor = None
-        visited, queue = [], []
+        visited, queue = set(), []
         queue.append(last_fc_tensor)
         while queue:
             tensor = queue.pop()
-            visited.append(tensor.name)
+            visited.add(tensor.name)
             op = tensor.op
             # if this was from the max/avg pool op, get the input tensor
             # (which is the output of the last conv layer's relu)
@@ -160,3 +197,83 @@ class TFImageModel(TFModel, ImageBackend):
                         queue.append(input_tensor)
 
         return last_fc_tensor, last_conv_tensor
+
+
+def _gradcam_plusplus_from_conv(last_fc_fn, last_conv_out, label_mask=None, fast: bool = False):
+    """
+    Run the last conv layer's output through the fc sub-graph once, and return the logits along with the Grad-CAM++
+    heatmaps for the labels in label_mask (or the predicted labels if it is None).
+    With fast, the higher-order derivatives use the closed form (see TFImageModel.gradcam_plusplus_fast).
+    """
+    def get_score(last_fc_out):
+        mask = label_mask
+        if mask is None:
+            mask = tf.one_hot(tf.argmax(last_fc_out, axis=1), depth=last_fc_out.shape[-1], dtype=last_fc_out.dtype)
+        # get the output neuron (logit) corresponding to the class of interest
+        return tf.reduce_sum(last_fc_out * mask, axis=1)
+
+    if fast:
+        with tf.GradientTape() as tape:
+            tape.watch(last_conv_out)
+            last_fc_out = last_fc_fn(last_conv_out)
+            cost = get_score(last_fc_out)
+        conv_grad = tape.gradient(cost, last_conv_out)
+        conv_grad_squared = conv_grad * conv_grad
+        cam = _gradcam_plusplus_heatmap(last_conv_out, conv_grad, conv_grad_squared, conv_grad_squared * conv_grad)
+        return last_fc_out, cam
+
+    # take the 3 derivatives of the cost wrt the conv layer
+    with tf.GradientTape() as t3:
+        t3.watch(last_conv_out)
+        with tf.GradientTape() as t2:
+            t2.watch(last_conv_out)
+            with tf.GradientTape() as t1:
+                t1.watch(last_conv_out)
+                last_fc_out = last_fc_fn(last_conv_out)
+                # the paper's class score is exp(S): the higher-order derivatives of the logit S alone are all zero for
+                # a head that is piecewise linear after the last conv layer, which would leave an empty heatmap.
+                # Shifting by S (without a gradient) keeps the value at 1, so it can't overflow, and the shared exp(S)
+                # factor cancels out of the normalized heatmap anyway.
+                score = get_score(last_fc_out)
+                cost = tf.exp(score - tf.stop_gradient(score))
+                # first derivative
+                conv_first_grad = t1.gradient(cost, last_conv_out)
+            # second derivative
+            conv_second_grad = t2.gradient(conv_first_grad, last_conv_out)
+        # triple derivative
+        conv_third_grad = t3.gradient(conv_second_grad, last_conv_out)
+
+    return last_fc_out, _gradcam_plusplus_heatmap(last_conv_out, conv_first_grad, conv_second_grad, conv_third_grad)
+
+
+def _gradcam_plusplus_heatmap(last_conv_out, conv_first_grad, conv_second_grad, conv_third_grad):
+    """
+    Combine the last conv layer's output and the first three derivatives of the class score with respect to it into
+    the Grad-CAM++ heatmaps (batch, height, width), scaled 0 to 1.0
+    """
+    global_sum = tf.math.reduce_sum(last_conv_out, axis=[1, 2], keepdims=True)
+
+    alpha_num = conv_second_grad
+    alpha_denom = conv_second_grad * 2.0 + conv_third_grad * global_sum
+    alpha_denom = tf.where(alpha_denom != 0.0, alpha_denom, tf.ones_like(alpha_denom))
+    alphas = alpha_num / alpha_denom
+
+    weights = tf.maximum(conv_first_grad, 0.0)
+
+    alphas_thresholding = tf.where(weights != 0.0, alphas, 0.0)
+
+    alpha_normalization_constant = tf.math.reduce_sum(alphas_thresholding, axis=[1, 2], keepdims=True)
+    alpha_normalization_constant_processed = tf.where(alpha_normalization_constant != 0.0,
+                                                      alpha_normalization_constant,
+                                                      tf.ones_like(alpha_normalization_constant))
+
+    alphas /= alpha_normalization_constant_processed
+
+    deep_linearization_weights = tf.math.reduce_sum((weights * alphas), axis=[1, 2], keepdims=True)
+    grad_CAM_map = tf.math.reduce_sum(deep_linearization_weights * last_conv_out, axis=3)
+
+    # Passing through ReLU
+    cam = tf.maximum(grad_CAM_map, 0)
+    cam_max = tf.math.reduce_max(cam, axis=[1, 2], keepdims=True)
+    # scale 0 to 1.0 (leaving all zero heatmaps as zeros)
+    return tf.math.divide_no_nan(cam, cam_max)
@@ -1,8 +1,16 @@
+import os
+from contextlib import contextmanager
+from queue import Queue, Empty
 from threading import Lock
+from typing import Optional
+
+import numpy as np
+
 from ..backend import Backend
+from ..options import BackendOptions
 from ...signature import Signature
 from ...signature_constants import TENSOR_NAME
-from ...utils import decode_dict_bytes_as_str
+from ...utils import decode_dict_bytes_as_str, decode_dict_arrays_bytes_as_str
 
 TFLITE_IMPORT_ERROR = """
 ERROR: This is a TensorFlow Lite model and requires TensorFlow Lite interpreter to be installed on this device. 
@@ -24,13 +32,29 @@ class TFLiteModel(Backend):
     """
     Generic wrapper for running a TF Lite model exported from Lobe
     """
-    def __init__(self, signature: Signature):
-        super(TFLiteModel, self).__init__(signature=signature)
+    def __init__(self, signature: Signature, options: Optional[BackendOptions] = None):
+        super(TFLiteModel, self).__init__(signature=signature, options=options)
         model_path = "{}/{}".format(
             signature.model_path, signature.filename
         )
-        self.interpreter = tflite.Interpreter(model_path=model_path)
-        self.interpreter.allocate_tensors()
+        self.lock = Lock()
+
+        # interpreters aren't thread-safe, so each prediction checks one out of this pool. Unless the concurrent option
+        # is set there is only one (which serializes predict), otherwise they are created on demand up to the pool size
+        # and share the same model buffer.
+        self._pool_size = 1
+        self._model_content = None
+        if self.options.concurrent:
+            self._pool_size = self.options.interpreter_pool_size or os.cpu_count() or 1
+            with open(model_path, "rb") as f:
+                self._model_content = f.read()
+        self._model_path = model_path
+        # keep track of the currently allocated shape of each interpreter's input tensors, so we only resize on changes
+        self._input_shapes = {}
+        self.interpreter = self._make_interpreter()
+        self._pool = Queue()
+        self._pool.put(self.interpreter)
+        self._num_interpreters = 1
 
         # Combine the information about the inputs and outputs from the signature.json file
         # with the Interpreter runtime details
@@ -44,45 +68,138 @@ class TFLiteModel(Backend):
             key: {**sig, **output_details.get(sig.get(TENSOR_NAME))}
             for key, sig in self.signature.outputs.items()
         }
-        self.lock = Lock()
 
-    def predict(self, data):
+    def _make_interpreter(self):
+        if self._model_content is not None:
+            interpreter = tflite.Interpreter(model_content=self._model_content, **self._interpreter_kwargs())
+        else:
+            interpreter = tflite.Interpreter(model_path=self._model_path, **self._interpreter_kwargs())
+        interpreter.allocate_tensors()
+        self._input_shapes[interpreter] = {
+            detail.get("index"): list(detail.get("shape")) for detail in interpreter.get_input_details()
+        }
+        return interpreter
+
+    @contextmanager
+    def _checkout_interpreter(self):
+        """
+        Take an idle interpreter from the pool (creating one if the pool isn't full yet, otherwise waiting for one),
+        and return it to the pool when done.
+        """
+        try:
+            interpreter = self._pool.get_nowait()
+        except Empty:
+            with self.lock:
+                create = self._num_interpreters < self._pool_size
+                if create:
+                    self._num_interpreters += 1
+            interpreter = self._make_interpreter() if create else self._pool.get()
+        try:
+            yield interpreter
+        finally:
+            self._pool.put(interpreter)
+
+    def _interpreter_kwargs(self):
+        """
+        Build the Interpreter keyword arguments from our backend options.
+        """
+        kwargs = {}
+        # tensorflow.lite keeps these under tf.lite.experimental, while tflite_runtime.interpreter has them at the top
+        experimental = getattr(tflite, "experimental", tflite)
+        if self.options.num_threads is not None:
+            kwargs["num_threads"] = self.options.num_threads
+        if self.options.tflite_delegates:
+            kwargs["experimental_delegates"] = [
+                experimental.load_delegate(path) for path in self.options.tflite_delegates
+            ]
+        if self.options.use_xnnpack is not None:
+            # XNNPACK is one of the default delegates, so it's turned off by using the op resolver without them
+            op_resolver_type = experimental.OpResolverType
+            kwargs["experimental_op_resolver_type"] = (
+                op_resolver_type.AUTO if self.options.use_xnnpack
+                else op_resolver_type.BUILTIN_WITHOUT_DEFAULT_DELEGATES
+            )
+        return kwargs
+
+    def predict(self, data, as_numpy: bool = False):
         """
         Predict the outputs by running the data through the model.
 
         data: can be either a single input value (such as an image array), or a dictionary mapping the input
         keys from the signature to the data they should be assigned
 
+        as_numpy: if True, keep the output values as NumPy arrays instead of converting them to nested Python lists
+
         Returns a dictionary in the form of the signature outputs {Name: value, ...}
         """
         # make the predict function thread-safe
+        with self._checkout_interpreter() as interpreter:
+            return self._predict_with(interpreter, data, as_numpy=as_numpy)
+
+    def warmup(self, data):
+        """
+        Create the whole interpreter pool up front and run the data through every interpreter, so none of them
+        allocate their tensors (or reallocate them for the batch size) on a real prediction later.
+        """
         with self.lock:
-            # set the model inputs with our supplied data
-            if not isinstance(data, dict):
-                # if data isn't a dictionary, set the input to the supplied value
-                # throw an error if more than 1 input found and we are only supplied a non-dictionary input
-                if len(self.model_inputs) > 1:
-                    raise ValueError(
-                        f"Found more than 1 model input: {list(self.model_inputs.keys())}, while supplied data wasn't a dictionary: {data}"
-                    )
-                self.interpreter.set_tensor(list(self.model_inputs.values())[0].get("index"), data)
-            else:
-                # otherwise, assign data to inputs based on the dictionary
-                for input_name, input_detail in self.model_inputs.items():
-                    if input_name not in data:
-                        raise ValueError(f"Couldn't find input {input_name} in the supplied data {data}")
-                    self.interpreter.set_tensor(input_detail.get("index"), data.get(input_name))
-
-            # invoke the interpreter -- runs the model with the set inputs
-            self.interpreter.invoke()
-
-            # grab our desired outputs from the interpreter
-            # convert to normal python types with tolist()
-            outputs = {
-                key: self.interpreter.get_tensor(value.get("index")).tolist()
-                for key, value in self.model_outputs.items()
-            }
-
-            # postprocessing! convert any byte strings to normal strings with .decode()
+            missing = self._pool_size - self._num_interpreters
+            self._num_interpreters = self._pool_size
+        for _ in range(missing):
+            self._pool.put(self._make_interpreter())
+        # hold every interpreter at once, so each of them runs the data exactly once
+        interpreters = [self._pool.get() for _ in range(self._pool_size)]
+        try:
+            for interpreter in interpreters:
+                self._predict_with(interpreter, data)
+        finally:
+            for interpreter in interpreters:
+                self._pool.put(interpreter)
+
+    def _predict_with(self, interpreter, data, as_numpy: bool = False):
+        # set the model inputs with our supplied data
+        if not isinstance(data, dict):
+            # if data isn't a dictionary, set the input to the supplied value
+            # throw an error if more than 1 input found and we are only supplied a non-dictionary input
+            if len(self.model_inputs) > 1:
+                raise ValueError(
+                    f"Found more than 1 model input: {list(self.model_inputs.keys())}, while supplied data wasn't a dictionary: {data}"
+                )
+            self._set_input_tensor(interpreter, list(self.model_inputs.values())[0], data)
+        else:
+            # otherwise, assign data to inputs based on the dictionary
+            for input_name, input_detail in self.model_inputs.items():
+                if input_name not in data:
+                    raise ValueError(f"Couldn't find input {input_name} in the supplied data {data}")
+                self._set_input_tensor(interpreter, input_detail, data.get(input_name))
+
+        # invoke the interpreter -- runs the model with the set inputs
+        interpreter.invoke()
+
+        # grab our desired outputs from the interpreter (get_tensor returns a copy, so these are safe to keep)
+        # convert to normal python types with tolist() unless we want the raw arrays
+        outputs = {
+            key: interpreter.get_tensor(value.get("index"))
+            for key, value in self.model_outputs.items()
+        }
+
+        # postprocessing! convert any byte strings to normal strings with .decode()
+        if as_numpy:
+            decode_dict_arrays_bytes_as_str(outputs)
+        else:
+            outputs = {key: value.tolist() for key, value in outputs.items()}
             decode_dict_bytes_as_str(outputs)
-            return outputs
+        return outputs
+
+    def _set_input_tensor(self, interpreter, input_detail, value):
+        """
+        Set the interpreter input tensor to the value, resizing the input (e.g. for a new batch size) if needed.
+        TF Lite models have a fixed input shape, so we need to reallocate the tensors whenever that shape changes.
+        """
+        index = input_detail.get("index")
+        shape = list(np.shape(value))
+        input_shapes = self._input_shapes[interpreter]
+        if input_shapes.get(index) != shape:
+            interpreter.resize_tensor_input(index, shape)
+            interpreter.allocate_tensors()
+            input_shapes[index] = shape
+        interpreter.set_tensor(index, value)
@@ -1,11 +1,14 @@
+from typing import Optional
+
 from .backend import TFLiteModel
 from ..backend import ImageBackend
+from ..options import BackendOptions
 from ...signature import ImageClassificationSignature
 
 
 class TFLiteImageModel(TFLiteModel, ImageBackend):
-    def __init__(self, signature: ImageClassificationSignature):
-        super(TFLiteImageModel, self).__init__(signature=signature)
+    def __init__(self, signature: ImageClassificationSignature, options: Optional[BackendOptions] = None):
+        super(TFLiteImageModel, self).__init__(signature=signature, options=options)
 
     def gradcam_plusplus(self, image, label=None):
         super(TFLiteImageModel, self).gradcam_plusplus(image=image, label=label)
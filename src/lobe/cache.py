@@ -0,0 +1,198 @@
+"""
+Cache of model predictions keyed by the content hash of the image, so repeated images skip the backend.
+"""
+import hashlib
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Optional, Tuple, Dict
+
+import numpy as np
+
+from .results import BackendResult
+from .signature import Signature
+
+DEFAULT_MAX_ENTRIES = 4096
+DEFAULT_MAX_DISK_BYTES = 256 * 1024 * 1024
+
+
+def hash_bytes(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def hash_array(array: np.ndarray) -> str:
+    """
+    Hash the array's pixels (along with its shape and dtype, so differently shaped inputs never collide)
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{array.shape}{array.dtype}".encode("utf-8"))
+    digest.update(np.ascontiguousarray(array).data)
+    return digest.hexdigest()
+
+
+class PredictionCache(object):
+    """
+    Two-tier cache of backend results for single images, keyed by (signature id, signature version, content hash).
+
+    The in-memory tier is an LRU holding up to max_entries results. If a path is given, results are also stored in a
+    SQLite database there, evicting the least recently used rows once they take up more than max_disk_bytes.
+    Each version of a model keeps its own entries, so several versions can share the cache (say while one is being
+    rolled out), and entries of versions that are no longer used age out through the LRU and size limits.
+
+    Usage:
+        model = ImageModel.load('path/to/model')
+        model.cache = PredictionCache(path='predictions.sqlite')
+    """
+    def __init__(
+            self,
+            max_entries: int = DEFAULT_MAX_ENTRIES,
+            path: Optional[str] = None,
+            max_disk_bytes: int = DEFAULT_MAX_DISK_BYTES,
+    ):
+        if max_entries < 0:
+            raise ValueError(f"max_entries must not be negative, got: {max_entries}")
+        self.max_entries = max_entries
+        self.path = path
+        self.max_disk_bytes = max_disk_bytes
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._lock = Lock()
+        self._memory: "OrderedDict[Tuple[str, str, str], BackendResult]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        self._disk_bytes = 0
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS predictions ("
+                "model_id TEXT, model_version TEXT, key TEXT, results TEXT, size INTEGER, accessed REAL, "
+                "PRIMARY KEY (model_id, model_version, key))"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS predictions_accessed ON predictions (accessed)")
+            self._db.commit()
+            self._disk_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM predictions").fetchone()[0]
+
+    def get(self, signature: Signature, key: str) -> Optional[BackendResult]:
+        with self._lock:
+            cache_key = self._cache_key(signature, key)
+            results = self._memory.get(cache_key)
+            if results is not None:
+                self._memory.move_to_end(cache_key)
+                self.hits += 1
+                return results
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT results FROM predictions WHERE model_id = ? AND model_version = ? AND key = ?", cache_key
+                ).fetchone()
+                if row is not None:
+                    self._db.execute(
+                        "UPDATE predictions SET accessed = ? WHERE model_id = ? AND model_version = ? AND key = ?",
+                        (time.time(), *cache_key)
+                    )
+                    self._db.commit()
+                    results = _deserialize(row[0])
+                    self._put_memory(cache_key, results)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return results
+
+            self.misses += 1
+            return None
+
+    def put(self, signature: Signature, key: str, results: BackendResult):
+        # copy any array views so we don't keep the rest of a batch alive
+        results = {
+            name: value.copy() if isinstance(value, np.ndarray) else value for name, value in results.items()
+        }
+        with self._lock:
+            cache_key = self._cache_key(signature, key)
+            self._put_memory(cache_key, results)
+            if self._db is not None:
+                serialized = _serialize(results)
+                size = len(serialized)
+                previous = self._db.execute(
+                    "SELECT size FROM predictions WHERE model_id = ? AND model_version = ? AND key = ?", cache_key
+                ).fetchone()
+                self._db.execute(
+                    "INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?, ?, ?)",
+                    (*cache_key, serialized, size, time.time())
+                )
+                self._disk_bytes += size - (previous[0] if previous else 0)
+                self._evict_disk()
+                self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM predictions")
+                self._db.commit()
+                self._disk_bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "memory_entries": len(self._memory),
+                "disk_bytes": self._disk_bytes,
+            }
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    @staticmethod
+    def _cache_key(signature: Signature, key: str) -> Tuple[str, str, str]:
+        return str(signature.id), str(signature.version), key
+
+    def _put_memory(self, cache_key: Tuple[str, str, str], results: BackendResult):
+        if self.max_entries == 0:
+            return
+        self._memory[cache_key] = results
+        self._memory.move_to_end(cache_key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self):
+        """
+        Delete the least recently used rows until the database is back under max_disk_bytes.
+        """
+        while self._disk_bytes > self.max_disk_bytes:
+            rows = self._db.execute(
+                "SELECT model_id, model_version, key, size FROM predictions ORDER BY accessed LIMIT 64"
+            ).fetchall()
+            if not rows:
+                self._disk_bytes = 0
+                break
+            for model_id, model_version, key, size in rows:
+                self._db.execute(
+                    "DELETE FROM predictions WHERE model_id = ? AND model_version = ? AND key = ?",
+                    (model_id, model_version, key)
+                )
+                self._disk_bytes -= size
+                if self._disk_bytes <= self.max_disk_bytes:
+                    break
+
+
+def _serialize(results: BackendResult) -> str:
+    return json.dumps({
+        name: value.tolist() if isinstance(value, np.ndarray) else value for name, value in results.items()
+    })
+
+
+def _deserialize(serialized: str) -> BackendResult:
+    results = {}
+    for name, value in json.loads(serialized).items():
+        # numeric outputs go back to arrays, anything else (like legacy label strings) stays as a list
+        array = np.asarray(value)
+        results[name] = array if array.dtype.kind in "fiub" else value
+    return results
@@ -0,0 +1,238 @@
+"""
+Command line interface: `lobe predict path/to/model images/ > predictions.jsonl`
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
+from itertools import islice
+from typing import Iterable, Iterator, List, Tuple, Union, Optional, TextIO
+
+import numpy as np
+
+from . import image_utils
+from .dataset import IMAGE_EXTENSIONS
+from .model.image_model import ImageModel, DEFAULT_BATCH_SIZE
+from .results import ClassificationResult
+
+FORMAT_JSONL = 'jsonl'
+FORMAT_CSV = 'csv'
+CSV_HEADER = ["Path", "Prediction", "Confidence", "Error"]
+
+# how many batches to decode ahead of the one running through the model
+PREFETCH_BATCHES = 2
+# seconds between progress reports on stderr
+STATS_INTERVAL = 10.0
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="lobe", description="Run exported Lobe models.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    predict_parser = commands.add_parser(
+        "predict",
+        help="Classify images, streaming one result per line.",
+        description="Classify a directory, glob, or list of image paths, streaming the results as JSON Lines or CSV. "
+                    "Results are written in the same order as the inputs.",
+    )
+    predict_parser.add_argument("model", help="Path to the exported model folder or its signature.json file.")
+    predict_parser.add_argument(
+        "inputs", nargs="*", default=["-"],
+        help="Image files, directories (searched recursively), or glob patterns. "
+             "Use '-' (the default) to read one path per line from stdin.",
+    )
+    predict_parser.add_argument("-o", "--output", help="Output file (default: stdout).")
+    predict_parser.add_argument("-f", "--format", choices=[FORMAT_JSONL, FORMAT_CSV], default=FORMAT_JSONL)
+    predict_parser.add_argument("-b", "--batch-size", type=_positive_int, default=DEFAULT_BATCH_SIZE)
+    predict_parser.add_argument("-w", "--workers", type=_positive_int, default=os.cpu_count() or 1,
+                                help="Threads for decoding and preprocessing images.")
+    predict_parser.add_argument(
+        "-k", "--top-k", type=_positive_int, default=None, help="Only output the k most likely labels."
+    )
+    predict_parser.add_argument(
+        "--checkpoint",
+        help="File recording how many inputs have been written. If it exists, those inputs are skipped "
+             "and the output file is appended to.",
+    )
+    predict_parser.add_argument("-q", "--quiet", action="store_true", help="Don't print throughput stats to stderr.")
+
+    args = parser.parse_args(argv)
+    try:
+        if args.command == "predict":
+            return predict(args)
+    except BrokenPipeError:
+        # the reader went away (e.g. piped to `head`), which isn't an error worth a traceback. Point stdout at devnull
+        # so the interpreter's final flush doesn't raise again on exit.
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        return 1
+
+
+def predict(args: argparse.Namespace):
+    skip = _read_checkpoint(args.checkpoint)
+    model = ImageModel.load(args.model)
+    paths = islice(iter_image_paths(args.inputs), skip, None)
+
+    output = open(args.output, "a" if skip else "w", encoding="utf8", newline="") if args.output else sys.stdout
+    try:
+        writer = _make_writer(output, args.format, write_header=not skip)
+        start = last_report = time.perf_counter()
+        processed = 0
+        for batch in predict_paths(model, paths, batch_size=args.batch_size, workers=args.workers, top_k=args.top_k):
+            for path, result in batch:
+                writer(path, result)
+            processed += len(batch)
+            output.flush()
+            _write_checkpoint(args.checkpoint, skip + processed)
+
+            now = time.perf_counter()
+            if not args.quiet and now - last_report >= STATS_INTERVAL:
+                _report(processed, now - start)
+                last_report = now
+        if not args.quiet:
+            _report(processed, time.perf_counter() - start)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+def iter_image_paths(inputs: Iterable[str]) -> Iterator[str]:
+    """
+    Lazily expand the inputs into image paths, in a stable order so runs can be resumed.
+    Directories are walked recursively (sorted within each directory), globs are expanded, and '-' reads stdin.
+
+    The stable order is what makes --checkpoint work (it only records how many inputs were written), and it costs
+    holding one listing at a time: a single directory's entries (which os.walk builds anyway), or all the matches
+    of a glob. Use a directory or stdin rather than a glob for inputs with millions of matches.
+    """
+    for item in inputs:
+        if item == "-":
+            for line in sys.stdin:
+                line = line.strip()
+                if line:
+                    yield line
+        elif os.path.isdir(item):
+            for root, dirs, filenames in os.walk(item):
+                dirs.sort()
+                for filename in sorted(filenames):
+                    if filename.lower().endswith(IMAGE_EXTENSIONS):
+                        yield os.path.join(root, filename)
+        elif glob.has_magic(item):
+            # the filesystem's listing order isn't stable between runs, so sort the matches like directories are
+            yield from sorted(glob.iglob(item, recursive=True))
+        else:
+            yield item
+
+
+def predict_paths(
+        model: ImageModel,
+        paths: Iterable[str],
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        workers: int = 4,
+        top_k: Optional[int] = None,
+) -> Iterator[List[Tuple[str, Union[ClassificationResult, Exception]]]]:
+    """
+    Decode and preprocess the images on a thread pool (a couple of batches ahead) while the model runs the current
+    batch. Yields a list of (path, ClassificationResult or the Exception raised for that image) for each batch,
+    in the input order. Only a few batches are held in memory at once, no matter how many paths there are.
+    """
+    def load(path: str) -> np.ndarray:
+        image = image_utils.get_image_from_file(path, size=model.signature.input_image_size)
+        return model.preprocess(image)
+
+    paths = iter(paths)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="lobe-decode") as executor:
+        pending = deque()
+        while True:
+            batch_paths = list(islice(paths, batch_size))
+            if batch_paths:
+                pending.append((batch_paths, [executor.submit(load, path) for path in batch_paths]))
+            if not pending:
+                break
+            if batch_paths and len(pending) <= PREFETCH_BATCHES:
+                continue
+            yield _predict_loaded(model, *pending.popleft(), top_k=top_k)
+
+
+def _predict_loaded(
+        model: ImageModel, paths: List[str], futures: List[Future], top_k: Optional[int]
+) -> List[Tuple[str, Union[ClassificationResult, Exception]]]:
+    outcomes: List[Union[ClassificationResult, Exception, None]] = [None] * len(paths)
+    loaded, image_arrays = [], []
+    for idx, future in enumerate(futures):
+        try:
+            image_arrays.append(future.result())
+            loaded.append(idx)
+        except Exception as e:
+            outcomes[idx] = e
+    if image_arrays:
+        try:
+            for idx, result in zip(loaded, model.predict_arrays(np.concatenate(image_arrays), top_k=top_k)):
+                outcomes[idx] = result
+        except Exception as e:
+            for idx in loaded:
+                outcomes[idx] = e
+    return list(zip(paths, outcomes))
+
+
+def _positive_int(value: str) -> int:
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be a positive integer, got: {value}")
+    return number
+
+
+def _make_writer(output: TextIO, output_format: str, write_header: bool = True):
+    if output_format == FORMAT_CSV:
+        csv_writer = csv.writer(output)
+        if write_header:
+            csv_writer.writerow(CSV_HEADER)
+
+        def write_csv(path: str, result: Union[ClassificationResult, Exception]):
+            if isinstance(result, Exception):
+                csv_writer.writerow([path, "", "", str(result)])
+            else:
+                confidence = result.labels[0][1] if result.labels else ""
+                csv_writer.writerow([path, result.prediction, confidence, ""])
+        return write_csv
+
+    def write_jsonl(path: str, result: Union[ClassificationResult, Exception]):
+        if isinstance(result, Exception):
+            record = {"Path": path, "Error": str(result)}
+        else:
+            record = {"Path": path, **result.as_dict()}
+        output.write(json.dumps(record) + "\n")
+    return write_jsonl
+
+
+def _read_checkpoint(checkpoint: Optional[str]) -> int:
+    if checkpoint and os.path.isfile(checkpoint):
+        with open(checkpoint, "r", encoding="utf8") as f:
+            return int(json.load(f).get("processed", 0))
+    return 0
+
+
+def _write_checkpoint(checkpoint: Optional[str], processed: int):
+    if checkpoint:
+        # write to a temporary file and rename it, so an interruption never leaves a partial checkpoint
+        tmp_path = f"{checkpoint}.tmp"
+        with open(tmp_path, "w", encoding="utf8") as f:
+            json.dump({"processed": processed}, f)
+        os.replace(tmp_path, checkpoint)
+
+
+def _report(processed: int, elapsed: float):
+    rate = processed / elapsed if elapsed > 0 else 0.0
+    print(f"lobe: {processed} images in {elapsed:.1f}s ({rate:.1f} images/s)", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""
+Preprocess a directory of images once into a memory-mapped array, for fast repeated evaluation.
+"""
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple, Iterator, Iterable, Optional
+
+import numpy as np
+
+from . import image_utils
+
+# the dataset directory contains the pixel array and an index mapping image paths to rows
+ARRAY_FILENAME = "images.npy"
+INDEX_FILENAME = "index.json"
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".gif", ".tif", ".tiff", ".webp")
+
+
+class PreprocessedDataset(object):
+    """
+    Images already resized and cropped to a model's input size, stored as a uint8 (count, height, width, 3) .npy file
+    that is memory-mapped rather than loaded, along with an index.json of the image paths for each row.
+
+    Build it once with PreprocessedDataset.build(image_dir, dataset_dir, size), then evaluate as many models
+    (with the same input size) as you like with ImageModel.predict_dataset(PreprocessedDataset(dataset_dir)).
+    """
+    def __init__(self, dataset_dir: str):
+        self.dataset_dir = dataset_dir
+        with open(os.path.join(dataset_dir, INDEX_FILENAME), "r", encoding="utf8") as f:
+            index = json.load(f)
+        self.paths: List[str] = index["paths"]
+        # the size given to build, which image_utils reads as (width, height). ImageModel.predict_dataset compares it
+        # with the signature's input_image_size, which is the input tensor's (height, width): like ImageModel.predict,
+        # that's only the same thing for square inputs (which is what Lobe exports)
+        self.size: Tuple[int, int] = tuple(index["size"])
+        self.failed: List[str] = index.get("failed", [])
+        self.images: np.ndarray = np.load(os.path.join(dataset_dir, ARRAY_FILENAME), mmap_mode="r")[:len(self.paths)]
+
+    @classmethod
+    def build(
+            cls,
+            image_dir: str,
+            dataset_dir: str,
+            size: Tuple[int, int],
+            extensions: Iterable[str] = IMAGE_EXTENSIONS,
+            workers: int = 4,
+    ) -> 'PreprocessedDataset':
+        """
+        Decode and preprocess every image under image_dir (recursively) to size, writing them to dataset_dir.
+        Images that fail to decode are skipped and listed as 'failed' in the index.
+        """
+        extensions = tuple(extension.lower() for extension in extensions)
+        paths = sorted(
+            os.path.join(root, filename)
+            for root, _, filenames in os.walk(image_dir)
+            for filename in filenames
+            if filename.lower().endswith(extensions)
+        )
+        os.makedirs(dataset_dir, exist_ok=True)
+        width, height = size
+        images = np.lib.format.open_memmap(
+            os.path.join(dataset_dir, ARRAY_FILENAME), mode="w+", dtype=np.uint8, shape=(len(paths), height, width, 3)
+        )
+
+        def load(path: str) -> Optional[np.ndarray]:
+            try:
+                image = image_utils.get_image_from_file(path, size=size)
+                return np.asarray(image_utils.preprocess_image_fast(image, size))
+            except (OSError, ValueError):
+                return None
+
+        # decoding and resizing release the GIL, so threads keep the cores busy; map keeps the rows in path order
+        stored_paths, failed = [], []
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for path, pixels in zip(paths, executor.map(load, paths)):
+                if pixels is None:
+                    failed.append(path)
+                    continue
+                images[len(stored_paths)] = pixels
+                stored_paths.append(path)
+        images.flush()
+        del images
+
+        with open(os.path.join(dataset_dir, INDEX_FILENAME), "w", encoding="utf8") as f:
+            json.dump({"size": list(size), "paths": stored_paths, "failed": failed}, f)
+        return cls(dataset_dir)
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def batches(self, batch_size: int) -> Iterator[Tuple[List[str], np.ndarray]]:
+        """
+        Yield (paths, float32 image arrays) for each batch, converting only that batch from the uint8 memory map.
+        """
+        if batch_size < 1:
+            raise ValueError(f"batch_size must be a positive integer, got: {batch_size}")
+        for start in range(0, len(self.paths), batch_size):
+            image_arrays = self.images[start:start + batch_size].astype(np.float32)
+            # make 0-1 float instead of 0-255 int, the same as image_utils.image_to_array
+            image_arrays /= 255.0
+            yield self.paths[start:start + batch_size], image_arrays
@@ -0,0 +1,90 @@
+"""
+Reusable HTTP client with connection pooling, timeouts and retries for fetching images and calling the local API.
+"""
+from threading import Lock
+from typing import Optional, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# (connect, read) timeouts in seconds
+DEFAULT_TIMEOUT = (5.0, 30.0)
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF_FACTOR = 0.2
+DEFAULT_POOL_SIZE = 16
+# retry on these statuses as well as on connection errors
+RETRY_STATUSES = [429, 500, 502, 503, 504]
+
+
+class HTTPClient(object):
+    """
+    Wraps a requests.Session so connections (and TLS sessions) are kept alive and reused between calls,
+    instead of opening a new connection for every image.
+
+    pool_size: the maximum number of connections kept open per host (use at least your request concurrency)
+    timeout: seconds to wait for the server, either a single value or a (connect, read) tuple
+    retries: how many times to retry connection errors and 429/5xx responses, with exponential backoff
+    """
+    def __init__(
+            self,
+            pool_size: int = DEFAULT_POOL_SIZE,
+            timeout: Optional[Union[float, Tuple[float, float]]] = DEFAULT_TIMEOUT,
+            retries: int = DEFAULT_RETRIES,
+            backoff_factor: float = DEFAULT_BACKOFF_FACTOR,
+    ):
+        if pool_size < 1:
+            raise ValueError(f"pool_size must be a positive integer, got: {pool_size}")
+        if retries < 0:
+            raise ValueError(f"retries must not be negative, got: {retries}")
+        self.timeout = timeout
+        retry = _make_retry(retries, backoff_factor)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.get(url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.post(url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def _make_retry(retries: int, backoff_factor: float) -> Retry:
+    kwargs = dict(
+        total=retries, backoff_factor=backoff_factor, status_forcelist=RETRY_STATUSES, raise_on_status=False
+    )
+    # POST is safe to retry here since our predict requests don't change any server state
+    try:
+        return Retry(allowed_methods=None, **kwargs)
+    except TypeError:
+        # urllib3 < 1.26 calls it method_whitelist (and a false value retries any method)
+        return Retry(method_whitelist=False, **kwargs)
+
+
+_default_client: Optional[HTTPClient] = None
+_default_client_lock = Lock()
+
+
+def get_default_client() -> HTTPClient:
+    """
+    The shared client used when no client is passed in, created on first use.
+    """
+    global _default_client
+    if _default_client is None:
+        with _default_client_lock:
+            if _default_client is None:
+                _default_client = HTTPClient()
+    return _default_client
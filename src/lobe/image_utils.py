@@ -1,10 +1,12 @@
 from io import BytesIO
 from PIL import Image
 import numpy as np
-from typing import Tuple
-import requests
+from typing import TYPE_CHECKING, Tuple, List, Optional, Union
 import base64
 
+if TYPE_CHECKING:
+    from .http_client import HTTPClient
+
 
 def crop_center(image: Image.Image, size: Tuple[int, int]) -> Image.Image:
     crop_width, crop_height = size
@@ -44,19 +46,30 @@ def resize_uniform_to_fit(image: Image.Image, size: Tuple[int, int]) -> Image.Im
 
 
 def update_orientation(image: Image.Image) -> Image.Image:
+    return _apply_orientation(image, _get_orientation(image))
+
+
+def _get_orientation(image: Image.Image) -> int:
+    """
+    Return the zero-based EXIF orientation of the image (0 means no transformation is needed)
+    """
     exif_orientation_tag = 0x0112
     if hasattr(image, '_getexif'):
         exif = image._getexif()
         if exif != None and exif_orientation_tag in exif:
-            orientation = exif.get(exif_orientation_tag, 1)
-            # orientation is 1 based, shift to zero based and flip/transpose based on 0-based values
-            orientation -= 1
-            if orientation >= 4:
-                image = image.transpose(Image.TRANSPOSE)
-            if orientation == 2 or orientation == 3 or orientation == 6 or orientation == 7:
-                image = image.transpose(Image.FLIP_TOP_BOTTOM)
-            if orientation == 1 or orientation == 2 or orientation == 5 or orientation == 6:
-                image = image.transpose(Image.FLIP_LEFT_RIGHT)
+            # orientation is 1 based, shift to zero based
+            return exif.get(exif_orientation_tag, 1) - 1
+    return 0
+
+
+def _apply_orientation(image: Image.Image, orientation: int) -> Image.Image:
+    # flip/transpose based on the 0-based orientation values
+    if orientation >= 4:
+        image = image.transpose(Image.TRANSPOSE)
+    if orientation == 2 or orientation == 3 or orientation == 6 or orientation == 7:
+        image = image.transpose(Image.FLIP_TOP_BOTTOM)
+    if orientation == 1 or orientation == 2 or orientation == 5 or orientation == 6:
+        image = image.transpose(Image.FLIP_LEFT_RIGHT)
     return image
 
 
@@ -64,21 +77,71 @@ def ensure_rgb_format(image: Image.Image) -> Image.Image:
     return image.convert("RGB")
 
 
-def image_to_base64(image: Image.Image) -> str:
-    buffer = BytesIO()
-    ensure_rgb_format(image).save(buffer,format="JPEG")
-    return base64.b64encode(buffer.getvalue()).decode("utf-8")
+def image_to_base64(image: Image.Image, size: Optional[Tuple[int, int]] = None) -> str:
+    return base64.b64encode(image_to_jpeg_bytes(image, size)).decode("utf-8")
 
 
-def get_image_from_url(url: str) -> Image.Image:
-    response = requests.get(url)
+def image_to_jpeg_bytes(image: Image.Image, size: Optional[Tuple[int, int]] = None) -> bytes:
+    """
+    Encode the image as JPEG. If size is given, larger images are first shrunk (keeping their aspect ratio) to the
+    smallest size that still fills it, since there's no point sending more pixels than the model will look at.
+    The image itself is left untouched, the shrinking happens on a resized copy.
+    """
+    if size:
+        width, height = image.size
+        min_w, min_h = size
+        if min_w / width < 1 and min_h / height < 1:
+            image = resize_uniform_to_fill(image, size)
+    buffer = BytesIO()
+    ensure_rgb_format(image).save(buffer,format="JPEG")
+    return buffer.getvalue()
+
+
+def encoded_image_bytes(data: Union[str, bytes], size: Optional[Tuple[int, int]] = None) -> bytes:
+    """
+    Given an image file path or encoded image bytes, return JPEG bytes for it. RGB JPEGs that don't need to be shrunk
+    to size are passed through untouched, without decoding and re-encoding them.
+    """
+    if isinstance(data, str):
+        with open(data, "rb") as f:
+            data = f.read()
+    image = Image.open(BytesIO(data))
+    # grayscale and CMYK JPEGs are still converted to RGB, like every other image
+    if image.format == "JPEG" and image.mode == "RGB":
+        width, height = image.size
+        if not size or width <= size[0] or height <= size[1]:
+            return data
+    # we opened this image ourselves, so it's safe to draft it to decode at a smaller scale
+    return image_to_jpeg_bytes(draft_image(image, size), size)
+
+
+def get_image_from_url(
+        url: str, size: Optional[Tuple[int, int]] = None, client: Optional['HTTPClient'] = None
+) -> Image.Image:
+    # requests is only imported when we first fetch a url, since it's slow to import
+    from .http_client import get_default_client
+    # reuse pooled connections (with timeouts and retries) instead of opening a new connection for every image
+    response = (client or get_default_client()).get(url)
     response.raise_for_status()
     image = Image.open(BytesIO(response.content))
-    return image
+    return draft_image(image, size)
+
 
+def get_image_from_file(path: str, size: Optional[Tuple[int, int]] = None) -> Image.Image:
+    return draft_image(Image.open(path), size)
 
-def get_image_from_file(path: str) -> Image.Image:
-    return Image.open(path)
+
+def draft_image(image: Image.Image, size: Optional[Tuple[int, int]]) -> Image.Image:
+    """
+    Configure a lazily opened image to decode at the smallest scale that still covers the target size.
+    For JPEGs, libjpeg can decode directly at 1/2, 1/4 or 1/8 scale, which is much faster and uses far less memory
+    than decoding at the full resolution just to resize it down later. Other formats are left untouched.
+    """
+    if size:
+        # the EXIF orientation may swap the width and height, so make sure both dimensions cover the largest target
+        target = max(size)
+        image.draft(image.mode, (target, target))
+    return image
 
 
 def preprocess_image(image: Image.Image, size: Tuple[int, int]) -> Image.Image:
@@ -91,6 +154,84 @@ def preprocess_image(image: Image.Image, size: Tuple[int, int]) -> Image.Image:
     return image_processed
 
 
+def preprocess_image_to_array(
+        image: Image.Image, size: Tuple[int, int], out: Optional[np.ndarray] = None, reducing_gap: Optional[float] = 3.0
+) -> np.ndarray:
+    """
+    Fast path for image_to_array(preprocess_image(image, size)).
+
+    Instead of orienting, resizing and cropping the full resolution image, this computes the center crop box first
+    and resizes only that region of the source in one step, then orients the small result. The pixels are written
+    straight into `out` (a (height, width, 3) float32 array, such as a row of a preallocated batch) and scaled in place.
+    If `out` isn't supplied, a new (1, height, width, 3) array is returned.
+
+    With the default reducing_gap, PIL first shrinks large images by an integer factor before resampling, which is
+    much faster for camera-sized inputs. Outputs then match the PIL chain to within 3/255 per channel (mean difference
+    under 1/255); pass reducing_gap=None to match it to within 2/255 (mean difference under 0.1/255).
+    """
+    image_processed = preprocess_image_fast(image, size, reducing_gap=reducing_gap)
+    if out is None:
+        out = np.empty((1, image_processed.height, image_processed.width, 3), dtype=np.float32)
+        out[0] = np.asarray(image_processed)
+    else:
+        out[...] = np.asarray(image_processed)
+    # make 0-1 float instead of 0-255 int, without an intermediate float64 copy
+    out /= 255.0
+    return out
+
+
+def preprocess_image_fast(image: Image.Image, size: Tuple[int, int], reducing_gap: Optional[float] = 3.0) -> Image.Image:
+    """
+    Same result as preprocess_image (an oriented, RGB, center cropped image of the given size), but resizes only the
+    crop region of the source in one step. See preprocess_image_to_array for the tolerance.
+    """
+    orientation = _get_orientation(image)
+    # modes that can't be resampled directly (palette, alpha, CMYK, ...) need to be converted up front
+    if image.mode not in ("RGB", "L"):
+        image = ensure_rgb_format(image)
+
+    # find the crop box in the oriented image coordinates, the same way as resize_uniform_to_fill + crop_center
+    width, height = image.size
+    transposed = orientation >= 4
+    oriented_width, oriented_height = (height, width) if transposed else (width, height)
+    crop_width, crop_height = size
+    scale = max(crop_width / oriented_width, crop_height / oriented_height)
+    resized_width, resized_height = round(scale * oriented_width), round(scale * oriented_height)
+    left = max(0, (resized_width - crop_width) // 2)
+    top = max(0, (resized_height - crop_height) // 2)
+    right = min(resized_width, left + crop_width)
+    bottom = min(resized_height, top + crop_height)
+    scale_x, scale_y = oriented_width / resized_width, oriented_height / resized_height
+    # clamp to the image, since the scaled edges can land a rounding error outside it (flipping that would give a
+    # negative offset)
+    x0, y0 = left * scale_x, top * scale_y
+    x1, y1 = min(right * scale_x, oriented_width), min(bottom * scale_y, oriented_height)
+    target_size = (right - left, bottom - top)
+
+    # map the box back to the source coordinates by undoing the orientation (flips first, then the transpose)
+    if orientation == 1 or orientation == 2 or orientation == 5 or orientation == 6:
+        x0, x1 = oriented_width - x1, oriented_width - x0
+    if orientation == 2 or orientation == 3 or orientation == 6 or orientation == 7:
+        y0, y1 = oriented_height - y1, oriented_height - y0
+    if transposed:
+        x0, y0, x1, y1 = y0, x0, y1, x1
+        target_size = (target_size[1], target_size[0])
+
+    image_processed = image.resize(target_size, box=(x0, y0, x1, y1), reducing_gap=reducing_gap)
+    return ensure_rgb_format(_apply_orientation(image_processed, orientation))
+
+
+def images_to_array(images: List[Image.Image], size: Tuple[int, int], reducing_gap: Optional[float] = 3.0) -> np.ndarray:
+    """
+    Preprocess the images into a single preallocated (batch, height, width, 3) float32 array.
+    """
+    width, height = size
+    batch = np.empty((len(images), height, width, 3), dtype=np.float32)
+    for i, image in enumerate(images):
+        preprocess_image_to_array(image, size, out=batch[i], reducing_gap=reducing_gap)
+    return batch
+
+
 def image_to_array(image: Image.Image) -> np.ndarray:
     # make 0-1 float instead of 0-255 int (that PIL Image loads by default)
     image = np.asarray(image) / 255.0
@@ -1,80 +1,445 @@
 """
 Load a Lobe saved model for image classification
 """
-from typing import Dict, Union, Optional, List
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait, as_completed, FIRST_COMPLETED
+from functools import lru_cache
+from io import BytesIO
+from itertools import islice
+from typing import TYPE_CHECKING, Dict, Union, Optional, List, Iterable, Iterator, Tuple
 
 import numpy as np
 from PIL import Image
-from matplotlib import cm
-from matplotlib.colors import Colormap
 
 from .model import Model
 from .. import image_utils
 from ..backends.backend import ImageBackend
+from ..dataset import PreprocessedDataset
+from ..backends.options import BackendOptions
 from ..signature import ImageClassificationSignature
-from ..signature_constants import TF_MODEL, TFLITE_MODEL, ONNX_MODEL
-from ..results import ClassificationResult
+from ..stream import StreamPrediction, predict_stream
+from ..signature_constants import TF_MODEL, TFLITE_MODEL, ONNX_MODEL, IMAGE_INPUT, TENSOR_SHAPE
+from ..results import ClassificationResult, split_batch_results
+
+# matplotlib, requests, asyncio and sqlite3 are imported on first use, so `import lobe` stays fast for
+# applications that only predict
+if TYPE_CHECKING:
+    from matplotlib.colors import Colormap
+    from ..async_utils import AsyncRunner
+    from ..cache import PredictionCache
+    from ..http_client import HTTPClient
+
+# default maximum number of images to run through the backend in a single call for batched predictions
+DEFAULT_BATCH_SIZE = 32
+# default number of urls to download at once in predict_from_urls
+DEFAULT_URL_CONCURRENCY = 8
+# default batch sizes to run through the backend when warming up a model
+DEFAULT_WARMUP_BATCH_SIZES = (1,)
+# default number of images to compute heatmaps for at once in visualize_iter
+DEFAULT_VIZ_CHUNK_SIZE = 16
+
+# keys of ImageModel.load_timings
+SIGNATURE_LOAD_TIME = 'signature'
+BACKEND_LOAD_TIME = 'backend'
+WARMUP_TIME = 'warmup'
 
 
 class VizEnum:
     GRADCAM_PLUSPLUS = 'gradcam_plusplus'
+    GRADCAM_PLUSPLUS_FAST = 'gradcam_plusplus_fast'
 
 
 class ImageModel(Model):
     signature: ImageClassificationSignature
 
     @classmethod
-    def load_from_signature(cls, signature: ImageClassificationSignature):
+    def load_from_signature(
+            cls,
+            signature: ImageClassificationSignature,
+            backend_options: Optional[BackendOptions] = None,
+            warmup: bool = False,
+            warmup_batch_sizes: Optional[Iterable[int]] = None,
+    ):
+        if backend_options is not None and not isinstance(backend_options, BackendOptions):
+            raise ValueError(f"backend_options must be a BackendOptions instance, got: {backend_options}")
+        start = time.perf_counter()
         # Select the appropriate backend
         model_format = signature.format
         if model_format == TF_MODEL:
             from ..backends.tf.image_backend import TFImageModel
-            return cls(signature, TFImageModel(signature))
+            backend = TFImageModel(signature, options=backend_options)
         elif model_format == TFLITE_MODEL:
             from ..backends.tflite.image_backend import TFLiteImageModel
-            return cls(signature, TFLiteImageModel(signature))
+            backend = TFLiteImageModel(signature, options=backend_options)
         elif model_format == ONNX_MODEL:
             from ..backends.onnx.image_backend import ONNXImageModel
-            return cls(signature, ONNXImageModel(signature))
+            backend = ONNXImageModel(signature, options=backend_options)
         else:
             raise ValueError(f"Model is an unsupported format: {model_format}")
+        model = cls(signature, backend)
+        model.load_timings[BACKEND_LOAD_TIME] = time.perf_counter() - start
+        if warmup:
+            model.warmup(warmup_batch_sizes)
+        return model
 
     @classmethod
-    def load(cls, model_path: str):
+    def load(
+            cls,
+            model_path: str,
+            backend_options: Optional[BackendOptions] = None,
+            warmup: bool = False,
+            warmup_batch_sizes: Optional[Iterable[int]] = None,
+    ):
+        """
+        Load the exported model at model_path (the model folder or its signature.json file).
+        With warmup, a blank input of each of warmup_batch_sizes (default: just 1) is run through the backend before
+        returning, so the first real predictions don't pay for the runtime's lazy allocations and optimizations.
+        The seconds spent in each phase are recorded in the model's load_timings.
+        """
         # Load the signature
-        return cls.load_from_signature(ImageClassificationSignature(model_path))
+        start = time.perf_counter()
+        signature = ImageClassificationSignature(model_path)
+        signature_time = time.perf_counter() - start
+        model = cls.load_from_signature(
+            signature, backend_options=backend_options, warmup=warmup, warmup_batch_sizes=warmup_batch_sizes
+        )
+        model.load_timings[SIGNATURE_LOAD_TIME] = signature_time
+        return model
+
+    @classmethod
+    def load_in_background(
+            cls,
+            model_path: str,
+            backend_options: Optional[BackendOptions] = None,
+            warmup: bool = True,
+            warmup_batch_sizes: Optional[Iterable[int]] = None,
+    ) -> Future:
+        """
+        Same as load (but warming up by default) on a background thread, so the process can carry on, such as
+        answering health checks, while the model loads. Returns a Future for the ImageModel; any error loading it
+        is raised from future.result().
+        """
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="lobe-load")
+        try:
+            return executor.submit(
+                cls.load, model_path, backend_options=backend_options,
+                warmup=warmup, warmup_batch_sizes=warmup_batch_sizes
+            )
+        finally:
+            # doesn't wait for the load, the thread exits once it's done
+            executor.shutdown(wait=False)
 
     def __init__(self, signature: ImageClassificationSignature, backend: ImageBackend):
         super(ImageModel, self).__init__(signature)
         self.backend = backend
 
+        # seconds spent parsing the signature, loading the backend and warming it up (see load)
+        self.load_timings: Dict[str, float] = {}
+
+        # optional PredictionCache to skip the backend for images we've already predicted
+        self.cache: Optional['PredictionCache'] = None
+
+        # executors and HTTP session for the async methods, created on first use (see configure_async)
+        self._async_runner: Optional['AsyncRunner'] = None
+
         # register the available visualization functions
         self._viz_functions = {
             VizEnum.GRADCAM_PLUSPLUS: self.backend.gradcam_plusplus,
+            VizEnum.GRADCAM_PLUSPLUS_FAST: self.backend.gradcam_plusplus_fast,
         }
 
-    def predict_from_url(self, url: str):
-        return self.predict(image_utils.get_image_from_url(url))
+    def warmup(self, batch_sizes: Optional[Iterable[int]] = None):
+        """
+        Run a blank input of each batch size (default: just 1), shaped from the signature's image input, through the
+        backend, bypassing any cache. The seconds spent are added to load_timings.
+
+        Put the batch size you expect to serve most first: the sizes are run in reverse so the first one runs last,
+        since TF Lite interpreters stay allocated for the last batch size they ran. With a pool of TF Lite interpreters
+        (BackendOptions(concurrent=True)), every interpreter in the pool is warmed up.
+        """
+        batch_sizes = list(DEFAULT_WARMUP_BATCH_SIZES if batch_sizes is None else batch_sizes)
+        for batch_size in batch_sizes:
+            if not isinstance(batch_size, int) or batch_size < 1:
+                raise ValueError(f"Warm-up batch sizes must be positive integers, got: {batch_size}")
+        _, height, width, channels = self.signature.inputs[IMAGE_INPUT][TENSOR_SHAPE]
+        start = time.perf_counter()
+        for batch_size in reversed(batch_sizes):
+            self.backend.warmup(np.zeros((batch_size, height, width, channels), dtype=np.float32))
+        self.load_timings[WARMUP_TIME] = self.load_timings.get(WARMUP_TIME, 0.0) + time.perf_counter() - start
+
+    def predict_from_url(self, url: str, client: Optional['HTTPClient'] = None):
+        return self.predict(image_utils.get_image_from_url(url, size=self.signature.input_image_size, client=client))
+
+    def predict_from_urls(
+            self,
+            urls: Iterable[str],
+            concurrency: int = DEFAULT_URL_CONCURRENCY,
+            client: Optional['HTTPClient'] = None,
+            top_k: Optional[int] = None,
+            min_confidence: Optional[float] = None,
+    ) -> Iterator[Tuple[str, Union[ClassificationResult, Exception]]]:
+        """
+        Fetch and predict many urls, with up to `concurrency` downloads in flight over pooled connections.
+        Yields (url, ClassificationResult) tuples as soon as each one completes, so the order can differ from `urls`.
+        A url that fails to download or predict yields (url, exception) instead, and the other urls carry on.
+        """
+        if concurrency < 1:
+            raise ValueError(f"concurrency must be a positive integer, got: {concurrency}")
+        if client is None:
+            from ..http_client import get_default_client
+            client = get_default_client()
+
+        def fetch_and_predict(url: str) -> Union[ClassificationResult, Exception]:
+            try:
+                image = image_utils.get_image_from_url(url, size=self.signature.input_image_size, client=client)
+                return self.predict(image, top_k=top_k, min_confidence=min_confidence)
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="lobe-url") as executor:
+            # keep a bounded number of urls in flight so long (or lazy) url iterables don't all get queued up front
+            in_flight = {}
+            for url in urls:
+                in_flight[executor.submit(fetch_and_predict, url)] = url
+                if len(in_flight) >= 2 * concurrency:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield in_flight.pop(future), future.result()
+            for future in as_completed(list(in_flight)):
+                yield in_flight.pop(future), future.result()
 
     def predict_from_file(self, path: str):
-        return self.predict(image_utils.get_image_from_file(path))
+        if self.cache is not None:
+            return self._predict_from_file_cached(path)
+        return self.predict(image_utils.get_image_from_file(path, size=self.signature.input_image_size))
 
-    def predict(self, image: Image.Image) -> ClassificationResult:
-        image_processed = image_utils.preprocess_image(image, self.signature.input_image_size)
-        image_array = image_utils.image_to_array(image_processed)
-        results = self.backend.predict(image_array)
-        classification_results = ClassificationResult(
+    def _predict_from_file_cached(self, path: str) -> ClassificationResult:
+        """
+        Look up the prediction by the hash of the raw file bytes, so cache hits skip decoding and preprocessing too.
+        """
+        from ..cache import hash_bytes
+        with open(path, "rb") as f:
+            data = f.read()
+        key = f"file:{hash_bytes(data)}"
+        results = self.cache.get(self.signature, key)
+        if results is None:
+            image = image_utils.draft_image(Image.open(BytesIO(data)), self.signature.input_image_size)
+            results = self.backend.predict(self.preprocess(image), as_numpy=True)
+            self.cache.put(self.signature, key, results)
+        return ClassificationResult(
             results=results, labels=self.signature.classes, export_version=self.signature.export_version
         )
+
+    def predict(
+            self, image: Image.Image, top_k: Optional[int] = None, min_confidence: Optional[float] = None
+    ) -> ClassificationResult:
+        """
+        Predict the image. Optionally only return the top_k labels, and/or the labels with at least min_confidence.
+        """
+        image_array = self.preprocess(image)
+        if self.cache is not None:
+            return self.predict_arrays(image_array, top_k=top_k, min_confidence=min_confidence)[0]
+        results = self.backend.predict(image_array, as_numpy=True)
+        classification_results = ClassificationResult(
+            results=results, labels=self.signature.classes, export_version=self.signature.export_version,
+            top_k=top_k, min_confidence=min_confidence
+        )
+        return classification_results
+
+    def predict_batch(
+            self,
+            images: List[Image.Image],
+            batch_size: int = DEFAULT_BATCH_SIZE,
+            top_k: Optional[int] = None,
+            min_confidence: Optional[float] = None,
+    ) -> List[ClassificationResult]:
+        """
+        Predict a list of images, running up to batch_size images through the backend in a single call.
+        Returns a list with the ClassificationResult for each image, in the same order as the images.
+        """
+        if batch_size < 1:
+            raise ValueError(f"batch_size must be a positive integer, got: {batch_size}")
+
+        classification_results = []
+        for start in range(0, len(images), batch_size):
+            image_arrays = image_utils.images_to_array(images[start:start + batch_size], self.signature.input_image_size)
+            classification_results.extend(
+                self.predict_arrays(image_arrays, top_k=top_k, min_confidence=min_confidence)
+            )
         return classification_results
 
+    def predict_dataset(
+            self,
+            dataset: PreprocessedDataset,
+            batch_size: int = DEFAULT_BATCH_SIZE,
+            top_k: Optional[int] = None,
+            min_confidence: Optional[float] = None,
+    ) -> Iterator[Tuple[str, ClassificationResult]]:
+        """
+        Predict every image of an already preprocessed dataset, straight from its memory map in batches.
+        Yields (image path, ClassificationResult) tuples in the dataset order.
+        """
+        if tuple(dataset.size) != tuple(self.signature.input_image_size):
+            raise ValueError(
+                f"Dataset image size {dataset.size} doesn't match the model input size {self.signature.input_image_size}"
+            )
+        for paths, image_arrays in dataset.batches(batch_size):
+            results = self.predict_arrays(image_arrays, top_k=top_k, min_confidence=min_confidence)
+            yield from zip(paths, results)
+
+    def predict_stream(
+            self,
+            frames: Iterable[Union[np.ndarray, Image.Image]],
+            drop_frames: bool = True,
+            change_threshold: Optional[float] = None,
+            top_k: Optional[int] = None,
+            min_confidence: Optional[float] = None,
+    ) -> Iterator[StreamPrediction]:
+        """
+        Continuously classify an iterator of frames (PIL images or (height, width, 3) uint8 RGB arrays), such as from
+        a camera. A background thread reads and preprocesses the next frame while the current one runs through
+        the model.
+
+        drop_frames: if inference falls behind, skip stale frames and always predict the latest one
+        change_threshold: if set, frames whose mean absolute pixel difference (on the 0-1 preprocessed image) from the
+            last inferred frame is below this reuse its result instead of running the model again
+        Yields a StreamPrediction (with the result, latency and fps) for each predicted frame.
+        """
+        return predict_stream(
+            self, frames, drop_frames=drop_frames, change_threshold=change_threshold,
+            top_k=top_k, min_confidence=min_confidence
+        )
+
+    def preprocess(self, image: Image.Image) -> np.ndarray:
+        """
+        Resize and crop the image to the model's input size, returning the batched (1, height, width, 3) input array.
+        """
+        return image_utils.preprocess_image_to_array(image, self.signature.input_image_size)
+
+    def predict_arrays(
+            self, image_arrays: np.ndarray, top_k: Optional[int] = None, min_confidence: Optional[float] = None
+    ) -> List[ClassificationResult]:
+        """
+        Run a batch of already preprocessed image arrays (batch, height, width, 3) through the backend in a single call.
+        Returns a list with the ClassificationResult for each image in the batch.
+        If a cache is set, only the images that aren't already cached are run through the backend.
+        """
+        if self.cache is None:
+            results = self.backend.predict(image_arrays, as_numpy=True)
+            return ClassificationResult.from_batch(
+                results=results, labels=self.signature.classes, export_version=self.signature.export_version,
+                top_k=top_k, min_confidence=min_confidence
+            )
+
+        from ..cache import hash_array
+        keys = [f"pixels:{hash_array(image_array)}" for image_array in image_arrays]
+        row_results = [self.cache.get(self.signature, key) for key in keys]
+        misses = [idx for idx, results in enumerate(row_results) if results is None]
+        if misses:
+            missed_arrays = image_arrays if len(misses) == len(keys) else image_arrays[misses]
+            results = self.backend.predict(missed_arrays, as_numpy=True)
+            for idx, results in zip(misses, split_batch_results(results)):
+                self.cache.put(self.signature, keys[idx], results)
+                row_results[idx] = results
+        return [
+            ClassificationResult(
+                results=results, labels=self.signature.classes, export_version=self.signature.export_version,
+                top_k=top_k, min_confidence=min_confidence
+            )
+            for results in row_results
+        ]
+
+    def configure_async(
+            self,
+            max_concurrency: Optional[int] = None,
+            preprocess_workers: Optional[int] = None,
+            inference_workers: Optional[int] = None,
+            session=None,
+            timeout: Optional[float] = None,
+    ):
+        """
+        Configure the async methods: the maximum number of predictions in progress at once, the number of threads for
+        decoding/preprocessing and for inference, and optionally an aiohttp.ClientSession to share for fetching urls
+        (along with the total timeout for each request if we create the session).
+        Counts that aren't given use the defaults from lobe.async_utils.
+        """
+        from ..async_utils import (
+            AsyncRunner, DEFAULT_MAX_CONCURRENCY, DEFAULT_PREPROCESS_WORKERS, DEFAULT_INFERENCE_WORKERS
+        )
+        self._async_runner = AsyncRunner(
+            max_concurrency=DEFAULT_MAX_CONCURRENCY if max_concurrency is None else max_concurrency,
+            preprocess_workers=DEFAULT_PREPROCESS_WORKERS if preprocess_workers is None else preprocess_workers,
+            inference_workers=DEFAULT_INFERENCE_WORKERS if inference_workers is None else inference_workers,
+            session=session,
+            timeout=timeout,
+        )
+
+    @property
+    def async_runner(self) -> 'AsyncRunner':
+        if self._async_runner is None:
+            self.configure_async()
+        return self._async_runner
+
+    async def predict_async(
+            self, image: Image.Image, top_k: Optional[int] = None, min_confidence: Optional[float] = None
+    ) -> ClassificationResult:
+        """
+        Same as predict, but decodes/preprocesses and runs the backend in executors without blocking the event loop.
+        Cancelling the task stops waiting on the result (a backend call that already started will still finish).
+        """
+        runner = self.async_runner
+        async with runner.semaphore:
+            return await self._predict_async(image, top_k=top_k, min_confidence=min_confidence)
+
+    async def predict_from_file_async(
+            self, path: str, top_k: Optional[int] = None, min_confidence: Optional[float] = None
+    ) -> ClassificationResult:
+        """
+        Same as predict_from_file, but opens the file in the preprocessing executor so disk reads don't block the
+        event loop.
+        """
+        runner = self.async_runner
+        async with runner.semaphore:
+            image = await runner.run_preprocess(
+                image_utils.get_image_from_file, path, self.signature.input_image_size
+            )
+            return await self._predict_async(image, top_k=top_k, min_confidence=min_confidence)
+
+    async def predict_from_url_async(
+            self, url: str, top_k: Optional[int] = None, min_confidence: Optional[float] = None
+    ) -> ClassificationResult:
+        """
+        Same as predict_from_url, but fetches the image with a pooled, non-blocking aiohttp session.
+        """
+        runner = self.async_runner
+        async with runner.semaphore:
+            image = await runner.get_image_from_url(url, size=self.signature.input_image_size)
+            return await self._predict_async(image, top_k=top_k, min_confidence=min_confidence)
+
+    async def _predict_async(
+            self, image: Image.Image, top_k: Optional[int] = None, min_confidence: Optional[float] = None
+    ) -> ClassificationResult:
+        runner = self.async_runner
+        image_array = await runner.run_preprocess(self.preprocess, image)
+        results = await runner.run_inference(self.predict_arrays, image_array, top_k, min_confidence)
+        return results[0]
+
+    async def aclose(self):
+        """
+        Release the HTTP session and executors used by the async methods.
+        """
+        if self._async_runner is not None:
+            await self._async_runner.close()
+            self._async_runner = None
+
     def visualize(
             self,
             image: Union[Image.Image, List[Image.Image]],
             label: Union[Optional[str], List[Optional[str]]] = None,
             viz: Optional[str] = VizEnum.GRADCAM_PLUSPLUS,
-            colormap: Union[str, Colormap] = None,
-            opacity=0.5
+            colormap: Union[str, 'Colormap'] = None,
+            opacity=0.5,
+            as_array: bool = False,
     ) -> Union[Union[Image.Image, List[Image.Image]], Dict[str, Union[Image.Image, List[Image.Image]]]]:
         """
         Visualize what the image classification model is using for its output prediction.
@@ -82,6 +447,8 @@ class ImageModel(Model):
         You can optionally supply a matplotlib colormap for colorizing the heatmap on the image.
         You can choose different options for 'viz' to return different methods:
         VizEnum.GRADCAM_PLUSPLUS: Grad-CAM++ (https://arxiv.org/abs/1710.11063) Chattopadhyay et al.
+        VizEnum.GRADCAM_PLUSPLUS_FAST: Grad-CAM++ using the paper's closed form higher-order derivatives for the
+            softmax output, which needs a single backward pass instead of three.
         COMING SOON:
             VizEnum.CNN_FIXATIONS: CNN Fixations (https://arxiv.org/abs/1708.06670) Mopuri et al.
         If 'None' option is given, this will return a dictionary with all options -
@@ -89,6 +456,9 @@ class ImageModel(Model):
 
         This also works in batch mode -- pass a list of images and list of desired labels (or None for using
         the predicted label).
+
+        With as_array, the images are returned as (height, width, 3) uint8 NumPy arrays instead of PIL images,
+        for example to encode them straight to PNG or JPEG with another library.
         """
         if viz is not None and viz not in self._viz_functions:
             raise ValueError(
@@ -117,16 +487,13 @@ class ImageModel(Model):
         for viz_name, viz_func in self._viz_functions.items():
             if viz is None or viz == viz_name:
                 viz_heatmaps = viz_func(image_arrays, label)
-                heatmaps_and_images = zip(viz_heatmaps, preprocessed_images)
-                combined_viz = [
-                    _image_from_heatmap(
-                        heatmap=viz_heatmap,
-                        image=img,
-                        opacity=opacity,
-                        colormap=colormap
-                    )
-                    for viz_heatmap, img in heatmaps_and_images
-                ]
+                combined_viz = _overlay_heatmaps(
+                    heatmaps=viz_heatmaps,
+                    images=preprocessed_images,
+                    opacity=opacity,
+                    colormap=colormap,
+                    as_array=as_array,
+                )
                 if not is_batched:
                     combined_viz = combined_viz[0]
                 viz_return[viz_name] = combined_viz
@@ -136,30 +503,164 @@ class ImageModel(Model):
 
         return viz_return
 
+    def visualize_iter(
+            self,
+            images: Iterable[Union[Image.Image, str]],
+            labels: Optional[Iterable[str]] = None,
+            viz: str = VizEnum.GRADCAM_PLUSPLUS,
+            colormap: Union[str, 'Colormap'] = None,
+            opacity=0.5,
+            chunk_size: int = DEFAULT_VIZ_CHUNK_SIZE,
+            prefetch: bool = True,
+            as_array: bool = False,
+    ) -> Iterator[Union[Image.Image, np.ndarray]]:
+        """
+        Same as visualize for many images (PIL images or image file paths), but lazily in chunks of chunk_size,
+        so memory use stays flat however many images there are. Yields the heatmap image for each input, in order.
+
+        labels: an iterable with the label to visualize for each image (default: the predicted labels)
+        prefetch: decode and preprocess the next chunk on a background thread while the current one is computed
+        as_array: yield (height, width, 3) uint8 NumPy arrays instead of PIL images
+        """
+        if viz not in self._viz_functions:
+            raise ValueError(
+                f"Visualization option `{viz}` not recognized, try one of: {list(self._viz_functions.keys())}."
+            )
+        if chunk_size < 1:
+            raise ValueError(f"chunk_size must be a positive integer, got: {chunk_size}")
+        viz_func = self._viz_functions[viz]
+        size = self.signature.input_image_size
+        images = iter(images)
+        labels = iter(labels) if labels is not None else None
 
-def _image_from_heatmap(heatmap: np.ndarray, image: Image.Image, opacity=0.5, colormap=None) -> Image.Image:
+        def load_chunk():
+            chunk = list(islice(images, chunk_size))
+            if not chunk:
+                return None
+            chunk_labels = None
+            if labels is not None:
+                chunk_labels = list(islice(labels, len(chunk)))
+                if len(chunk_labels) != len(chunk):
+                    raise ValueError("Ran out of labels before images, supply one label for each image.")
+            preprocessed_images = [
+                image_utils.preprocess_image(
+                    image_utils.get_image_from_file(img, size=size) if isinstance(img, str) else img, size
+                )
+                for img in chunk
+            ]
+            image_arrays = np.concatenate([image_utils.image_to_array(img) for img in preprocessed_images])
+            return preprocessed_images, image_arrays, chunk_labels
+
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="lobe-viz-prefetch") as executor:
+            next_chunk = executor.submit(load_chunk) if prefetch else None
+            while True:
+                chunk = next_chunk.result() if prefetch else load_chunk()
+                if chunk is None:
+                    break
+                if prefetch:
+                    next_chunk = executor.submit(load_chunk)
+                preprocessed_images, image_arrays, chunk_labels = chunk
+                viz_heatmaps = viz_func(image_arrays, chunk_labels)
+                yield from _overlay_heatmaps(
+                    heatmaps=viz_heatmaps, images=preprocessed_images, opacity=opacity, colormap=colormap,
+                    as_array=as_array,
+                )
+
+    def predict_with_explanation(
+            self,
+            image: Union[Image.Image, List[Image.Image]],
+            viz: str = VizEnum.GRADCAM_PLUSPLUS,
+            colormap: Union[str, 'Colormap'] = None,
+            opacity=0.5,
+            top_k: Optional[int] = None,
+            min_confidence: Optional[float] = None,
+            as_array: bool = False,
+    ) -> Union[Tuple[ClassificationResult, Image.Image], Tuple[List[ClassificationResult], List[Image.Image]]]:
+        """
+        Predict the image(s) and visualize the predicted label, the same as predict followed by visualize, but
+        preprocessing once and running a single forward pass for both the prediction and the heatmap.
+        viz can be VizEnum.GRADCAM_PLUSPLUS or VizEnum.GRADCAM_PLUSPLUS_FAST.
+
+        Returns (ClassificationResult, heatmap image) for a single image, or the list of results and the list of
+        heatmap images for a list of images. With as_array, the heatmap images are (height, width, 3) uint8 arrays.
+        """
+        if viz not in (VizEnum.GRADCAM_PLUSPLUS, VizEnum.GRADCAM_PLUSPLUS_FAST):
+            raise ValueError(
+                f"Visualization option `{viz}` not supported, try one of: "
+                f"{[VizEnum.GRADCAM_PLUSPLUS, VizEnum.GRADCAM_PLUSPLUS_FAST]}."
+            )
+        is_batched = isinstance(image, list)
+        images = image if is_batched else [image]
+
+        size = self.signature.input_image_size
+        preprocessed_images = [image_utils.preprocess_image_fast(img, size) for img in images]
+        image_arrays = np.stack([np.asarray(img) for img in preprocessed_images]).astype(np.float32)
+        # make 0-1 float instead of 0-255 int, the same as image_utils.image_to_array
+        image_arrays /= 255.0
+
+        results, heatmaps = self.backend.predict_with_gradcam_plusplus(
+            image_arrays, fast=viz == VizEnum.GRADCAM_PLUSPLUS_FAST
+        )
+        classification_results = ClassificationResult.from_batch(
+            results=results, labels=self.signature.classes, export_version=self.signature.export_version,
+            top_k=top_k, min_confidence=min_confidence
+        )
+        combined_viz = _overlay_heatmaps(
+            heatmaps=heatmaps, images=preprocessed_images, opacity=opacity, colormap=colormap, as_array=as_array
+        )
+        if not is_batched:
+            return classification_results[0], combined_viz[0]
+        return classification_results, combined_viz
+
+
+def _overlay_heatmaps(
+        heatmaps: np.ndarray,
+        images: List[Image.Image],
+        opacity=0.5,
+        colormap: Union[str, 'Colormap'] = None,
+        as_array: bool = False,
+) -> Union[List[Image.Image], List[np.ndarray]]:
     """
-    Given an activation heatmap (like from Grad-CAM), create a superimposed image of the heatmap
-    on the given input image.
+    Superimpose a batch of activation heatmaps (batch, height, width) of floats in the 0-1 range on the images.
+    The heatmaps are quantized to colormap indices all at once, then each one is upsampled to its image's size,
+    colorized through the colormap's cached 256 color palette, and blended with the image, all in uint8.
+    Returns PIL images, or (height, width, 3) uint8 arrays with as_array.
     """
-    # make sure our heatmap is resized to be same shape as image
-    width, height = image.size  # pillow image
+    palette = _colormap_palette(colormap)
+    # same binning as evaluating the colormap on the floats: the 0-1 range maps onto the 256 colors
+    lut_indices = np.clip(np.nan_to_num(np.asarray(heatmaps, dtype=np.float32)) * 256, 0, 255).astype(np.uint8)
+
+    blended = []
+    for indices, image in zip(lut_indices, images):
+        if image.mode != "RGB":
+            image = image_utils.ensure_rgb_format(image)
+        # upsample the indices rather than the colors, so interpolated pixels stay on the colormap
+        heatmap_img = Image.fromarray(indices).resize(image.size, Image.BILINEAR)
+        heatmap_img.putpalette(palette)
+        # Return the blended heatmap overlay on the original image
+        blended_img = Image.blend(image, heatmap_img.convert("RGB"), opacity)
+        blended.append(np.asarray(blended_img) if as_array else blended_img)
+    return blended
 
-    # un-batch the heatmap to a single image if needed
-    if len(heatmap.shape) == 3 and heatmap.shape[0] == 1:
-        heatmap = np.squeeze(heatmap, axis=0)
 
+def _colormap_palette(colormap: Union[str, 'Colormap'] = None) -> bytes:
+    """
+    The 256 color RGB palette for the colormap (default: inferno), cached for named colormaps
+    """
     # Use inferno colormap by default to colorize heatmap, unless supplied kwarg
     if colormap is None:
         colormap = "inferno"
-    cmap = cm.get_cmap(colormap)
+    if isinstance(colormap, str):
+        return _named_colormap_palette(colormap)
+    return _build_colormap_palette(colormap)
+
 
-    # Expect heatmap to be floats in 0-1 range, and just grab the rgb values (not rgba)
-    color_heatmap = cmap(heatmap)[:, :, :3]
+@lru_cache(maxsize=None)
+def _named_colormap_palette(name: str) -> bytes:
+    from matplotlib import colormaps
+    return _build_colormap_palette(colormaps[name])
 
-    heatmap_img = image_utils.array_to_image(color_heatmap)
 
-    heatmap_img = heatmap_img.resize((height, width))
-    # Return the blended heatmap overlay on the original image
-    blended_img = Image.blend(image, heatmap_img, opacity)
-    return blended_img
+def _build_colormap_palette(cmap: 'Colormap') -> bytes:
+    # just grab the rgb values (not rgba), as 0-255 ints
+    return (cmap(np.linspace(0.0, 1.0, 256))[:, :3] * 255).astype(np.uint8).tobytes()
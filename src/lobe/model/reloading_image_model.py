@@ -0,0 +1,161 @@
+"""
+An ImageModel that picks up new exports of the model in place, without restarting the process
+"""
+import json
+import os
+from threading import Thread, Event, Lock
+from typing import TYPE_CHECKING, Callable, Iterable, Optional, Tuple
+
+from .image_model import ImageModel
+from ..backends.options import BackendOptions
+from ..signature import get_signature_path
+from ..signature_constants import FILENAME
+
+if TYPE_CHECKING:
+    from ..cache import PredictionCache
+
+# default seconds between checks of the signature.json file
+DEFAULT_POLL_INTERVAL = 2.0
+
+
+class ReloadingImageModel(object):
+    """
+    Wraps an ImageModel and watches its export, polling the modification time and size of its signature.json and model
+    file every poll_interval seconds. The path is resolved again on every poll, so pointing a symlink at a new export
+    (e.g. `ln -sfn v2 current`) counts as a change too. Once a change has settled (the file is unchanged for a whole interval, so a half-written export isn't
+    picked up), the new model is loaded and warmed up on the watcher thread and then swapped in.
+
+    Every other attribute (predict, predict_from_file, visualize, signature, ...) is looked up on the current model,
+    so calls already in progress finish on the model they started with, and the old model is freed once the last
+    of them returns. If loading the new export fails, the current model keeps serving, the error is kept in
+    last_error, and the load is retried on the next poll. The current model's cache carries over to the new one,
+    and assigning model.cache on the wrapper sets it on the current model.
+
+    on_reload is called with the new model after each swap.
+
+    Usage:
+        model = ReloadingImageModel('path/to/model')
+        result = model.predict(image)
+        model.close()
+    """
+    def __init__(
+            self,
+            model_path: str,
+            backend_options: Optional[BackendOptions] = None,
+            poll_interval: float = DEFAULT_POLL_INTERVAL,
+            warmup_batch_sizes: Optional[Iterable[int]] = None,
+            on_reload: Optional[Callable[[ImageModel], None]] = None,
+    ):
+        if poll_interval <= 0:
+            raise ValueError(f"poll_interval must be positive, got: {poll_interval}")
+        # keep the path as given (rather than resolved), so a symlink in it is followed again on every poll
+        self.model_path = os.path.expanduser(model_path)
+        # the signature.json of the model currently serving
+        self.signature_path = str(get_signature_path(self.model_path))
+        self.backend_options = backend_options
+        self.poll_interval = poll_interval
+        self.warmup_batch_sizes = warmup_batch_sizes
+        self.on_reload = on_reload
+
+        self.reloads = 0
+        self.last_error: Optional[Exception] = None
+
+        self._reload_lock = Lock()
+        self._loaded_stat = self._stat()
+        self._model = self._load(self.signature_path)
+
+        self._stop = Event()
+        self._watcher = Thread(target=self._watch, name="lobe-model-watcher", daemon=True)
+        self._watcher.start()
+
+    @property
+    def model(self) -> ImageModel:
+        """
+        The ImageModel currently serving. Hold on to it to make several calls against the same version.
+        """
+        return self._model
+
+    @property
+    def cache(self) -> Optional['PredictionCache']:
+        return self._model.cache
+
+    @cache.setter
+    def cache(self, cache: Optional['PredictionCache']):
+        # set it on the current model (under the reload lock, so a reload in progress can't carry over the old one)
+        # rather than on the wrapper, so it's used right away and carried over to the models loaded after it
+        with self._reload_lock:
+            self._model.cache = cache
+
+    def reload(self) -> ImageModel:
+        """
+        Load the model the path currently points to now and swap it in, returning the new model.
+        Errors are raised, and the current model keeps serving.
+        """
+        with self._reload_lock:
+            stat = self._stat()
+            # load the export that was just checked, even if a symlink is swapped again in the meantime
+            signature_path = stat[0] if stat is not None else str(get_signature_path(self.model_path))
+            model = self._load(signature_path)
+            model.cache = self._model.cache
+            # a single reference assignment, so callers see either the old or the new model, never a mix
+            self._model = model
+            self.signature_path = signature_path
+            self._loaded_stat = stat
+            self.reloads += 1
+            self.last_error = None
+        if self.on_reload is not None:
+            self.on_reload(model)
+        return model
+
+    def close(self):
+        """
+        Stop watching for new exports. The current model keeps working.
+        """
+        self._stop.set()
+        self._watcher.join()
+
+    def __getattr__(self, name):
+        # only called for attributes the wrapper doesn't have itself
+        if name == "_model":
+            raise AttributeError(name)
+        return getattr(self._model, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _load(self, signature_path: str) -> ImageModel:
+        return ImageModel.load(
+            signature_path, backend_options=self.backend_options,
+            warmup=True, warmup_batch_sizes=self.warmup_batch_sizes
+        )
+
+    def _stat(self) -> Optional[Tuple]:
+        """
+        Identify the export the path points to right now: its resolved signature path, and the modification time and
+        size of its signature.json and model file (which can be replaced on its own, keeping the same signature).
+        """
+        try:
+            signature_path = str(get_signature_path(self.model_path))
+            with open(signature_path, "r", encoding="utf8") as f:
+                filename = json.load(f)[FILENAME]
+            stats = [os.stat(path) for path in [signature_path, os.path.join(os.path.dirname(signature_path), filename)]]
+        except (OSError, ValueError, KeyError, TypeError):
+            # the export is being replaced
+            return None
+        return (signature_path, *[(stat.st_mtime_ns, stat.st_size) for stat in stats])
+
+    def _watch(self):
+        previous = self._loaded_stat
+        while not self._stop.wait(self.poll_interval):
+            stat = self._stat()
+            settled = stat == previous
+            previous = stat
+            if stat is None or not settled or stat == self._loaded_stat:
+                continue
+            try:
+                self.reload()
+            except Exception as e:
+                self.last_error = e
@@ -0,0 +1,228 @@
+"""
+Run an ImageModel across a pool of worker processes to use every CPU core for preprocessing and inference.
+"""
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, Future, wait, FIRST_COMPLETED
+from io import BytesIO
+from threading import Lock
+from typing import Iterable, Iterator, Optional, Tuple, Union
+
+from PIL import Image
+
+from . import image_utils
+from .backends.options import BackendOptions
+from .model.image_model import ImageModel
+from .results import ClassificationResult
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    # shared memory is only available from Python 3.8, fall back to sending the raw pixels through the pipe
+    shared_memory = None
+
+if shared_memory is not None and os.name == 'posix':
+    from multiprocessing import resource_tracker
+else:
+    # shared memory blocks aren't tracked on Windows
+    resource_tracker = None
+
+# payload kinds sent to the workers
+_PATH = 'path'
+_BYTES = 'bytes'
+_SHARED_MEMORY = 'shm'
+_PIXELS = 'pixels'
+
+# the model loaded in each worker process
+_worker_model: Optional[ImageModel] = None
+
+
+class ModelPool(object):
+    """
+    Loads the model once in each of `workers` processes and spreads predictions across them.
+    Pass backend_options (e.g. BackendOptions(num_threads=1)) to keep the workers from oversubscribing the cores.
+
+    Images can be given as file paths, encoded image bytes (JPEG, PNG, ...), or PIL images. Paths and bytes are sent
+    as-is and decoded in the worker; PIL images have their pixels copied into shared memory.
+
+    Usage:
+        with ModelPool('path/to/model', workers=8) as pool:
+            for result in pool.predict_many(paths):
+                print(result.prediction)
+    """
+    def __init__(
+            self, model_path: str, workers: Optional[int] = None, backend_options: Optional[BackendOptions] = None
+    ):
+        self.model_path = model_path
+        self.workers = workers or os.cpu_count() or 1
+        if resource_tracker is not None:
+            # start the tracker before the workers, so they share it instead of each starting their own. A worker's
+            # own tracker would warn about and unlink the blocks it attached to, which the parent owns and unlinks.
+            resource_tracker.ensure_running()
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers, initializer=_init_worker, initargs=(model_path, backend_options)
+        )
+        # keep track of the predictions that haven't finished yet, so they can be cancelled on shutdown
+        self._pending = set()
+        self._pending_lock = Lock()
+
+    def submit(
+            self,
+            image: Union[str, bytes, Image.Image],
+            top_k: Optional[int] = None,
+            min_confidence: Optional[float] = None,
+    ) -> "Future[ClassificationResult]":
+        """
+        Send the image to a worker, returning a future that resolves to its ClassificationResult.
+        """
+        payload, shm = _make_payload(image)
+        try:
+            future = self._executor.submit(_predict_in_worker, payload, top_k, min_confidence)
+        except BaseException:
+            # e.g. after shutdown or when the pool is broken, so no worker will ever read (and no callback free) it
+            _free_shared_memory(shm)
+            raise
+        with self._pending_lock:
+            self._pending.add(future)
+        future.add_done_callback(lambda done: self._on_done(done, shm))
+        return future
+
+    def predict(
+            self,
+            image: Union[str, bytes, Image.Image],
+            top_k: Optional[int] = None,
+            min_confidence: Optional[float] = None,
+    ) -> ClassificationResult:
+        return self.submit(image, top_k=top_k, min_confidence=min_confidence).result()
+
+    def predict_many(
+            self,
+            images: Iterable[Union[str, bytes, Image.Image]],
+            ordered: bool = True,
+            top_k: Optional[int] = None,
+            min_confidence: Optional[float] = None,
+            max_in_flight: Optional[int] = None,
+    ) -> Iterator[Union[ClassificationResult, Tuple[int, ClassificationResult]]]:
+        """
+        Stream predictions for an iterable of images, keeping at most max_in_flight images (default 2 per worker)
+        queued at once so that memory stays bounded for long or lazy iterables.
+
+        ordered=True yields the results in the same order as the images.
+        ordered=False yields (image index, result) tuples as soon as each prediction completes.
+        """
+        if max_in_flight is None:
+            max_in_flight = 2 * self.workers
+        if max_in_flight < 1:
+            raise ValueError(f"max_in_flight must be a positive integer, got: {max_in_flight}")
+
+        if ordered:
+            in_flight = deque()
+            for image in images:
+                in_flight.append(self.submit(image, top_k=top_k, min_confidence=min_confidence))
+                if len(in_flight) >= max_in_flight:
+                    yield in_flight.popleft().result()
+            while in_flight:
+                yield in_flight.popleft().result()
+        else:
+            in_flight = {}
+            for idx, image in enumerate(images):
+                in_flight[self.submit(image, top_k=top_k, min_confidence=min_confidence)] = idx
+                if len(in_flight) >= max_in_flight:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield in_flight.pop(future), future.result()
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield in_flight.pop(future), future.result()
+
+    def shutdown(self, wait: bool = True, cancel_pending: bool = False):
+        """
+        Stop the worker processes. With wait=True, blocks until the submitted predictions have finished
+        (or until the running ones have finished, if cancel_pending=True).
+        """
+        if cancel_pending:
+            with self._pending_lock:
+                pending = list(self._pending)
+            for future in pending:
+                future.cancel()
+        self._executor.shutdown(wait=wait)
+
+    def _on_done(self, future: Future, shm):
+        with self._pending_lock:
+            self._pending.discard(future)
+        # the worker has copied the pixels out by the time it returns, so free the shared memory block
+        _free_shared_memory(shm)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown(wait=True, cancel_pending=exc_type is not None)
+
+
+def _make_payload(image: Union[str, bytes, Image.Image]):
+    """
+    Package the image to send to a worker, returning the payload and the shared memory block to free (if any).
+    """
+    if isinstance(image, str):
+        return (_PATH, image), None
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return (_BYTES, bytes(image)), None
+    if not isinstance(image, Image.Image):
+        raise TypeError(f"Expected an image file path, encoded image bytes, or PIL Image, got: {type(image)}")
+
+    # the raw pixels lose the EXIF data and palette, so apply the orientation and convert to RGB before sending
+    image = image_utils.update_orientation(image)
+    if image.mode not in ("RGB", "L"):
+        image = image_utils.ensure_rgb_format(image)
+    pixels = image.tobytes()
+    if shared_memory is None or not pixels:
+        return (_PIXELS, image.mode, image.size, pixels), None
+    shm = shared_memory.SharedMemory(create=True, size=len(pixels))
+    shm.buf[:len(pixels)] = pixels
+    return (_SHARED_MEMORY, image.mode, image.size, shm.name), shm
+
+
+def _free_shared_memory(shm):
+    if shm is not None:
+        shm.close()
+        shm.unlink()
+
+
+def _init_worker(model_path: str, backend_options: Optional[BackendOptions]):
+    global _worker_model
+    _worker_model = ImageModel.load(model_path, backend_options=backend_options)
+
+
+def _attach_shared_memory(name: str):
+    if sys.version_info >= (3, 13):
+        # leave the block to the parent's resource tracker
+        return shared_memory.SharedMemory(name=name, track=False)
+    # registers the block again, with the tracker shared with the parent (see ModelPool), so the parent still
+    # unlinks it exactly once
+    return shared_memory.SharedMemory(name=name)
+
+
+def _predict_in_worker(payload, top_k: Optional[int], min_confidence: Optional[float]) -> ClassificationResult:
+    kind = payload[0]
+    size = _worker_model.signature.input_image_size
+    if kind == _PATH:
+        image = image_utils.get_image_from_file(payload[1], size=size)
+    elif kind == _BYTES:
+        image = image_utils.draft_image(Image.open(BytesIO(payload[1])), size)
+    elif kind == _PIXELS:
+        _, mode, image_size, pixels = payload
+        image = Image.frombytes(mode, image_size, pixels)
+    else:
+        _, mode, image_size, name = payload
+        shm = _attach_shared_memory(name)
+        # the block can be rounded up to the page size, so only read the pixels ("RGB" or "L" is 1 byte per band)
+        pixels = shm.buf[:image_size[0] * image_size[1] * len(mode)]
+        try:
+            image = Image.frombytes(mode, image_size, pixels)
+        finally:
+            pixels.release()
+            shm.close()
+    return _worker_model.predict(image, top_k=top_k, min_confidence=min_confidence)
@@ -0,0 +1,199 @@
+"""
+Share loaded ImageModels between callers, keeping the most recently used ones resident within a memory budget.
+"""
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from threading import Lock
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .backends.options import BackendOptions
+from .model.image_model import ImageModel
+from .signature import ImageClassificationSignature, get_signature_path
+from .signature_constants import TF_MODEL
+
+
+def estimate_model_bytes(model: ImageModel) -> int:
+    """
+    Approximate the memory a loaded model holds by the size of its model files on disk (the weights dominate both).
+    For TensorFlow saved models this is the whole model directory.
+    """
+    signature = model.signature
+    if signature.format == TF_MODEL:
+        return sum(
+            os.path.getsize(os.path.join(root, filename))
+            for root, _, filenames in os.walk(signature.model_path)
+            for filename in filenames
+        )
+    return os.path.getsize(os.path.join(signature.model_path, signature.filename))
+
+
+class ModelRegistry(object):
+    """
+    Loads models on first use by their path (the model folder or its signature.json file) or, once registered or
+    loaded, by their signature id. Concurrent requests for a model that is still loading wait for that one load.
+
+    If memory_budget (in bytes) is set, the least recently used models are unloaded whenever the loaded models'
+    estimated sizes add up to more than it, and are loaded again transparently the next time they're requested.
+    Unloading only drops the registry's reference, so predictions already running on that model still finish.
+    The newest model is always kept, even if it is larger than the budget by itself.
+
+    size_fn estimates the bytes a loaded model holds (default: estimate_model_bytes).
+
+    Usage:
+        registry = ModelRegistry(memory_budget=2 * 1024 ** 3)
+        result = registry.get('path/to/model').predict(image)
+    """
+    def __init__(
+            self,
+            memory_budget: Optional[int] = None,
+            backend_options: Optional[BackendOptions] = None,
+            warmup: bool = False,
+            warmup_batch_sizes: Optional[Iterable[int]] = None,
+            size_fn: Callable[[ImageModel], int] = estimate_model_bytes,
+    ):
+        if memory_budget is not None and memory_budget < 0:
+            raise ValueError(f"memory_budget must not be negative, got: {memory_budget}")
+        self.memory_budget = memory_budget
+        self.backend_options = backend_options
+        self.warmup = warmup
+        self.warmup_batch_sizes = warmup_batch_sizes
+        self.size_fn = size_fn
+
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.load_failures = 0
+        self.evictions = 0
+        self.load_seconds = 0.0
+
+        self._lock = Lock()
+        # signature path -> (model, estimated bytes), least recently used first
+        self._models: "OrderedDict[str, Tuple[ImageModel, int]]" = OrderedDict()
+        # signature path -> future for the model, while it is being loaded
+        self._loading: Dict[str, Future] = {}
+        # signature id -> signature path, for every model registered or loaded
+        self._ids: Dict[str, str] = {}
+        self._memory_bytes = 0
+
+    def register(self, model_path: str) -> str:
+        """
+        Make a model available by its signature id without loading it yet. Returns the signature id.
+        """
+        signature = ImageClassificationSignature(model_path)
+        key = str(get_signature_path(model_path))
+        with self._lock:
+            self._ids[signature.id] = key
+        return signature.id
+
+    def get(self, model: str) -> ImageModel:
+        """
+        Return the loaded model for the path or signature id, loading it first if it isn't resident.
+        """
+        key = self._resolve(model)
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is not None:
+                self._models.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            future = self._loading.get(key)
+            is_loader = future is None
+            if is_loader:
+                future = Future()
+                self._loading[key] = future
+        if not is_loader:
+            # someone else is already loading this model, share their result
+            return future.result()
+
+        start = time.perf_counter()
+        try:
+            loaded = ImageModel.load(
+                key, backend_options=self.backend_options,
+                warmup=self.warmup, warmup_batch_sizes=self.warmup_batch_sizes
+            )
+            size = self.size_fn(loaded)
+        except Exception as e:
+            with self._lock:
+                del self._loading[key]
+                self.load_failures += 1
+            future.set_exception(e)
+            raise
+        with self._lock:
+            del self._loading[key]
+            self._models[key] = (loaded, size)
+            self._ids[loaded.signature.id] = key
+            self._memory_bytes += size
+            self.loads += 1
+            self.load_seconds += time.perf_counter() - start
+            self._evict()
+        future.set_result(loaded)
+        return loaded
+
+    def unload(self, model: str) -> bool:
+        """
+        Drop the model for the path or signature id if it is loaded. Returns whether it was.
+        """
+        key = self._resolve(model)
+        with self._lock:
+            entry = self._models.pop(key, None)
+            if entry is not None:
+                self._memory_bytes -= entry[1]
+            return entry is not None
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+            self._memory_bytes = 0
+
+    def loaded(self) -> List[str]:
+        """
+        The signature paths of the resident models, least recently used first.
+        """
+        with self._lock:
+            return list(self._models.keys())
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / requests if requests else 0.0,
+                "loads": self.loads,
+                "load_failures": self.load_failures,
+                "load_seconds": self.load_seconds,
+                "evictions": self.evictions,
+                "loaded_models": len(self._models),
+                "memory_bytes": self._memory_bytes,
+            }
+
+    def _resolve(self, model: str) -> str:
+        with self._lock:
+            key = self._ids.get(model)
+        if key is not None:
+            return key
+        return str(get_signature_path(model))
+
+    def _evict(self):
+        # expects the lock to be held, and never evicts the most recently used model
+        if self.memory_budget is None:
+            return
+        while self._memory_bytes > self.memory_budget and len(self._models) > 1:
+            _, (_, size) = self._models.popitem(last=False)
+            self._memory_bytes -= size
+            self.evictions += 1
+
+    def __contains__(self, model: str) -> bool:
+        try:
+            key = self._resolve(model)
+        except ValueError:
+            return False
+        with self._lock:
+            return key in self._models
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._models)
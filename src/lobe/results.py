@@ -1,5 +1,7 @@
 import json
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
+
+import numpy as np
 
 from .api_constants import LABEL, CONFIDENCE, PREDICTIONS
 from .signature_constants import (
@@ -21,51 +23,57 @@ class ClassificationResult:
     These can be batched and contain the results for many examples.
     """
 
-    def __init__(self, results: BackendResult, labels: List[str] = None, export_version: int = None):
+    def __init__(
+            self,
+            results: BackendResult,
+            labels: List[str] = None,
+            export_version: int = None,
+            top_k: Optional[int] = None,
+            min_confidence: Optional[float] = None,
+    ):
         """
         Parse the classification results from a dictionary in the form {Name: val} for each output in the signature
 
         Labels need to be provided to map our confidences, but in the case of the local API they are already returned
         with the prediction.
+
+        top_k: only keep the k most confident (label, confidence) pairs in `labels`
+        min_confidence: only keep the (label, confidence) pairs in `labels` with at least this confidence
         """
+        if top_k is not None and top_k < 1:
+            raise ValueError(f"top_k must be a positive integer, got: {top_k}")
+        self._top_k = top_k
+        self._min_confidence = min_confidence
+
         # If `results` comes from the Lobe Connect local API, there will not be an export version and the
         # predictions will already be in sorted order. Just need to assign to our 'labels' and 'prediction' variables.
         if export_version is None:
             api_results = results.get(PREDICTIONS, [])
-            self.labels = [(prediction.get(LABEL), prediction.get(CONFIDENCE)) for prediction in api_results]
-            self.prediction = self.labels[0][0]
+            self._labels = [(prediction.get(LABEL), prediction.get(CONFIDENCE)) for prediction in api_results]
+            self._prediction = self._labels[0][0]
+            self._labels = self._filter_labels(self._labels)
 
         # Otherwise, results comes from running the ImageModel -- check supported versions of the exported model
         elif export_version in SUPPORTED_EXPORT_VERSIONS:
-            # grab the list of confidences
+            # grab the batched confidences, which can be a nested list or a NumPy array
             confidences, _ = dict_get_compat(in_dict=results, current_key=LABEL_CONFIDENCES,
                                              compat_keys=LABEL_CONFIDENCES_COMPAT, default=[])
-            # zip the labels and confidences together
-            labels_and_confidences = []
-            # the model results are batched
-            for row in confidences:
-                # zip this row with the labels to make (label, confidence) pairs
-                if not labels:
-                    raise ValueError(
-                        f"Needed labels to assign the confidences returned. Confidences: {confidences}")
-                label_conf_pairs = list(zip(labels, row))
-                # sort them by confidence and add to the batch array
-                label_conf_pairs = sorted(label_conf_pairs, key=lambda pair: pair[1], reverse=True)
-                labels_and_confidences.append(label_conf_pairs)
+            if len(confidences) > 0 and not labels:
+                raise ValueError(
+                    f"Needed labels to assign the confidences returned. Confidences: {confidences}")
+            self._classes = labels
+            self._confidences = np.asarray(confidences)
 
             # grab the predicted class if it exists (backwards compatibility)
             prediction, _ = dict_get_compat(in_dict=results, current_key=None,
                                             compat_keys=PREDICTED_LABEL_COMPAT)
-            # if there was no prediction, grab the label with the highest confidence from labels_and_confidences
-            if prediction is None:
-                new_prediction = []
-                for row in labels_and_confidences:
-                    new_prediction.append(row[0][0])
-                prediction = new_prediction
+            if isinstance(prediction, np.ndarray):
+                prediction = prediction.tolist()
+            self._model_prediction = prediction
 
-            # un-batch if this is a batch size of 1, so that the return is just the value for the single image
-            self.labels = _un_batch(labels_and_confidences)
-            self.prediction = _un_batch(prediction)
+            # the sorted (label, confidence) pairs and top prediction are only built when they are first accessed
+            self._labels = None
+            self._prediction = None
 
         # Else the exported model version is not officially supported (but may still work anyway)
         # Throw a ValueError with details.
@@ -74,6 +82,92 @@ class ClassificationResult:
                 f'The model version {export_version} you are using may not be compatible with the supported versions {SUPPORTED_EXPORT_VERSIONS}. Please update both lobe-python and Lobe to latest versions, and try exporting your model again. If the issue persists, please contact us at lobesupport@microsoft.com'
             )
 
+    @property
+    def labels(self):
+        """
+        List of (label, confidence) tuples sorted by highest confidence to lowest (a list of these lists if batched)
+        """
+        if self._labels is None:
+            labels_and_confidences = []
+            if self._confidences.ndim == 2:
+                sorted_indices = self._top_indices()
+                sorted_confidences = np.take_along_axis(self._confidences, sorted_indices, axis=-1)
+                for row_indices, row_confidences in zip(sorted_indices.tolist(), sorted_confidences.tolist()):
+                    labels_and_confidences.append(self._filter_labels(
+                        [(self._classes[idx], conf) for idx, conf in zip(row_indices, row_confidences)]
+                    ))
+            # un-batch if this is a batch size of 1, so that the return is just the value for the single image
+            self._labels = _un_batch(labels_and_confidences)
+        return self._labels
+
+    @property
+    def prediction(self):
+        """
+        The top predicted label (a list of labels if batched)
+        """
+        if self._prediction is None:
+            prediction = self._model_prediction
+            # if there was no prediction, grab the label with the highest confidence
+            if prediction is None:
+                prediction = []
+                if self._confidences.ndim == 2:
+                    prediction = [self._classes[idx] for idx in np.argmax(self._confidences, axis=-1).tolist()]
+            # un-batch if this is a batch size of 1, so that the return is just the value for the single image
+            self._prediction = _un_batch(prediction)
+        return self._prediction
+
+    def _top_indices(self) -> np.ndarray:
+        """
+        Indices of each row's confidences sorted from highest to lowest, keeping the label order for ties.
+        With top_k, only the k highest are selected (in linear time) before sorting.
+        """
+        num_classes = self._confidences.shape[-1]
+        if self._top_k is None or self._top_k >= num_classes:
+            return np.argsort(-self._confidences, axis=-1, kind="stable")
+        top_k = self._top_k
+        # rank any NaNs last, so every row has at least top_k comparable values
+        confidences = np.nan_to_num(self._confidences, nan=-np.inf)
+        # take everything above each row's k-th highest confidence, and fill up with the labels tied at it in label
+        # order (argpartition alone would pick any of the tied labels)
+        kth_confidence = -np.partition(-confidences, top_k - 1, axis=-1)[:, top_k - 1:top_k]
+        above = confidences > kth_confidence
+        tied = confidences == kth_confidence
+        selected = above | (tied & (np.cumsum(tied, axis=-1) <= top_k - above.sum(axis=-1, keepdims=True)))
+        # exactly top_k per row, in label order
+        top_indices = np.nonzero(selected)[1].reshape(-1, top_k)
+        top_confidences = np.take_along_axis(confidences, top_indices, axis=-1)
+        return np.take_along_axis(top_indices, np.argsort(-top_confidences, axis=-1, kind="stable"), axis=-1)
+
+    def _filter_labels(self, labels_and_confidences: List[Tuple[str, float]]) -> List[Tuple[str, float]]:
+        """
+        Apply the top_k and min_confidence limits to a sorted list of (label, confidence) pairs
+        """
+        if self._top_k is not None:
+            labels_and_confidences = labels_and_confidences[:self._top_k]
+        if self._min_confidence is not None:
+            labels_and_confidences = [pair for pair in labels_and_confidences if pair[1] >= self._min_confidence]
+        return labels_and_confidences
+
+    @classmethod
+    def from_batch(
+            cls,
+            results: BackendResult,
+            labels: List[str] = None,
+            export_version: int = None,
+            top_k: Optional[int] = None,
+            min_confidence: Optional[float] = None,
+    ) -> List['ClassificationResult']:
+        """
+        Parse batched classification results from a backend into a list with one ClassificationResult per example.
+        """
+        return [
+            cls(
+                results=row_results, labels=labels, export_version=export_version,
+                top_k=top_k, min_confidence=min_confidence
+            )
+            for row_results in split_batch_results(results)
+        ]
+
     def as_dict(self):
         return {
             "Labels": self.labels,
@@ -84,6 +178,19 @@ class ClassificationResult:
         return json.dumps(self.as_dict())
 
 
+def split_batch_results(results: BackendResult) -> List[BackendResult]:
+    """
+    Given batched backend results {Name: [row, ...]}, return a list of results with a batch size of 1 for each row
+    """
+    # slicing keeps the batch dimension, and is a view (not a copy) for NumPy arrays
+    batched = (list, np.ndarray)
+    batch_size = max((len(value) for value in results.values() if isinstance(value, batched)), default=0)
+    return [
+        {key: value[i:i + 1] if isinstance(value, batched) else value for key, value in results.items()}
+        for i in range(batch_size)
+    ]
+
+
 def _un_batch(item):
     """
     Given an arbitrary input, if it is a list with exactly one item then return that first item
@@ -0,0 +1,150 @@
+"""
+Dynamic micro-batching of concurrent predictions for serving an ImageModel from many threads.
+"""
+import time
+from collections import Counter
+from concurrent.futures import Future
+from queue import Queue, Empty
+from threading import Thread, Lock
+from typing import Dict, List, Tuple
+
+import numpy as np
+from PIL import Image
+
+from .model.image_model import ImageModel
+from .results import ClassificationResult
+
+
+class BatchingPredictor(object):
+    """
+    Wraps an ImageModel so that concurrent predict calls are queued and run through the backend together.
+
+    A batch is flushed once it reaches max_batch_size images, or once the oldest queued image has waited
+    max_wait_ms milliseconds. Images are preprocessed on the calling thread, so only the backend call is serialized.
+
+    Usage:
+        predictor = BatchingPredictor(ImageModel.load('path/to/model'), max_batch_size=16, max_wait_ms=5)
+        result = predictor.predict(image)  # from any number of threads
+        predictor.close()
+    """
+    def __init__(self, model: ImageModel, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        if max_batch_size < 1:
+            raise ValueError(f"max_batch_size must be a positive integer, got: {max_batch_size}")
+        if max_wait_ms < 0:
+            raise ValueError(f"max_wait_ms must not be negative, got: {max_wait_ms}")
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+
+        self._queue: "Queue[Tuple[np.ndarray, Future]]" = Queue()
+        self._stats_lock = Lock()
+        self._batch_sizes = Counter()
+        self._queue_depths = Counter()
+        self._closed = False
+        self._close_lock = Lock()
+
+        self._worker = Thread(target=self._run, name="lobe-batching-predictor", daemon=True)
+        self._worker.start()
+
+    def submit(self, image: Image.Image) -> "Future[ClassificationResult]":
+        """
+        Queue the image for prediction, returning a future that resolves to its ClassificationResult.
+        """
+        image_array = self.model.preprocess(image)
+        future = Future()
+        # check and enqueue under the same lock close() takes, so nothing can be queued after the sentinel
+        with self._close_lock:
+            if self._closed:
+                raise RuntimeError("Can't submit an image to a closed BatchingPredictor.")
+            self._queue.put((image_array, future))
+        return future
+
+    def predict(self, image: Image.Image, timeout: float = None) -> ClassificationResult:
+        """
+        Predict the image, blocking until the batch it was queued in has run.
+        """
+        return self.submit(image).result(timeout=timeout)
+
+    @property
+    def queue_depth(self) -> int:
+        """
+        The approximate number of images currently waiting to be batched.
+        """
+        return self._queue.qsize()
+
+    @property
+    def batch_size_histogram(self) -> Dict[int, int]:
+        """
+        Histogram of the flushed batch sizes {batch size: number of batches}.
+        """
+        with self._stats_lock:
+            return dict(self._batch_sizes)
+
+    @property
+    def queue_depth_histogram(self) -> Dict[int, int]:
+        """
+        Histogram of the queue depth left behind each time a batch was flushed {queue depth: number of batches}.
+        """
+        with self._stats_lock:
+            return dict(self._queue_depths)
+
+    def close(self, timeout: float = None):
+        """
+        Stop accepting new images, flush everything already queued, and stop the batching thread.
+        """
+        with self._close_lock:
+            if not self._closed:
+                self._closed = True
+                # a sentinel wakes the worker up and marks the end of the queue
+                self._queue.put(None)
+        self._worker.join(timeout=timeout)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _run(self):
+        """
+        Batching loop: block for the first queued image, then gather more until the batch is full or the wait expires.
+        """
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait_ms / 1000.0
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._flush(batch)
+
+    def _flush(self, batch: List[Tuple[np.ndarray, Future]]):
+        """
+        Run the batch through the model in one backend call and resolve each caller's future with its own result.
+        """
+        with self._stats_lock:
+            self._batch_sizes[len(batch)] += 1
+            self._queue_depths[self._queue.qsize()] += 1
+
+        # skip any futures that were cancelled while waiting in the queue
+        batch = [(image_array, future) for image_array, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        try:
+            results = self.model.predict_arrays(np.concatenate([image_array for image_array, _ in batch]))
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+        else:
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
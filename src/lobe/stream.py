@@ -0,0 +1,149 @@
+"""
+Continuous classification of camera or video frames, overlapping preprocessing with inference.
+"""
+import time
+from collections import deque
+from threading import Thread, Condition
+from typing import Iterable, Iterator, Optional, Union
+
+import numpy as np
+from PIL import Image
+
+from .results import ClassificationResult
+
+# number of recent inferences to average the reported fps over
+FPS_WINDOW = 30
+
+
+class StreamPrediction(object):
+    """
+    The prediction for one frame of a stream.
+
+    frame_index: index of the frame in the input iterator
+    result: the ClassificationResult for the frame
+    skipped: True if the frame barely changed from the last inferred frame, so its result was reused
+    latency: seconds from receiving the frame to having its result
+    fps: recent predictions per second
+    dropped: total number of stale frames dropped so far because inference fell behind
+    """
+    def __init__(
+            self,
+            frame_index: int,
+            result: ClassificationResult,
+            skipped: bool,
+            latency: float,
+            fps: float,
+            dropped: int,
+    ):
+        self.frame_index = frame_index
+        self.result = result
+        self.skipped = skipped
+        self.latency = latency
+        self.fps = fps
+        self.dropped = dropped
+
+    def as_dict(self):
+        return {
+            "Frame": self.frame_index,
+            "Skipped": self.skipped,
+            "Latency": self.latency,
+            "FPS": self.fps,
+            "Dropped": self.dropped,
+            **self.result.as_dict(),
+        }
+
+
+def frame_to_image(frame: Union[np.ndarray, Image.Image]) -> Image.Image:
+    """
+    Frames can be PIL images or (height, width, 3) uint8 RGB arrays
+    """
+    if isinstance(frame, Image.Image):
+        return frame
+    return Image.fromarray(np.asarray(frame, dtype=np.uint8))
+
+
+def predict_stream(
+        model,
+        frames: Iterable[Union[np.ndarray, Image.Image]],
+        drop_frames: bool = True,
+        change_threshold: Optional[float] = None,
+        top_k: Optional[int] = None,
+        min_confidence: Optional[float] = None,
+) -> Iterator[StreamPrediction]:
+    """
+    See ImageModel.predict_stream
+    """
+    condition = Condition()
+    # the double buffer: the preprocessed frame waiting for inference, filled by the reader while inference runs
+    state = {"pending": None, "done": False, "error": None, "stop": False, "dropped": 0}
+
+    def read_frames():
+        try:
+            for frame_index, frame in enumerate(frames):
+                received = time.perf_counter()
+                image_array = model.preprocess(frame_to_image(frame))
+                with condition:
+                    # without dropping, wait for the previous frame to be taken before buffering the next
+                    while not drop_frames and state["pending"] is not None and not state["stop"]:
+                        condition.wait()
+                    if state["stop"]:
+                        return
+                    if state["pending"] is not None:
+                        # latest frame wins: inference fell behind, so the stale frame is replaced
+                        state["dropped"] += 1
+                    state["pending"] = (frame_index, received, image_array)
+                    condition.notify_all()
+        except Exception as e:
+            with condition:
+                state["error"] = e
+        finally:
+            with condition:
+                state["done"] = True
+                condition.notify_all()
+
+    reader = Thread(target=read_frames, name="lobe-stream-reader", daemon=True)
+    reader.start()
+
+    inference_times = deque(maxlen=FPS_WINDOW)
+    last_array, last_result = None, None
+    try:
+        while True:
+            with condition:
+                while state["pending"] is None and not state["done"]:
+                    condition.wait()
+                if state["pending"] is None:
+                    # the frames read before the iterator failed have all been predicted, so raise its error now
+                    if state["error"] is not None:
+                        raise state["error"]
+                    break
+                frame_index, received, image_array = state["pending"]
+                state["pending"] = None
+                dropped = state["dropped"]
+                condition.notify_all()
+
+            skipped = (
+                change_threshold is not None and last_array is not None
+                and float(np.mean(np.abs(image_array - last_array))) < change_threshold
+            )
+            if skipped:
+                result = last_result
+            else:
+                result = model.predict_arrays(image_array, top_k=top_k, min_confidence=min_confidence)[0]
+                last_array, last_result = image_array, result
+
+            now = time.perf_counter()
+            inference_times.append(now)
+            elapsed = inference_times[-1] - inference_times[0]
+            fps = (len(inference_times) - 1) / elapsed if elapsed > 0 else 0.0
+            yield StreamPrediction(
+                frame_index=frame_index,
+                result=result,
+                skipped=skipped,
+                latency=now - received,
+                fps=fps,
+                dropped=dropped,
+            )
+    finally:
+        with condition:
+            state["stop"] = True
+            condition.notify_all()
@@ -3,6 +3,8 @@ Some utility functions
 """
 from typing import Dict, List, Tuple, Optional, Union
 
+import numpy as np
+
 
 def dict_get_compat(in_dict: Dict[str, any], current_key: Optional[str], compat_keys: List[str], default: any = None) -> Tuple[any, Optional[str]]:
     """
@@ -47,6 +49,19 @@ def decode_list_bytes_as_str(in_list: Union[List[any], Tuple[any]], encoding="ut
     return type(in_list)(decoded_list)
 
 
+def decode_dict_arrays_bytes_as_str(in_dict: Dict[any, any], encoding="utf-8"):
+    """
+    Decode any byte string arrays in the dict as arrays of strings, leaving numeric arrays untouched (no copies)
+    """
+    # modifies the dict in place
+    for key, val in in_dict.items():
+        if isinstance(val, np.ndarray) and (val.dtype.kind == "S" or val.dtype == object):
+            decoded = np.empty(val.shape, dtype=object)
+            for index, item in np.ndenumerate(val):
+                decoded[index] = item.decode(encoding) if isinstance(item, bytes) else item
+            in_dict[key] = decoded
+
+
 def list_or_tuple(item):
     """
     returns true if the item is a list or tuple
@@ -0,0 +1,194 @@
+import json
+import os
+import threading
+
+import numpy as np
+import pytest
+from PIL import Image
+
+NUM_CLASSES = 5
+
+
+@pytest.fixture
+def onnx_model_path(tmp_path):
+    """
+    A tiny ONNX export (mean color -> linear layer -> softmax) with a signature.json, in a temporary folder.
+    """
+    onnx = pytest.importorskip("onnx")
+    pytest.importorskip("onnxruntime")
+    from onnx import helper, numpy_helper, TensorProto
+
+    weights = np.random.RandomState(0).randn(3, NUM_CLASSES).astype(np.float32) * 5
+    nodes = [
+        helper.make_node("ReduceMean", ["Image:0"], ["pooled"], axes=[1, 2], keepdims=0),
+        helper.make_node("MatMul", ["pooled", "W"], ["logits"]),
+        helper.make_node("Softmax", ["logits"], ["Confidences:0"], axis=1),
+    ]
+    graph = helper.make_graph(
+        nodes, "toy",
+        [helper.make_tensor_value_info("Image:0", TensorProto.FLOAT, ["N", 224, 224, 3])],
+        [helper.make_tensor_value_info("Confidences:0", TensorProto.FLOAT, ["N", NUM_CLASSES])],
+        [numpy_helper.from_array(weights, "W")],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+    onnx.save(model, str(tmp_path / "model.onnx"))
+
+    signature = {
+        "doc_id": "toy", "doc_name": "toy", "doc_version": "1", "format": "onnx", "filename": "model.onnx",
+        "tags": [], "export_model_version": 1,
+        "classes": {"Label": [f"c{i}" for i in range(NUM_CLASSES)]},
+        "inputs": {"Image": {"dtype": "float32", "shape": [None, 224, 224, 3], "name": "Image:0"}},
+        "outputs": {"Confidences": {"dtype": "float32", "shape": [None, NUM_CLASSES], "name": "Confidences:0"}},
+    }
+    with open(tmp_path / "signature.json", "w") as f:
+        json.dump(signature, f)
+    return str(tmp_path)
+
+
+@pytest.fixture
+def images():
+    """
+    Solid color images of different sizes, so each gets a different prediction.
+    """
+    rng = np.random.RandomState(1)
+    return [
+        Image.new("RGB", (int(rng.randint(64, 400)), int(rng.randint(64, 400))), tuple(int(c) for c in rng.randint(0, 256, 3)))
+        for _ in range(16)
+    ]
+
+
+@pytest.fixture(scope="session")
+def tflite_model_path(tmp_path_factory):
+    """
+    A small TF Lite export (conv -> relu -> mean -> linear layer -> softmax) with a signature.json, converted with
+    the TensorFlow installed here since tflite_runtime can't convert models.
+    """
+    tf = pytest.importorskip("tensorflow")
+    path = tmp_path_factory.mktemp("tflite_model")
+
+    rng = np.random.RandomState(0)
+    kernel = tf.constant(rng.randn(3, 3, 3, 8).astype(np.float32))
+    weights = tf.constant(rng.randn(8, NUM_CLASSES).astype(np.float32) * 5)
+
+    @tf.function(input_signature=[tf.TensorSpec([None, 224, 224, 3], tf.float32, name="Image")])
+    def model(image):
+        features = tf.nn.relu(tf.nn.conv2d(image, kernel, 1, "SAME"))
+        return tf.nn.softmax(tf.matmul(tf.reduce_mean(features, axis=[1, 2]), weights))
+
+    converter = tf.lite.TFLiteConverter.from_concrete_functions([model.get_concrete_function()], model)
+    with open(path / "model.tflite", "wb") as f:
+        f.write(converter.convert())
+    output_name = tf.lite.Interpreter(model_path=str(path / "model.tflite")).get_output_details()[0]["name"]
+
+    signature = {
+        "doc_id": "toy", "doc_name": "toy", "doc_version": "1", "format": "tf_lite", "filename": "model.tflite",
+        "tags": [], "export_model_version": 1,
+        "classes": {"Label": [f"c{i}" for i in range(NUM_CLASSES)]},
+        "inputs": {"Image": {"dtype": "float32", "shape": [None, 224, 224, 3], "name": "Image"}},
+        "outputs": {"Confidences": {"dtype": "float32", "shape": [None, NUM_CLASSES], "name": output_name}},
+    }
+    with open(path / "signature.json", "w") as f:
+        json.dump(signature, f)
+    return str(path)
+
+
+class LocalServer(object):
+    """
+    A threaded HTTP server on localhost for testing against real connections. Map (method, path) in `routes` to a
+    function taking the request body and returning (status, content type, response body); every request is recorded
+    in `requests` as (method, path, body).
+    """
+    def __init__(self):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        self.routes = {}
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _handle(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                server.requests.append((self.command, self.path, body))
+                route = server.routes.get((self.command, self.path))
+                status, content_type, content = route(body) if route else (404, "text/plain", b"not found")
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            do_GET = do_POST = _handle
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, args=(0.05,), daemon=True)
+        self._thread.start()
+
+    def url(self, path: str) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}{path}"
+
+    def hits(self, path: str) -> int:
+        return sum(request_path == path for _, request_path, _ in self.requests)
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def local_server():
+    server = LocalServer()
+    yield server
+    server.close()
+
+
+def make_tf_saved_model(path, hidden: bool, size: int = 32):
+    """
+    Write a small TF1-style saved model shaped like a Lobe export (conv -> relu -> global average pool -> logits ->
+    softmax 'Confidences'), optionally with a hidden relu layer between the pooling and the logits.
+    """
+    import tensorflow as tf
+
+    rng = np.random.RandomState(0)
+    graph = tf.Graph()
+    with graph.as_default():
+        image = tf.compat.v1.placeholder(tf.float32, [None, size, size, 3], name="Image")
+        kernel = tf.constant(rng.randn(3, 3, 3, 8).astype(np.float32))
+        conv = tf.nn.relu(tf.nn.conv2d(image, kernel, strides=1, padding="SAME") + 0.1)
+        features = tf.reduce_mean(conv, axis=[1, 2])
+        if hidden:
+            features = tf.nn.relu(tf.matmul(features, tf.constant(rng.randn(8, 6).astype(np.float32))) + 0.05)
+        weights = tf.constant(rng.randn(int(features.shape[-1]), NUM_CLASSES).astype(np.float32))
+        confidences = tf.nn.softmax(tf.matmul(features, weights), name="Confidences")
+        with tf.compat.v1.Session(graph=graph) as session:
+            builder = tf.compat.v1.saved_model.Builder(str(path))
+            signature_def = tf.compat.v1.saved_model.predict_signature_def({"Image": image}, {"Confidences": confidences})
+            builder.add_meta_graph_and_variables(session, ["serve"], signature_def_map={"serving_default": signature_def})
+            builder.save()
+
+    signature = {
+        "doc_id": "toy", "doc_name": "toy", "doc_version": "1", "format": "tf", "filename": "saved_model.pb",
+        "tags": ["serve"], "export_model_version": 1,
+        "classes": {"Label": [f"c{i}" for i in range(NUM_CLASSES)]},
+        "inputs": {"Image": {"dtype": "float32", "shape": [None, size, size, 3], "name": "Image:0"}},
+        "outputs": {"Confidences": {"dtype": "float32", "shape": [None, NUM_CLASSES], "name": "Confidences:0"}},
+    }
+    with open(os.path.join(str(path), "signature.json"), "w") as f:
+        json.dump(signature, f)
+
+
+@pytest.fixture(scope="session", params=[False, True], ids=["linear_head", "hidden_relu_head"])
+def tf_model_path(request, tmp_path_factory):
+    """
+    A small TensorFlow saved model export (see make_tf_saved_model), with and without a hidden layer in the head.
+    """
+    pytest.importorskip("tensorflow")
+    path = tmp_path_factory.mktemp("tf_model") / "model"
+    make_tf_saved_model(path, hidden=request.param)
+    return str(path)
@@ -0,0 +1,89 @@
+import base64
+import json
+import random
+import time
+from io import BytesIO
+
+import pytest
+import requests
+from PIL import Image
+
+from lobe import api_client
+from lobe.http_client import HTTPClient
+
+PREDICT_PATH = "/predict"
+SERVER_DELAY = 0.01
+
+
+def _jpeg(size):
+    buffer = BytesIO()
+    Image.new("RGB", size, (200, 30, 90)).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def predict_url(local_server):
+    """
+    A stand-in for the Lobe Connect local API that predicts the width of the image it was sent as the label.
+    Responses are delayed at random, so concurrent requests finish out of order (recorded in local_server.completed).
+    """
+    rng = random.Random(0)
+    local_server.completed = []
+
+    def predict(body):
+        time.sleep(rng.uniform(0, 2 * SERVER_DELAY))
+        image = Image.open(BytesIO(base64.b64decode(json.loads(body)["image"])))
+        local_server.completed.append(image.width)
+        predictions = [{"label": str(image.width), "confidence": 0.9}, {"label": "other", "confidence": 0.1}]
+        return 200, "application/json", json.dumps({"predictions": predictions}).encode()
+
+    local_server.routes[("POST", PREDICT_PATH)] = predict
+    return local_server.url(PREDICT_PATH)
+
+
+def test_send_image_predict_request(predict_url, local_server):
+    data = _jpeg((120, 80))
+    timings = {}
+    with HTTPClient() as client:
+        result = api_client.send_image_predict_request(data, predict_url, client=client, timings=timings)
+
+    assert result.labels == [("120", 0.9), ("other", 0.1)]
+    # the JPEG was sent as-is, base64 encoded in the "image" field
+    [(method, path, body)] = local_server.requests
+    assert (method, path) == ("POST", PREDICT_PATH)
+    assert base64.b64decode(json.loads(body)["image"]) == data
+    assert set(timings) == {api_client.ENCODE_TIME, api_client.TRANSFER_TIME, api_client.PARSE_TIME}
+    assert all(value >= 0 for value in timings.values())
+
+
+def test_send_image_predict_request_shrinks_images_to_size(predict_url):
+    image = Image.new("RGB", (1200, 800), (10, 200, 10))
+    with HTTPClient() as client:
+        result = api_client.send_image_predict_request(image, predict_url, client=client, size=(224, 224))
+    assert result.prediction == "336"
+
+
+def test_send_images_predict_request_keeps_the_image_order(predict_url, local_server):
+    widths = list(range(40, 72))
+    images = [_jpeg((width, 40)) if i % 2 else Image.new("RGB", (width, 40)) for i, width in enumerate(widths)]
+    timings = []
+    with HTTPClient(pool_size=8) as client:
+        results = api_client.send_images_predict_request(
+            images, predict_url, client=client, concurrency=8, timings=timings
+        )
+
+    assert [result.prediction for result in results] == [str(width) for width in widths]
+    assert len(local_server.requests) == len(images)
+    # the server finished them out of order, or the test isn't showing anything
+    assert sorted(local_server.completed) == widths and local_server.completed != widths
+    assert len(timings) == len(images)
+    for image_timings in timings:
+        assert image_timings[api_client.TRANSFER_TIME] >= 0
+        assert set(image_timings) == {api_client.ENCODE_TIME, api_client.TRANSFER_TIME, api_client.PARSE_TIME}
+
+
+def test_send_images_predict_request_raises_on_server_errors(local_server):
+    local_server.routes[("POST", PREDICT_PATH)] = lambda body: (400, "text/plain", b"bad image")
+    with HTTPClient(retries=0) as client, pytest.raises(requests.HTTPError) as error:
+        api_client.send_images_predict_request([_jpeg((40, 40))], local_server.url(PREDICT_PATH), client=client)
+    assert error.value.response.status_code == 400
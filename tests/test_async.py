@@ -0,0 +1,30 @@
+import asyncio
+import threading
+
+from lobe import ImageModel, image_utils
+
+
+def test_predict_from_file_async_opens_the_file_off_the_event_loop(onnx_model_path, images, tmp_path, monkeypatch):
+    path = str(tmp_path / "image.png")
+    images[0].save(path)
+    model = ImageModel.load(onnx_model_path)
+    expected = model.predict_from_file(path)
+
+    opened_on = []
+    get_image_from_file = image_utils.get_image_from_file
+
+    def recording_get_image_from_file(*args, **kwargs):
+        opened_on.append(threading.current_thread())
+        return get_image_from_file(*args, **kwargs)
+
+    monkeypatch.setattr(image_utils, "get_image_from_file", recording_get_image_from_file)
+
+    async def predict():
+        try:
+            return await model.predict_from_file_async(path)
+        finally:
+            await model.aclose()
+
+    result = asyncio.run(predict())
+    assert result.labels == expected.labels
+    assert opened_on and threading.main_thread() not in opened_on
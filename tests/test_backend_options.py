@@ -0,0 +1,50 @@
+import os
+
+import numpy as np
+
+from lobe import BackendOptions, ImageModel
+
+
+def _load(model_path, optimized_path, **options):
+    return ImageModel.load(model_path, backend_options=BackendOptions(optimized_model_path=optimized_path, **options))
+
+
+def _loaded_path(model):
+    # the file the onnx runtime session was created from: the cached graph, or the source model to optimize again
+    return model.backend.session._model_path
+
+
+def test_optimized_model_is_reused_for_the_same_options(onnx_model_path, images, tmp_path):
+    optimized_path = str(tmp_path / "optimized.onnx")
+    first = _load(onnx_model_path, optimized_path, graph_optimization_level="all")
+    assert os.path.isfile(optimized_path) and os.path.isfile(optimized_path + ".json")
+    saved_at = os.stat(optimized_path).st_mtime_ns
+
+    second = _load(onnx_model_path, optimized_path, graph_optimization_level="all")
+    assert _loaded_path(second) == optimized_path
+    assert os.stat(optimized_path).st_mtime_ns == saved_at
+    np.testing.assert_allclose(
+        second.predict(images[0]).labels[0][1], first.predict(images[0]).labels[0][1], rtol=1e-6
+    )
+
+
+def test_optimized_model_is_regenerated_when_the_options_change(onnx_model_path, tmp_path):
+    optimized_path = str(tmp_path / "optimized.onnx")
+    _load(onnx_model_path, optimized_path, graph_optimization_level="basic")
+
+    for options in [
+        dict(graph_optimization_level="all"),
+        dict(graph_optimization_level="all", execution_providers=["CPUExecutionProvider"]),
+    ]:
+        model = _load(onnx_model_path, optimized_path, **options)
+        # optimized again from the source model, rather than loading the graph made for the old options
+        assert _loaded_path(model) != optimized_path
+        assert _loaded_path(_load(onnx_model_path, optimized_path, **options)) == optimized_path
+
+
+def test_optimized_model_is_regenerated_without_a_sidecar(onnx_model_path, tmp_path):
+    optimized_path = str(tmp_path / "optimized.onnx")
+    _load(onnx_model_path, optimized_path)
+    os.remove(optimized_path + ".json")
+    assert _loaded_path(_load(onnx_model_path, optimized_path)) != optimized_path
+    assert os.path.isfile(optimized_path + ".json")
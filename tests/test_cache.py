@@ -0,0 +1,39 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from lobe.cache import PredictionCache
+
+
+def _signature(version):
+    return SimpleNamespace(id="model", version=version)
+
+
+def test_versions_of_a_model_keep_their_own_entries(tmp_path):
+    cache = PredictionCache(path=str(tmp_path / "cache.sqlite"))
+    v1, v2 = _signature("1"), _signature("2")
+    cache.put(v1, "image", {"Confidences": np.array([[0.9, 0.1]])})
+    cache.put(v2, "image", {"Confidences": np.array([[0.2, 0.8]])})
+
+    # alternating between the versions hits for both, instead of each one dropping the other's entries
+    for _ in range(3):
+        np.testing.assert_allclose(cache.get(v1, "image")["Confidences"], [[0.9, 0.1]])
+        np.testing.assert_allclose(cache.get(v2, "image")["Confidences"], [[0.2, 0.8]])
+    assert cache.stats()["misses"] == 0
+
+    cache.close()
+
+    # and both versions are still on disk
+    cache = PredictionCache(path=str(tmp_path / "cache.sqlite"))
+    assert cache.get(v1, "image") is not None and cache.get(v2, "image") is not None
+    assert cache.stats()["disk_hits"] == 2
+    cache.close()
+
+
+def test_memory_entries_are_evicted_least_recently_used_first():
+    cache = PredictionCache(max_entries=2)
+    signature = _signature("1")
+    for key in ["a", "b", "c"]:
+        cache.put(signature, key, {"Confidences": np.zeros((1, 2))})
+    assert cache.get(signature, "a") is None
+    assert cache.get(signature, "b") is not None and cache.get(signature, "c") is not None
@@ -0,0 +1,43 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from lobe import cli
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+
+@pytest.mark.parametrize("option", ["--top-k", "--batch-size", "--workers"])
+@pytest.mark.parametrize("value", ["0", "-1", "two"])
+def test_counts_must_be_positive(option, value, capsys):
+    with pytest.raises(SystemExit) as e:
+        cli.main(["predict", "model", "image.jpg", option, value])
+    assert e.value.code == 2
+    assert "must be a positive integer" in capsys.readouterr().err
+
+
+def test_glob_matches_are_sorted(tmp_path):
+    for name in ["b.jpg", "c.png", "a.jpg", "sub/d.jpg"]:
+        (tmp_path / name).parent.mkdir(exist_ok=True)
+        (tmp_path / name).touch()
+    paths = list(cli.iter_image_paths([str(tmp_path / "**" / "*.jpg")]))
+    assert paths == sorted(paths)
+    assert len(paths) == 3
+
+
+def test_output_piped_to_a_closed_reader_exits_quietly(onnx_model_path, images, tmp_path):
+    for i, image in enumerate(images):
+        image.save(tmp_path / f"{i:02d}.png")
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [SRC_DIR, os.environ.get("PYTHONPATH")])))
+    process = subprocess.Popen(
+        [sys.executable, "-m", "lobe.cli", "predict", onnx_model_path, str(tmp_path), "-b", "1", "-q"],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env,
+    )
+    # like `| head -n 1`: read one result and hang up
+    assert process.stdout.readline().startswith(b'{"Path"')
+    process.stdout.close()
+    stderr = process.stderr.read().decode()
+    assert process.wait(timeout=60) == 1
+    assert stderr == ""
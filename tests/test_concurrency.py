@@ -0,0 +1,72 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import Barrier
+
+import numpy as np
+
+from lobe import BackendOptions, ImageModel
+
+NUM_THREADS = 8
+ROUNDS = 10
+
+
+def _confidences(result):
+    return dict(result.labels)
+
+
+def test_concurrent_onnx_predictions_match_serial(onnx_model_path, images):
+    model = ImageModel.load(onnx_model_path, backend_options=BackendOptions(concurrent=True))
+    expected = [_confidences(model.predict(image)) for image in images]
+
+    work = [i for _ in range(ROUNDS) for i in range(len(images))]
+    with ThreadPoolExecutor(max_workers=NUM_THREADS) as pool:
+        results = list(pool.map(lambda i: _confidences(model.predict(images[i])), work))
+
+    for i, result in zip(work, results):
+        assert result.keys() == expected[i].keys()
+        np.testing.assert_allclose([result[label] for label in expected[i]], list(expected[i].values()), rtol=1e-5)
+
+
+def test_concurrent_tflite_predictions_match_serial(tflite_model_path, images):
+    serial = ImageModel.load(tflite_model_path)
+    expected = [_confidences(serial.predict(image)) for image in images]
+
+    pool_size = 4
+    model = ImageModel.load(
+        tflite_model_path, backend_options=BackendOptions(concurrent=True, interpreter_pool_size=pool_size)
+    )
+    # start every thread at once, so the interpreters really are checked out concurrently
+    start = Barrier(NUM_THREADS)
+
+    def predict(i):
+        if i < NUM_THREADS:
+            start.wait()
+        return _confidences(model.predict(images[i % len(images)]))
+
+    work = list(range(ROUNDS * len(images)))
+    with ThreadPoolExecutor(max_workers=NUM_THREADS) as pool:
+        results = list(pool.map(predict, work))
+
+    # the pool grew on demand, but never past its size
+    assert 1 < model.backend._num_interpreters <= pool_size
+    for i, result in zip(work, results):
+        expected_result = expected[i % len(images)]
+        assert result.keys() == expected_result.keys()
+        np.testing.assert_allclose(
+            [result[label] for label in expected_result], list(expected_result.values()), rtol=1e-5, atol=1e-7
+        )
+
+
+def test_concurrent_tflite_batches_of_different_sizes(tflite_model_path, images):
+    # each interpreter keeps its own allocated input shape, so mixing batch sizes across threads must not mix them up
+    model = ImageModel.load(tflite_model_path, backend_options=BackendOptions(concurrent=True, interpreter_pool_size=3))
+    expected = [_confidences(result) for result in ImageModel.load(tflite_model_path).predict_batch(images)]
+    batches = [images[:size] for size in [1, 2, 5, 16] * ROUNDS]
+    with ThreadPoolExecutor(max_workers=NUM_THREADS) as pool:
+        results = list(pool.map(model.predict_batch, batches))
+
+    for batch_results in results:
+        for i, result in enumerate(batch_results):
+            confidences = _confidences(result)
+            np.testing.assert_allclose(
+                [confidences[label] for label in expected[i]], list(expected[i].values()), rtol=1e-5, atol=1e-7
+            )
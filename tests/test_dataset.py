@@ -0,0 +1,65 @@
+import os
+
+import numpy as np
+import pytest
+
+from lobe import ImageModel, image_utils
+from lobe.dataset import PreprocessedDataset
+
+
+@pytest.fixture
+def image_dir(tmp_path, images):
+    """
+    The test images as PNGs (which aren't drafted, so they decode the same every time) spread over nested folders,
+    along with a file that isn't an image and one that claims to be but can't be decoded.
+    """
+    root = tmp_path / "images"
+    (root / "nested" / "deeper").mkdir(parents=True)
+    for i, image in enumerate(images):
+        folder = [root, root / "nested", root / "nested" / "deeper"][i % 3]
+        image.save(folder / f"{i:02d}.png")
+    (root / "notes.txt").write_text("not an image")
+    (root / "nested" / "broken.jpg").write_bytes(b"not a jpeg")
+    return str(root)
+
+
+def test_build_round_trips_through_the_memory_map(image_dir, tmp_path):
+    size = (224, 224)
+    dataset = PreprocessedDataset.build(image_dir, str(tmp_path / "dataset"), size)
+
+    assert dataset.paths == sorted(dataset.paths) and len(dataset) == 16
+    assert dataset.failed == [os.path.join(image_dir, "nested", "broken.jpg")]
+    assert isinstance(dataset.images, np.memmap)
+    assert dataset.images.dtype == np.uint8 and dataset.images.shape == (16, 224, 224, 3)
+
+    # reopening maps the same pixels, and the batches are exactly what preprocessing each file gives
+    reopened = PreprocessedDataset(str(tmp_path / "dataset"))
+    assert reopened.paths == dataset.paths and reopened.size == size
+    np.testing.assert_array_equal(reopened.images, dataset.images)
+    batches = list(reopened.batches(5))
+    assert [len(paths) for paths, _ in batches] == [5, 5, 5, 1]
+    for paths, image_arrays in batches:
+        assert image_arrays.dtype == np.float32
+        for path, image_array in zip(paths, image_arrays):
+            expected = image_utils.preprocess_image_to_array(image_utils.get_image_from_file(path, size), size)
+            np.testing.assert_array_equal(image_array, expected[0])
+
+
+def test_predict_dataset_matches_predicting_each_file(onnx_model_path, image_dir, tmp_path):
+    model = ImageModel.load(onnx_model_path)
+    dataset = PreprocessedDataset.build(image_dir, str(tmp_path / "dataset"), model.signature.input_image_size)
+
+    results = list(model.predict_dataset(dataset, batch_size=4))
+    assert [path for path, _ in results] == dataset.paths
+    # the same batches straight from the files (ORT batches sum in a different order than single images, see
+    # test_image_model, so compare batch for batch)
+    images = [image_utils.get_image_from_file(path, model.signature.input_image_size) for path in dataset.paths]
+    expected = model.predict_batch(images, batch_size=4)
+    assert [result.labels for _, result in results] == [result.labels for result in expected]
+
+
+def test_predict_dataset_rejects_a_different_size(onnx_model_path, image_dir, tmp_path):
+    model = ImageModel.load(onnx_model_path)
+    dataset = PreprocessedDataset.build(image_dir, str(tmp_path / "dataset"), (64, 64))
+    with pytest.raises(ValueError):
+        next(model.predict_dataset(dataset))
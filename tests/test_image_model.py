@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from lobe import ImageModel, image_utils
+
+
+def _gradient_image(width, height, mode, seed):
+    rng = np.random.RandomState(seed)
+    x, y = np.meshgrid(np.linspace(0, 1, width), np.linspace(0, 1, height))
+    channels = [(rng.rand() * x + rng.rand() * y) * 255 for _ in range(3)]
+    image = Image.fromarray(np.stack(channels, axis=-1).astype(np.uint8))
+    return image.convert(mode)
+
+
+@pytest.fixture
+def mixed_images():
+    """
+    Images of different sizes, aspect ratios and modes.
+    """
+    sizes = [(300, 200), (224, 224), (64, 500), (1000, 750), (50, 40), (640, 480), (225, 223)]
+    modes = ["RGB", "RGBA", "L", "RGB", "P", "RGB", "RGB"]
+    return [_gradient_image(width, height, mode, seed) for seed, ((width, height), mode) in enumerate(zip(sizes, modes))]
+
+
+@pytest.mark.parametrize("batch_size", [1, 3, 32])
+def test_predict_batch_matches_predicting_each_image(onnx_model_path, mixed_images, batch_size):
+    model = ImageModel.load(onnx_model_path)
+    results = model.predict_batch(mixed_images, batch_size=batch_size)
+    assert len(results) == len(mixed_images)
+    for image, result in zip(mixed_images, results):
+        expected = model.predict(image)
+        assert result.prediction == expected.prediction
+        assert [label for label, _ in result.labels] == [label for label, _ in expected.labels]
+        # the backend sums float32 pixels in a different order for a batch than for a single image
+        np.testing.assert_allclose(
+            [confidence for _, confidence in result.labels], [confidence for _, confidence in expected.labels],
+            atol=1e-4,
+        )
+
+
+def test_predict_batch_of_no_images(onnx_model_path):
+    assert ImageModel.load(onnx_model_path).predict_batch([]) == []
+
+
+def test_predict_batch_rejects_bad_batch_sizes(onnx_model_path, mixed_images):
+    with pytest.raises(ValueError):
+        ImageModel.load(onnx_model_path).predict_batch(mixed_images, batch_size=0)
+
+
+def test_images_to_array_rows_match_single_image_preprocessing(mixed_images):
+    size = (224, 224)
+    batch = image_utils.images_to_array(mixed_images, size)
+    assert batch.shape == (len(mixed_images), 224, 224, 3) and batch.dtype == np.float32
+    for image, row in zip(mixed_images, batch):
+        np.testing.assert_array_equal(row, image_utils.preprocess_image_to_array(image, size)[0])
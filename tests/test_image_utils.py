@@ -0,0 +1,76 @@
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from lobe import image_utils
+
+
+def _jpeg(size):
+    buffer = BytesIO()
+    Image.new("RGB", size, (120, 40, 200)).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def _jpeg_with_orientation(size, orientation):
+    exif = Image.Exif()
+    exif[0x0112] = orientation
+    buffer = BytesIO()
+    Image.new("RGB", size, (120, 40, 200)).save(buffer, format="JPEG", exif=exif)
+    return buffer.getvalue()
+
+
+def test_image_to_jpeg_bytes_leaves_the_callers_image_alone():
+    image = Image.open(BytesIO(_jpeg((300, 210))))
+    data = image_utils.image_to_jpeg_bytes(image, (64, 64))
+    assert image.size == (300, 210)
+    assert Image.open(BytesIO(data)).size == (91, 64)
+
+
+def test_encoded_image_bytes_shrinks_large_images():
+    data = image_utils.encoded_image_bytes(_jpeg((1200, 840)), (64, 64))
+    assert Image.open(BytesIO(data)).size == (91, 64)
+
+
+def test_encoded_image_bytes_passes_small_jpegs_through():
+    data = _jpeg((50, 40))
+    assert image_utils.encoded_image_bytes(data, (64, 64)) is data
+
+
+@pytest.mark.parametrize("mode", ["L", "CMYK"])
+def test_encoded_image_bytes_converts_non_rgb_jpegs(mode):
+    buffer = BytesIO()
+    Image.new(mode, (50, 40)).save(buffer, format="JPEG")
+    data = buffer.getvalue()
+    encoded = image_utils.encoded_image_bytes(data, (64, 64))
+    assert encoded != data
+    assert Image.open(BytesIO(encoded)).mode == "RGB"
+
+
+def test_preprocess_image_to_array_when_the_crop_edge_rounds_past_the_image():
+    # scaling 2000x900 to fill 224x224 puts the bottom edge a rounding error past 900, which used to become a negative
+    # box offset once flipped by the EXIF orientation
+    image = Image.open(BytesIO(_jpeg_with_orientation((2000, 900), 3)))
+    expected = image_utils.image_to_array(image_utils.preprocess_image(image, (224, 224)))
+    result = image_utils.preprocess_image_to_array(image, (224, 224))
+    assert result.shape == expected.shape
+    assert abs(result - expected).max() <= 3 / 255
+
+
+@pytest.mark.parametrize("orientation", range(1, 9))
+@pytest.mark.parametrize("target", [(224, 224), (300, 120), (120, 300)])
+def test_drafted_jpegs_still_cover_the_target_size(orientation, target):
+    image = image_utils.draft_image(Image.open(BytesIO(_jpeg_with_orientation((2000, 900), orientation))), target)
+    oriented = image_utils.update_orientation(image)
+    # decoded at a reduced scale, but never below the target in either dimension once oriented
+    assert image.size[0] < 2000
+    assert oriented.size[0] >= target[0] and oriented.size[1] >= target[1]
+    # the fast preprocessing path crops and resizes from there to exactly the target size
+    assert image_utils.preprocess_image_to_array(image, target).shape == (1, target[1], target[0], 3)
+
+
+def test_draft_image_leaves_other_formats_alone():
+    buffer = BytesIO()
+    Image.new("RGB", (2000, 900)).save(buffer, format="PNG")
+    image = image_utils.draft_image(Image.open(buffer), (224, 224))
+    assert image.size == (2000, 900)
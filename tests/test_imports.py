@@ -0,0 +1,57 @@
+import os
+import subprocess
+import sys
+from typing import List
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+# only imported once they're needed (loading a model of that format, visualizing, fetching urls, ...)
+HEAVY_MODULES = ["tensorflow", "tflite_runtime", "onnxruntime", "matplotlib", "requests", "aiohttp"]
+
+
+def _import_chains(importtime: str, modules: List[str]) -> str:
+    """
+    From `python -X importtime` output, show which imports led to each module (with their cumulative times), e.g.
+    `lobe (80000us) <- lobe.model.image_model (70000us) <- requests (40000us)`.
+    """
+    entries = []
+    for line in importtime.splitlines():
+        if line.startswith("import time:") and "cumulative" not in line:
+            _, cumulative, name = line[len("import time:"):].split("|")
+            entries.append((name.strip(), (len(name) - len(name.lstrip())) // 2, cumulative.strip()))
+    chains = []
+    for i, (name, depth, cumulative) in enumerate(entries):
+        if name not in modules:
+            continue
+        # children are printed before their parents, so the parents are the next entries at each smaller depth
+        chain = [f"{name} ({cumulative}us)"]
+        for parent, parent_depth, parent_cumulative in entries[i + 1:]:
+            if parent_depth < depth:
+                chain.append(f"{parent} ({parent_cumulative}us)")
+                depth = parent_depth
+        chains.append(" <- ".join(reversed(chain)))
+    return "\n".join(chains)
+
+
+def test_import_lobe_is_lazy():
+    # a fresh interpreter, since other tests may have imported these modules already. -X importtime records what
+    # imported what, so a failure shows which import to make lazy (see benchmarks/import_time.py for the timings)
+    code = f"import sys, lobe; print(','.join(name for name in {HEAVY_MODULES!r} if name in sys.modules))"
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [SRC_DIR, os.environ.get("PYTHONPATH")])))
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, check=True, env=env
+    )
+    imported = output.stdout.strip()
+    assert imported == "", f"import lobe imported {imported}:\n{_import_chains(output.stderr, imported.split(','))}"
+
+
+def test_import_chains_point_at_the_eager_import():
+    importtime = "\n".join([
+        "import time: self [us] | cumulative | imported package",
+        "import time:       100 |        100 |       urllib3",
+        "import time:       200 |        300 |     requests",
+        "import time:        50 |        350 |   lobe.http_client",
+        "import time:        10 |         10 |   lobe.results",
+        "import time:       500 |        860 | lobe",
+    ])
+    assert _import_chains(importtime, ["requests"]) == "lobe (860us) <- lobe.http_client (350us) <- requests (300us)"
@@ -0,0 +1,77 @@
+import os
+from io import BytesIO
+
+import pytest
+
+from lobe import ImageModel
+from lobe.parallel import ModelPool
+
+SHM_DIR = "/dev/shm"
+
+
+def _shared_memory_blocks():
+    if not os.path.isdir(SHM_DIR):
+        return set()
+    return {name for name in os.listdir(SHM_DIR) if name.startswith("psm_")}
+
+
+@pytest.fixture
+def inputs(images, tmp_path):
+    """
+    The same images as PIL images, encoded bytes and file paths, with their expected predictions.
+    """
+    pil_images = [image.resize((96, 64)) for image in images[:6]]
+    payloads = []
+    for i, image in enumerate(pil_images):
+        buffer = BytesIO()
+        image.save(buffer, format="PNG")
+        path = str(tmp_path / f"{i}.png")
+        image.save(path)
+        payloads.extend([image, buffer.getvalue(), path])
+    return payloads
+
+
+def _labels(result):
+    return [(label, round(confidence, 4)) for label, confidence in result.labels]
+
+
+def test_predict_many_matches_serial_predictions(onnx_model_path, inputs):
+    model = ImageModel.load(onnx_model_path)
+    expected = [_labels(model.predict(inputs[i - i % 3])) for i in range(len(inputs))]
+    before = _shared_memory_blocks()
+    with ModelPool(onnx_model_path, workers=2) as pool:
+        ordered = [_labels(result) for result in pool.predict_many(inputs, max_in_flight=3)]
+        unordered = dict(pool.predict_many(inputs, ordered=False))
+        single = pool.predict(inputs[2], top_k=1)
+
+    assert ordered == expected
+    assert sorted(unordered) == list(range(len(inputs)))
+    assert [_labels(unordered[i]) for i in range(len(inputs))] == expected
+    assert single.labels == model.predict(inputs[0], top_k=1).labels
+    assert _shared_memory_blocks() == before
+
+
+def test_submit_after_shutdown_raises_without_leaking_shared_memory(onnx_model_path, inputs):
+    before = _shared_memory_blocks()
+    pool = ModelPool(onnx_model_path, workers=1)
+    pool.shutdown()
+    with pytest.raises(RuntimeError):
+        pool.submit(inputs[0])
+    assert _shared_memory_blocks() == before
+
+
+def test_shutdown_can_cancel_pending_predictions(onnx_model_path, inputs):
+    pool = ModelPool(onnx_model_path, workers=1)
+    futures = [pool.submit(path) for path in inputs[2::3] * 4]
+    pool.shutdown(wait=True, cancel_pending=True)
+    for future in futures:
+        assert future.cancelled() or future.result().prediction is not None
+    assert any(future.cancelled() for future in futures)
+
+
+def test_unsupported_inputs_are_rejected(onnx_model_path):
+    with ModelPool(onnx_model_path, workers=1) as pool:
+        with pytest.raises(TypeError):
+            pool.submit(123)
+        with pytest.raises(ValueError):
+            list(pool.predict_many([], max_in_flight=0))
@@ -0,0 +1,104 @@
+import json
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from threading import Barrier
+
+import pytest
+
+from lobe import ImageModel
+from lobe.registry import ModelRegistry
+
+MODEL_BYTES = 100
+
+
+@pytest.fixture
+def model_paths(onnx_model_path, tmp_path):
+    """
+    Copies of the ONNX model, each with its own signature id.
+    """
+    paths = {}
+    for name in ["a", "b", "c"]:
+        path = str(tmp_path / name)
+        shutil.copytree(onnx_model_path, path)
+        with open(os.path.join(path, "signature.json")) as f:
+            signature = json.load(f)
+        signature["doc_id"] = name
+        with open(os.path.join(path, "signature.json"), "w") as f:
+            json.dump(signature, f)
+        paths[name] = path
+    return paths
+
+
+def _registry(memory_budget):
+    # every model counts as MODEL_BYTES, so the budget is a number of models
+    return ModelRegistry(memory_budget=memory_budget, size_fn=lambda model: MODEL_BYTES)
+
+
+def _loaded_names(registry):
+    return [os.path.basename(os.path.dirname(key)) for key in registry.loaded()]
+
+
+def test_least_recently_used_models_are_evicted_over_the_budget(model_paths, images):
+    registry = _registry(memory_budget=5 * MODEL_BYTES // 2)
+    a = registry.get(model_paths["a"])
+    registry.get(model_paths["b"])
+    assert _loaded_names(registry) == ["a", "b"]
+
+    # using a makes b the least recently used, so loading c evicts b
+    assert registry.get("a") is a
+    registry.get(model_paths["c"])
+    assert _loaded_names(registry) == ["a", "c"]
+    stats = registry.stats()
+    assert stats["evictions"] == 1 and stats["memory_bytes"] == 2 * MODEL_BYTES
+    assert (stats["hits"], stats["misses"], stats["loads"]) == (1, 3, 3)
+
+    # b is loaded again transparently, this time evicting a
+    b = registry.get("b")
+    assert _loaded_names(registry) == ["c", "b"]
+    assert registry.stats()["loads"] == 4 and registry.stats()["evictions"] == 2
+    assert "a" not in registry and "b" in registry
+    # the evicted model still works for whoever holds it
+    assert a.predict(images[0]).labels == b.predict(images[0]).labels
+
+
+def test_the_newest_model_is_kept_even_over_the_budget(model_paths):
+    registry = _registry(memory_budget=MODEL_BYTES // 2)
+    registry.get(model_paths["a"])
+    assert _loaded_names(registry) == ["a"]
+    registry.get(model_paths["b"])
+    assert _loaded_names(registry) == ["b"]
+    assert registry.stats()["memory_bytes"] == MODEL_BYTES
+
+
+def test_unload_frees_the_budget(model_paths):
+    registry = _registry(memory_budget=2 * MODEL_BYTES)
+    registry.get(model_paths["a"])
+    registry.get(model_paths["b"])
+    assert registry.unload("a") and not registry.unload("a")
+    registry.get(model_paths["c"])
+    assert _loaded_names(registry) == ["b", "c"]
+    assert registry.stats()["evictions"] == 0
+
+
+def test_registered_models_load_on_first_use(model_paths):
+    registry = _registry(memory_budget=None)
+    assert registry.register(model_paths["a"]) == "a"
+    assert len(registry) == 0
+    assert isinstance(registry.get("a"), ImageModel)
+    assert _loaded_names(registry) == ["a"]
+
+
+def test_concurrent_requests_share_one_load(model_paths):
+    registry = _registry(memory_budget=None)
+    threads = 8
+    start = Barrier(threads)
+
+    def get(_):
+        start.wait()
+        return registry.get(model_paths["a"])
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        models = list(pool.map(get, range(threads)))
+    assert all(model is models[0] for model in models)
+    assert registry.stats()["loads"] == 1
@@ -0,0 +1,73 @@
+import json
+import os
+import shutil
+import time
+
+from lobe.cache import PredictionCache
+from lobe.model.reloading_image_model import ReloadingImageModel
+
+
+def test_cache_set_on_the_wrapper_is_used_and_carried_over(onnx_model_path, images):
+    with ReloadingImageModel(onnx_model_path, poll_interval=60) as model:
+        cache = PredictionCache()
+        model.cache = cache
+        assert model.model.cache is cache
+
+        model.predict(images[0])
+        reloaded = model.reload()
+        assert reloaded.cache is cache and model.cache is cache
+        model.predict(images[0])
+        assert cache.stats()["hits"] == 1
+
+
+POLL_INTERVAL = 0.02
+
+
+def _copy_export(onnx_model_path, path, doc_id):
+    shutil.copytree(onnx_model_path, path)
+    with open(os.path.join(path, "signature.json")) as f:
+        signature = json.load(f)
+    signature["doc_id"] = doc_id
+    with open(os.path.join(path, "signature.json"), "w") as f:
+        json.dump(signature, f)
+    return str(path)
+
+
+def _wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(POLL_INTERVAL)
+
+
+def test_swapping_a_symlink_to_a_new_export_reloads(onnx_model_path, tmp_path):
+    _copy_export(onnx_model_path, tmp_path / "v1", "v1")
+    v2 = _copy_export(onnx_model_path, tmp_path / "v2", "v2")
+    current = tmp_path / "current"
+    os.symlink("v1", current)
+
+    with ReloadingImageModel(str(current), poll_interval=POLL_INTERVAL) as model:
+        assert model.signature.id == "v1"
+        # like `ln -sfn v2 current`: point a new link at v2 and rename it over the old one
+        os.symlink("v2", tmp_path / "current.tmp")
+        os.replace(tmp_path / "current.tmp", current)
+        _wait_for(lambda: model.reloads == 1)
+        assert model.signature.id == "v2"
+        assert model.signature_path == os.path.join(os.path.realpath(v2), "signature.json")
+
+
+def test_replacing_only_the_model_file_reloads(onnx_model_path, tmp_path):
+    path = _copy_export(onnx_model_path, tmp_path / "model", "model")
+    with ReloadingImageModel(path, poll_interval=POLL_INTERVAL) as model:
+        first = model.model
+        model_file = os.path.join(path, "model.onnx")
+        stat = os.stat(model_file)
+        os.utime(model_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        _wait_for(lambda: model.reloads == 1)
+        assert model.model is not first
+
+
+def test_an_unchanged_export_isnt_reloaded(onnx_model_path):
+    with ReloadingImageModel(onnx_model_path, poll_interval=POLL_INTERVAL) as model:
+        time.sleep(10 * POLL_INTERVAL)
+        assert model.reloads == 0 and model.last_error is None
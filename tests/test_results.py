@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+from lobe.results import ClassificationResult, split_batch_results
+
+LABELS = [f"label{i}" for i in range(6)]
+
+
+def _reference_labels(confidences):
+    # highest confidence first, and label order for ties
+    order = sorted(range(len(confidences)), key=lambda idx: (-confidences[idx], idx))
+    return [(LABELS[idx], float(confidences[idx])) for idx in order]
+
+
+def test_numpy_and_list_outputs_give_the_same_results():
+    confidences = np.random.RandomState(0).dirichlet(np.ones(len(LABELS)), size=3).astype(np.float32)
+    from_numpy = ClassificationResult({"Confidences": confidences}, labels=LABELS, export_version=1)
+    from_lists = ClassificationResult({"Confidences": confidences.tolist()}, labels=LABELS, export_version=1)
+    assert from_numpy.labels == from_lists.labels
+    assert from_numpy.prediction == from_lists.prediction
+    assert from_numpy.prediction == [LABELS[idx] for idx in confidences.argmax(axis=1)]
+
+
+def test_from_batch_matches_the_batched_result_row_by_row():
+    confidences = np.random.RandomState(1).dirichlet(np.ones(len(LABELS)), size=4)
+    batched = ClassificationResult({"Confidences": confidences}, labels=LABELS, export_version=1)
+    rows = ClassificationResult.from_batch({"Confidences": confidences}, labels=LABELS, export_version=1)
+    assert len(rows) == 4
+    for i, row in enumerate(rows):
+        # a batch of one is un-batched
+        assert row.labels == batched.labels[i] == _reference_labels(confidences[i])
+        assert row.prediction == batched.prediction[i]
+
+
+def test_ties_keep_the_label_order():
+    confidences = np.array([[0.1, 0.3, 0.1, 0.3, 0.1, 0.1]])
+    result = ClassificationResult({"Confidences": confidences}, labels=LABELS, export_version=1)
+    assert [label for label, _ in result.labels] == ["label1", "label3", "label0", "label2", "label4", "label5"]
+    assert result.prediction == "label1"
+
+
+def test_legacy_predicted_label_output_is_kept():
+    results = {"Confidences": np.array([[0.2, 0.8, 0, 0, 0, 0]]), "Prediction": np.array(["label0"])}
+    result = ClassificationResult(results, labels=LABELS, export_version=1)
+    assert result.prediction == "label0"
+
+
+def test_local_api_results():
+    results = {"predictions": [{"label": "b", "confidence": 0.7}, {"label": "a", "confidence": 0.3}]}
+    result = ClassificationResult(results)
+    assert result.prediction == "b"
+    assert result.labels == [("b", 0.7), ("a", 0.3)]
+
+
+def test_split_batch_results_keeps_a_batch_dimension_of_one():
+    results = {"Confidences": np.zeros((3, 2)), "Prediction": ["a", "b", "c"], "Other": "not batched"}
+    rows = split_batch_results(results)
+    assert len(rows) == 3
+    assert rows[1]["Confidences"].shape == (1, 2)
+    assert rows[1]["Prediction"] == ["b"]
+    assert rows[1]["Other"] == "not batched"
+
+
+@pytest.mark.parametrize("top_k", [None, 1, 2, 3, 5, 6, 10])
+@pytest.mark.parametrize("min_confidence", [None, 0.0, 0.2, 0.5])
+def test_top_k_and_min_confidence_match_a_full_sort(top_k, min_confidence):
+    # few distinct values, so there are plenty of ties (also straddling the top_k cut)
+    confidences = np.random.RandomState(2).randint(0, 4, size=(20, len(LABELS))) / 4
+    result = ClassificationResult(
+        {"Confidences": confidences}, labels=LABELS, export_version=1, top_k=top_k, min_confidence=min_confidence
+    )
+    for row_labels, row_confidences in zip(result.labels, confidences):
+        expected = _reference_labels(row_confidences)[:top_k]
+        if min_confidence is not None:
+            expected = [(label, confidence) for label, confidence in expected if confidence >= min_confidence]
+        assert row_labels == expected
+    # the top prediction isn't affected by the limits
+    assert result.prediction == [LABELS[idx] for idx in confidences.argmax(axis=1)]
+
+
+def test_top_k_on_local_api_results():
+    results = {"predictions": [{"label": "b", "confidence": 0.7}, {"label": "a", "confidence": 0.3}]}
+    result = ClassificationResult(results, top_k=1, min_confidence=0.5)
+    assert result.labels == [("b", 0.7)]
+
+
+@pytest.mark.parametrize("top_k", [0, -1])
+def test_top_k_must_be_positive(top_k):
+    with pytest.raises(ValueError):
+        ClassificationResult({"Confidences": np.zeros((1, len(LABELS)))}, labels=LABELS, export_version=1, top_k=top_k)
+
+
+def test_top_k_ranks_nan_confidences_last():
+    confidences = np.array([[np.nan, 0.2, np.nan, 0.5, 0.3, np.nan]])
+    result = ClassificationResult({"Confidences": confidences}, labels=LABELS, export_version=1, top_k=4)
+    assert [label for label, _ in result.labels] == ["label3", "label4", "label1", "label0"]
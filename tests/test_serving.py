@@ -0,0 +1,47 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event
+
+import pytest
+
+from lobe import ImageModel
+from lobe.serving import BatchingPredictor
+
+NUM_THREADS = 8
+
+
+def test_batched_predictions_match_serial(onnx_model_path, images):
+    model = ImageModel.load(onnx_model_path)
+    expected = [model.predict(image).prediction for image in images]
+    with BatchingPredictor(model, max_batch_size=4, max_wait_ms=2) as predictor:
+        with ThreadPoolExecutor(max_workers=NUM_THREADS) as pool:
+            results = list(pool.map(predictor.predict, images * 4))
+    assert [result.prediction for result in results] == expected * 4
+
+
+def test_submit_racing_close_is_rejected_instead_of_lost(onnx_model_path, images):
+    model = ImageModel.load(onnx_model_path)
+    predictor = BatchingPredictor(model)
+    preprocessing, closed = Event(), Event()
+    preprocess = model.preprocess
+
+    def slow_preprocess(image):
+        # close the predictor while this image is still being preprocessed
+        preprocessing.set()
+        closed.wait()
+        return preprocess(image)
+
+    model.preprocess = slow_preprocess
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        submitted = pool.submit(predictor.submit, images[0])
+        preprocessing.wait()
+        predictor.close()
+        closed.set()
+        with pytest.raises(RuntimeError):
+            submitted.result(timeout=5)
+
+
+def test_submit_after_close_raises(onnx_model_path, images):
+    predictor = BatchingPredictor(ImageModel.load(onnx_model_path))
+    predictor.close()
+    with pytest.raises(RuntimeError):
+        predictor.submit(images[0])
@@ -0,0 +1,130 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from lobe import ImageModel
+from lobe.stream import frame_to_image
+
+HEIGHT, WIDTH = 48, 64
+
+
+def _frame(value):
+    return np.full((HEIGHT, WIDTH, 3), value, dtype=np.uint8)
+
+
+def _frames(count, delay=0.0):
+    """
+    Synthetic camera frames, each a different solid color, arriving every `delay` seconds.
+    """
+    rng = np.random.RandomState(2)
+    for _ in range(count):
+        time.sleep(delay)
+        yield rng.randint(0, 256, size=(1, 1, 3)).astype(np.uint8).repeat(HEIGHT, axis=0).repeat(WIDTH, axis=1)
+
+
+def _count_inferences(model, monkeypatch, delay=0.0):
+    """
+    Count the backend calls (optionally slowing each one down by `delay` seconds, like a bigger model would be).
+    """
+    calls = []
+    predict_arrays = model.predict_arrays
+
+    def counting_predict_arrays(image_arrays, *args, **kwargs):
+        calls.append(len(image_arrays))
+        time.sleep(delay)
+        return predict_arrays(image_arrays, *args, **kwargs)
+
+    monkeypatch.setattr(model, "predict_arrays", counting_predict_arrays)
+    return calls
+
+
+def _reader_threads():
+    return {thread for thread in threading.enumerate() if thread.name == "lobe-stream-reader"}
+
+
+def test_without_dropping_every_frame_is_predicted_in_order(onnx_model_path):
+    model = ImageModel.load(onnx_model_path)
+    frames = list(_frames(12))
+    predictions = list(model.predict_stream(iter(frames), drop_frames=False))
+
+    assert [prediction.frame_index for prediction in predictions] == list(range(12))
+    assert all(prediction.dropped == 0 and not prediction.skipped for prediction in predictions)
+    for prediction, frame in zip(predictions, frames):
+        assert prediction.result.labels == model.predict_arrays(model.preprocess(frame_to_image(frame)))[0].labels
+
+
+def test_dropping_frames_when_inference_falls_behind(onnx_model_path, monkeypatch):
+    model = ImageModel.load(onnx_model_path)
+    calls = _count_inferences(model, monkeypatch, delay=0.02)
+    predictions = list(model.predict_stream(_frames(40, delay=0.002), drop_frames=True))
+
+    indices = [prediction.frame_index for prediction in predictions]
+    assert indices == sorted(set(indices))
+    # the latest frame always wins, so the last one is never dropped
+    assert indices[-1] == 39
+    dropped = predictions[-1].dropped
+    assert dropped > 0 and len(predictions) + dropped == 40
+    assert len(calls) == len(predictions)
+    assert [prediction.dropped for prediction in predictions] == sorted(prediction.dropped for prediction in predictions)
+
+
+def test_frames_that_barely_change_reuse_the_last_result(onnx_model_path, monkeypatch):
+    model = ImageModel.load(onnx_model_path)
+    calls = _count_inferences(model, monkeypatch)
+    noisy = _frame(100).copy()
+    noisy[::7, ::5] += 3
+    frames = [_frame(100), _frame(100), noisy, _frame(200), _frame(200)]
+    predictions = list(model.predict_stream(iter(frames), drop_frames=False, change_threshold=0.01))
+
+    assert [prediction.skipped for prediction in predictions] == [False, True, True, False, True]
+    assert len(calls) == 2
+    assert predictions[1].result is predictions[0].result and predictions[4].result is predictions[3].result
+    assert predictions[3].result.labels != predictions[0].result.labels
+
+
+@pytest.mark.parametrize("drop_frames", [False, True])
+def test_errors_from_the_frame_iterator_are_raised_after_its_frames(onnx_model_path, drop_frames):
+    model = ImageModel.load(onnx_model_path)
+
+    def failing_frames():
+        yield _frame(10)
+        yield _frame(240)
+        raise RuntimeError("camera unplugged")
+
+    stream = model.predict_stream(failing_frames(), drop_frames=drop_frames)
+    predictions = []
+    with pytest.raises(RuntimeError, match="camera unplugged"):
+        for prediction in stream:
+            predictions.append(prediction)
+    # the last frame read before the failure is still predicted (and without dropping, every one of them)
+    assert [prediction.frame_index for prediction in predictions][-1] == 1
+    if not drop_frames:
+        assert [prediction.frame_index for prediction in predictions] == [0, 1]
+
+
+@pytest.mark.parametrize("drop_frames", [False, True])
+def test_closing_the_stream_stops_the_reader(onnx_model_path, drop_frames):
+    model = ImageModel.load(onnx_model_path)
+    read = []
+
+    def endless_frames():
+        while True:
+            read.append(len(read))
+            yield _frame(len(read) % 256)
+            time.sleep(0.001)
+
+    existing = _reader_threads()
+    stream = model.predict_stream(endless_frames(), drop_frames=drop_frames)
+    for _, prediction in zip(range(3), stream):
+        pass
+    [reader] = _reader_threads() - existing
+    stream.close()
+
+    reader.join(timeout=5)
+    assert not reader.is_alive()
+    # the camera isn't read any more once the stream is closed
+    frames_read = len(read)
+    time.sleep(0.05)
+    assert len(read) == frames_read
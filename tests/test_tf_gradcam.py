@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+tf = pytest.importorskip("tensorflow")
+
+from lobe import ImageModel
+from lobe.backends.tf.image_backend import _gradcam_plusplus_from_conv
+
+LABELS = [f"c{i}" for i in range(5)]
+
+
+def _images(batch_size, seed=0):
+    return np.random.RandomState(seed).rand(batch_size, 32, 32, 3).astype(np.float32)
+
+
+@pytest.fixture(scope="module")
+def backend(tf_model_path):
+    return ImageModel.load(tf_model_path).backend
+
+
+@pytest.mark.parametrize("fast", [False, True])
+def test_gradcam_functions_are_traced_once(backend, fast):
+    # the batch dimension is None in the input signature, so new batch sizes reuse the same graph
+    for seed, batch_size in enumerate([1, 3, 8, 3, 1]):
+        images = _images(batch_size, seed)
+        labels = [LABELS[i % len(LABELS)] for i in range(batch_size)]
+        if fast:
+            backend.gradcam_plusplus_fast(images, label=labels)
+            backend.gradcam_plusplus_fast(images)
+        else:
+            backend.gradcam_plusplus(images, label=labels)
+            backend.gradcam_plusplus(images)
+        backend.predict_with_gradcam_plusplus(images, fast=fast)
+
+    for with_label_mask in [True, False]:
+        gradcam_fn = backend._get_gradcam_fn(fast=fast, with_label_mask=with_label_mask)
+        assert gradcam_fn is backend._get_gradcam_fn(fast=fast, with_label_mask=with_label_mask)
+        assert gradcam_fn.experimental_get_tracing_count() == 1
+
+
+@pytest.mark.parametrize("fast", [False, True])
+@pytest.mark.parametrize("with_label_mask", [True, False])
+def test_compiled_gradcam_matches_eager(backend, fast, with_label_mask):
+    images = _images(6)
+    last_conv_fn, last_fc_fn = backend._get_gradcam_subgraphs()
+    image_tensor = tf.constant(images)
+    if with_label_mask:
+        label_mask = tf.one_hot([0, 1, 2, 3, 4, 0], depth=len(LABELS), dtype=tf.float32)
+        compiled = backend._get_gradcam_fn(fast=fast, with_label_mask=True)(image_tensor, label_mask)
+        eager = _gradcam_plusplus_from_conv(last_fc_fn, last_conv_fn(image_tensor), label_mask, fast=fast)
+    else:
+        compiled = backend._get_gradcam_fn(fast=fast, with_label_mask=False)(image_tensor)
+        eager = _gradcam_plusplus_from_conv(last_fc_fn, last_conv_fn(image_tensor), fast=fast)
+
+    for compiled_out, eager_out in zip(compiled, eager):
+        np.testing.assert_allclose(compiled_out.numpy(), eager_out.numpy(), rtol=1e-5, atol=1e-6)
+    # the logits from the same pass give the model's confidences
+    confidences = backend.predict(images, as_numpy=True)["Confidences"]
+    np.testing.assert_allclose(tf.nn.softmax(compiled[0]).numpy(), confidences, rtol=1e-5, atol=1e-6)
+
+
+@pytest.mark.parametrize("labelled", [True, False])
+def test_fast_gradcam_matches_the_nested_tapes(backend, labelled):
+    # the heads here are piecewise linear after the last conv layer, where the closed form is exact
+    for seed in range(5):
+        images = _images(8, seed) * 2
+        labels = [LABELS[seed % len(LABELS)]] * 8 if labelled else None
+        baseline = backend.gradcam_plusplus(images, label=labels)
+        fast = backend.gradcam_plusplus_fast(images, label=labels)
+        # the logit's own higher-order derivatives are all zero for these heads, so differentiating it instead of
+        # exp(logit) would leave empty heatmaps
+        assert (baseline.max(axis=(1, 2)) > 0).all()
+        # float32 rounding of the two computations, the largest difference seen is under 6e-6
+        assert np.allclose(fast, baseline, atol=1e-5)
@@ -0,0 +1,83 @@
+from io import BytesIO
+
+import requests
+
+from lobe import ImageModel, http_client, image_utils
+from lobe.http_client import HTTPClient
+
+
+def test_predict_from_urls_yields_errors_without_dropping_other_urls(onnx_model_path, images, monkeypatch):
+    model = ImageModel.load(onnx_model_path)
+    by_url = {f"http://example.com/{i}.jpg": image for i, image in enumerate(images)}
+    broken = "http://example.com/missing.jpg"
+
+    def get_image_from_url(url, size=None, client=None):
+        if url == broken:
+            raise IOError("404")
+        return by_url[url]
+
+    monkeypatch.setattr(image_utils, "get_image_from_url", get_image_from_url)
+    urls = list(by_url)
+    urls.insert(3, broken)
+    results = dict(model.predict_from_urls(urls, concurrency=2, client=object()))
+
+    assert set(results) == set(urls)
+    assert isinstance(results.pop(broken), IOError)
+    for url, result in results.items():
+        assert result.labels == model.predict(by_url[url]).labels
+
+
+def _png(image):
+    buffer = BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_predict_from_urls_against_a_local_server(onnx_model_path, images, local_server):
+    model = ImageModel.load(onnx_model_path)
+    by_url = {}
+    for i, image in enumerate(images):
+        local_server.routes[("GET", f"/{i}.png")] = lambda body, data=_png(image): (200, "image/png", data)
+        by_url[local_server.url(f"/{i}.png")] = image
+    local_server.routes[("GET", "/unavailable.png")] = lambda body: (503, "text/plain", b"busy")
+    unavailable, missing = local_server.url("/unavailable.png"), local_server.url("/missing.png")
+    urls = list(by_url)
+    urls[5:5] = [unavailable, missing]
+
+    with HTTPClient(retries=2, backoff_factor=0) as client:
+        results = dict(model.predict_from_urls(urls, concurrency=4, client=client))
+
+    assert set(results) == set(urls)
+    # 503 is retried (the first try plus 2 retries) before giving up, a 404 isn't retried at all
+    assert isinstance(results[unavailable], requests.HTTPError)
+    assert results.pop(unavailable).response.status_code == 503
+    assert local_server.hits("/unavailable.png") == 3
+    assert results.pop(missing).response.status_code == 404
+    assert local_server.hits("/missing.png") == 1
+    for url, result in results.items():
+        assert result.labels == model.predict(by_url[url]).labels
+    # every image was only fetched once
+    assert all(local_server.hits(f"/{i}.png") == 1 for i in range(len(images)))
+
+
+def test_predict_from_url_retries_until_the_server_recovers(onnx_model_path, images, local_server):
+    model = ImageModel.load(onnx_model_path)
+    responses = [(503, "text/plain", b"busy"), (502, "text/plain", b"bad gateway"), (200, "image/png", _png(images[0]))]
+    local_server.routes[("GET", "/flaky.png")] = lambda body: responses.pop(0)
+
+    with HTTPClient(retries=2, backoff_factor=0) as client:
+        result = model.predict_from_url(local_server.url("/flaky.png"), client=client)
+
+    assert result.labels == model.predict(images[0]).labels
+    assert local_server.hits("/flaky.png") == 3
+
+
+def test_retry_falls_back_to_method_whitelist_on_old_urllib3(monkeypatch):
+    class OldRetry(object):
+        # the keyword arguments of urllib3 < 1.26
+        def __init__(self, total, backoff_factor, status_forcelist, raise_on_status, method_whitelist):
+            self.method_whitelist = method_whitelist
+
+    monkeypatch.setattr(http_client, "Retry", OldRetry)
+    retry = http_client._make_retry(retries=2, backoff_factor=0)
+    assert isinstance(retry, OldRetry) and retry.method_whitelist is False
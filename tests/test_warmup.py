@@ -0,0 +1,17 @@
+import pytest
+
+from lobe import ImageModel
+
+
+def test_warmup_runs_the_first_batch_size_last(onnx_model_path, monkeypatch):
+    model = ImageModel.load(onnx_model_path)
+    warmed = []
+    monkeypatch.setattr(model.backend, "warmup", lambda data: warmed.append(len(data)))
+    model.warmup([1, 8, 32])
+    assert warmed == [32, 8, 1]
+
+
+@pytest.mark.parametrize("batch_size", [0, -1, 2.5])
+def test_warmup_rejects_bad_batch_sizes(onnx_model_path, batch_size):
+    with pytest.raises(ValueError):
+        ImageModel.load(onnx_model_path, warmup=True, warmup_batch_sizes=[1, batch_size])